@@ -0,0 +1,257 @@
+
+# Excerpt suggestions for KathySong.  A song is reduced to two short-time curves,
+# loudness (RMS) and onset strength (spectral flux), computed with NumPy a block
+# of frames at a time, and every possible excerpt start is scored at once:  loud
+# excerpts score well, silent ones badly, and starts where the music suddenly
+# gets louder or where a note is struck (a chorus coming in, say) best of all.
+# Results are kept in the cache folder, keyed like the decoded audio, so a song
+# is only ever analysed once.  Run over a game or the whole library with:
+#     python kathysong_analysis.py game.txt
+#     python kathysong_analysis.py --library
+#
+# Loudness is measured in the manner of ITU-R BS.1770:  K-weighted mean square in
+# overlapping 400 ms blocks, gated, in LUFS.  The K-weighting is applied in the
+# frequency domain, as the gain of its two filter stages at each FFT bin, so the
+# whole excerpt costs one transform rather than a sample-by-sample filter.  A
+# song's loudness is measured when its excerpt is first decoded and kept in the
+# game file, and level_gain() gives the gain applied as the excerpt is rendered.
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import functools
+import json
+import sys
+import os
+from kathysong_cache import AUDIO_CACHE, CACHE_DIRECTORY
+
+ANALYSIS_VERSION = 1 # Bumped whenever the scoring changes, so old results are not reused.
+ANALYSIS_DIRECTORY = os.path.join(CACHE_DIRECTORY, 'Analysis')
+ANALYSIS_WORKERS = max(1, os.cpu_count() or 1)
+HOP = 20 # Milliseconds per analysis frame.
+FFT_SIZE = 1024
+BLOCK_FRAMES = 2048 # Frames transformed at a time, which bounds the memory used.
+SILENCE_DB = 40 # Frames this far below the song's loud parts count as silent.
+LEAD = 2000 # Milliseconds either side of a start compared to find the music coming in.
+SPACING = 10000 # Milliseconds kept between suggestions, so they are not all one passage.
+SUGGESTIONS = 5
+EXCERPT_LENGTH = 500 # Milliseconds; the song editor's default, used for the library.
+RISE_WEIGHT = 1.0
+ONSET_WEIGHT = 0.5
+SILENCE_WEIGHT = 2.0
+LOUDNESS_BLOCK = 400 # Milliseconds per loudness block, overlapping by three quarters.
+ABSOLUTE_GATE = -70 # LUFS; blocks quieter than this are left out.
+RELATIVE_GATE = -10 # LU below the loudness of the blocks that pass the absolute gate.
+TARGET_LOUDNESS = -16 # LUFS every excerpt is brought to, as far as the limits allow.
+MAX_BOOST = 12 # dB, so near-silent excerpts are not blown up into noise.
+PEAK_CEILING = 0.98 # Of full scale; a boost never clips.
+K_STAGES = [([1.53512485958697, -2.69169618940638, 1.19839281085285], [1, -1.69065929318241, 0.73248077421585]),
+            ([1.0, -2.0, 1.0], [1, -1.99004745483398, 0.99007225036621])] # At 48 kHz.
+
+def to_mono(data, channels, sample_width): # PCM bytes as float32 samples in [-1, 1).
+    if sample_width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128)/128
+    elif sample_width == 2:
+        samples = np.frombuffer(data, dtype='<i2').astype(np.float32)/32768
+    elif sample_width == 4:
+        samples = np.frombuffer(data, dtype='<i4').astype(np.float32)/2147483648
+    else:
+        raise ValueError(f"Unsupported sample width {sample_width}")
+    frames = len(samples)//channels
+    return samples[:frames*channels].reshape(frames, channels).mean(axis=1)
+
+def curves(samples, frame_rate): # (rms, onset) per HOP milliseconds, or None if too short.
+    hop = int(frame_rate*HOP/1000)
+    frames = len(samples)//hop
+    if frames < 2:
+        return None
+    blocks = samples[:frames*hop].reshape(frames, hop)
+    rms = np.sqrt(np.mean(np.square(blocks), axis=1))
+    window = np.hanning(hop).astype(np.float32)
+    onset = np.zeros(frames, dtype=np.float32)
+    previous = None
+    for first in range(0, frames, BLOCK_FRAMES):
+        spectrum = np.log1p(100*np.abs(np.fft.rfft(blocks[first:first+BLOCK_FRAMES]*window, n=FFT_SIZE, axis=1)))
+        if previous is not None: # Carry the last spectrum over, so the block edges
+            spectrum = np.vstack([previous, spectrum]) # have a flux value as well.
+            onset[first:first+BLOCK_FRAMES] = np.maximum(np.diff(spectrum, axis=0), 0).sum(axis=1)
+        else:
+            onset[first+1:first+BLOCK_FRAMES] = np.maximum(np.diff(spectrum, axis=0), 0).sum(axis=1)
+        previous = spectrum[-1:]
+    return rms, onset
+
+def window_means(values, width): # Mean of values[t:t+width] for every t, as one vector.
+    sums = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+    return (sums[width:] - sums[:-width])/width
+
+def rank_starts(rms, onset, duration, count=SUGGESTIONS, spacing=SPACING): # Yields up to count
+    width = max(1, int(round(duration/HOP))) # {'start', 'score'} dicts, best first.
+    frames = len(rms)
+    if frames < width:
+        return [{'start':0,'score':0.0}]
+    decibels = 20*np.log10(rms + 1e-9)
+    loud = np.percentile(decibels, 95)
+    level = np.clip((decibels - loud + SILENCE_DB)/SILENCE_DB, 0, 1) # 0 silent, 1 loud.
+    silent = (decibels < loud - SILENCE_DB).astype(np.float32)
+    starts = frames - width + 1
+    loudness = window_means(level, width)[:starts]
+    silence = window_means(silent, width)[:starts]
+    lead = max(1, int(LEAD/HOP))
+    padded = np.concatenate([np.zeros(lead), level, np.zeros(lead)])
+    means = window_means(padded, lead) # means[t+lead] is after t, means[t] before it.
+    rise = np.clip(means[lead:lead+starts] - means[:starts], 0, 1)
+    peak = np.percentile(onset, 99)
+    strike = np.clip(onset[:starts]/peak, 0, 1) if peak > 0 else np.zeros(starts)
+    score = loudness + RISE_WEIGHT*rise + ONSET_WEIGHT*strike - SILENCE_WEIGHT*silence
+    chosen = []
+    gap = int(spacing/HOP)
+    for start in np.argsort(-score, kind='stable'):
+        if all(abs(int(start) - other) >= gap for other in chosen):
+            chosen.append(int(start))
+            if len(chosen) == count:
+                break
+    return [{'start':start*HOP,'score':round(float(score[start]), 3)} for start in chosen]
+
+def suggest_from_pcm(data, channels, sample_width, frame_rate, duration, count=SUGGESTIONS):
+    found = curves(to_mono(data, channels, sample_width), frame_rate)
+    if found is None:
+        return [{'start':0,'score':0.0}]
+    return rank_starts(found[0], found[1], duration, count)
+
+@functools.lru_cache(maxsize=16) # Excerpts of a game mostly share a length.
+def k_weighting(length, frame_rate): # Amplitude gain of the K-weighting at each rfft bin.
+    delay = np.exp(-2j*np.pi*np.fft.rfftfreq(length, 1/frame_rate)/48000)
+    gain = np.ones(len(delay))
+    for numerator, denominator in K_STAGES:
+        gain *= np.abs(numerator[0] + delay*(numerator[1] + delay*numerator[2]))
+        gain /= np.abs(denominator[0] + delay*(denominator[1] + delay*denominator[2]))
+    return gain.astype(np.float32)
+
+def loudness(data, channels, sample_width, frame_rate): # In LUFS; None for silence.
+    if sample_width == 2:
+        samples = np.frombuffer(data, dtype='<i2').astype(np.float32)/32768
+    elif sample_width == 4:
+        samples = np.frombuffer(data, dtype='<i4').astype(np.float32)/2147483648
+    else:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128)/128
+    samples = samples[:len(samples)//channels*channels].reshape(-1, channels).T # A row per channel.
+    length = samples.shape[1]
+    if length < 2:
+        return None
+    weighted = np.fft.irfft(np.fft.rfft(samples)*k_weighting(length, frame_rate), n=length) # The whole
+    squares = np.square(weighted).sum(axis=0) # excerpt, K-weighted at once; summed over the channels.
+    step = int(LOUDNESS_BLOCK*frame_rate/4000) # Blocks are four steps long.
+    steps = len(squares)//step
+    if steps < 4: # Short excerpts are one block.
+        power = np.array([squares.mean()])
+    else:
+        means = squares[:steps*step].reshape(steps, step).mean(axis=1)
+        power = window_means(means, 4)
+    levels = -0.691 + 10*np.log10(np.maximum(power, 1e-12))
+    gated = power[levels > ABSOLUTE_GATE]
+    if len(gated) == 0:
+        return None
+    relative = -0.691 + 10*np.log10(gated.mean()) + RELATIVE_GATE
+    gated = power[(levels > ABSOLUTE_GATE) & (levels > relative)]
+    return round(float(-0.691 + 10*np.log10(gated.mean())), 1)
+
+def excerpt_loudness(excerpt):
+    return loudness(excerpt.data, excerpt.channels, excerpt.sample_width, excerpt.frame_rate)
+
+def level_gain(excerpt, measured): # The gain in dB that brings an excerpt to the target
+    if measured is None: # loudness, without boosting it too far or clipping it.
+        return 0.0
+    gain = min(TARGET_LOUDNESS - measured, MAX_BOOST)
+    if gain > 0:
+        peak = peak_level(excerpt)
+        if peak > 0:
+            gain = min(gain, 20*np.log10(PEAK_CEILING/peak))
+    return float(gain)
+
+def peak_level(excerpt): # The largest sample, as a fraction of full scale.
+    if excerpt.sample_width != 2 or len(excerpt.data) == 0:
+        return 1.0
+    samples = np.frombuffer(excerpt.data, dtype='<i2')
+    return max(int(samples.max()), -int(samples.min()))/32768
+
+def cache_path(fileloc, duration): # None if the song file cannot be read.
+    key = AUDIO_CACHE.key(fileloc, f'starts{ANALYSIS_VERSION}', duration)
+    if key is None:
+        return None
+    return os.path.join(ANALYSIS_DIRECTORY, key+'.json')
+
+def cached_suggestions(fileloc, duration): # None if the song has not been analysed.
+    path = cache_path(fileloc, duration)
+    if path is None:
+        return None
+    try:
+        with open(path,'r') as resultfile:
+            return json.load(resultfile)
+    except (OSError, ValueError):
+        return None
+
+def store_suggestions(fileloc, duration, suggestions):
+    path = cache_path(fileloc, duration)
+    if path is None:
+        return None
+    temppath = path+f'.{os.getpid()}.tmp'
+    try:
+        os.makedirs(ANALYSIS_DIRECTORY, exist_ok=True)
+        with open(temppath,'w') as resultfile:
+            json.dump(suggestions, resultfile)
+        os.replace(temppath, path)
+    except OSError:
+        try:
+            os.remove(temppath)
+        except OSError:
+            pass
+
+def suggest_starts(fileloc, duration, count=SUGGESTIONS): # Decodes the song if it has not
+    suggestions = cached_suggestions(fileloc, duration) # been analysed before.
+    if suggestions is not None:
+        return suggestions[:count]
+    from kathysong_audio import decode_song
+    segment = decode_song(fileloc)
+    suggestions = suggest_from_pcm(segment.raw_data, segment.channels, segment.sample_width,
+                                   segment.frame_rate, duration, SUGGESTIONS)
+    store_suggestions(fileloc, duration, suggestions)
+    return suggestions[:count]
+
+def suggest_job(item): # For the process pool; a song that cannot be decoded gets no
+    fileloc, duration = item # suggestions rather than stopping the whole run.
+    try:
+        return suggest_starts(fileloc, duration)
+    except Exception:
+        return []
+
+def suggest_many(items, workers=ANALYSIS_WORKERS, progress=None): # items are (fileloc,
+    items = list(items) # duration) pairs; yields {(fileloc, duration): suggestions}.
+    results = {}
+    todo = []
+    for item in items:
+        cached = cached_suggestions(*item)
+        if cached is not None:
+            results[item] = cached
+        else:
+            todo.append(item)
+    if todo != []:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            for item, suggestions in zip(todo, pool.map(suggest_job, todo)):
+                results[item] = suggestions
+                if progress is not None:
+                    progress(len(results), len(items))
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--library':
+        from kathysong_library import MusicLibrary
+        library = MusicLibrary()
+        items = [(path, EXCERPT_LENGTH) for path in library.paths()]
+        library.close()
+    elif len(sys.argv) > 1:
+        from kathysong_gamefile import load_game
+        items = [(song.fileloc, song.duration) for song in load_game(sys.argv[1])[0]]
+    else:
+        sys.exit('Usage:  python kathysong_analysis.py game.txt | --library')
+    results = suggest_many(items, progress=lambda done, total: print(f'{done}/{total}', end='\r'))
+    print()
+    for (fileloc, duration), suggestions in results.items():
+        print(fileloc, ' '.join(f"{suggestion['start']/1000:.1f}s" for suggestion in suggestions))
@@ -0,0 +1,326 @@
+
+# Audio helpers for KathySong:  decoding song files with Pydub and keeping the
+# excerpts as raw PCM in memory, so they can be handed straight to Simpleaudio
+# without a round trip through a temp.wav file.
+from pydub import AudioSegment
+from pydub.audio_segment import fix_wav_headers
+from pydub.utils import mediainfo
+import simpleaudio as sa
+import numpy as np
+from kathysong_cache import AUDIO_CACHE
+from kathysong_output import audio_output
+from kathysong_trace import span
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import threading
+import wave
+import os
+
+PRERENDER_WORKERS = max(2, min(8, os.cpu_count() or 2)) # Decoding mostly waits on ffmpeg.
+WINDOW_MARGIN = 250 # Milliseconds decoded either side of a seek, then trimmed off.
+CHUNK_LENGTH = 5000 # Milliseconds per chunk when the editor decodes a song progressively.
+
+def decode_song(fileloc): # Decodes a whole song file into an AudioSegment.
+    if fileloc[-1] == '3':
+        return AudioSegment.from_mp3(fileloc)
+    return AudioSegment.from_wav(fileloc)
+
+def seek_wav(fileloc, start, duration): # Reads only the frames wanted from a PCM WAV file.
+    with wave.open(fileloc,'rb') as wavefile:
+        if wavefile.getsampwidth() == 3: # Pydub widens 24-bit audio on load; let it.
+            return None
+        rate = wavefile.getframerate()
+        first = int(start*rate/1000)
+        if first > wavefile.getnframes():
+            return None
+        wavefile.setpos(first)
+        if duration is None:
+            count = wavefile.getnframes() - first
+        else:
+            count = int(duration*rate/1000)
+        return AudioSegment(data=wavefile.readframes(count),sample_width=wavefile.getsampwidth(),
+                            frame_rate=rate,channels=wavefile.getnchannels())
+
+def seek_mp3(fileloc, start, duration): # Has ffmpeg seek in the input before decoding.
+    lead = min(start, WINDOW_MARGIN)
+    command = [AudioSegment.converter, '-v', 'error', '-ss', str((start-lead)/1000), '-i', fileloc]
+    if duration is not None:
+        command += ['-t', str((lead+duration+WINDOW_MARGIN)/1000)]
+    command += ['-vn', '-f', 'wav', '-']
+    output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if output.returncode != 0 or len(output.stdout) == 0:
+        return None
+    data = bytearray(output.stdout)
+    fix_wav_headers(data) # ffmpeg cannot fill in the sizes when writing to a pipe.
+    segment = AudioSegment(data=bytes(data))
+    if duration is None:
+        return segment[lead:]
+    if len(segment) < lead + duration: # The seek overshot, or the song is too short;
+        return None # either way the full decode decides what is really there.
+    return segment[lead:lead+duration]
+
+def decode_window(fileloc, start, duration=None): # Decodes only [start, start+duration)
+    try: # of a song (or to its end if duration is None), falling back on the full decode.
+        if fileloc[-1] == '3':
+            segment = seek_mp3(fileloc, start, duration)
+        else:
+            segment = seek_wav(fileloc, start, duration)
+    except (OSError, EOFError, wave.Error):
+        segment = None
+    if segment is None:
+        songas = decode_song(fileloc)
+        if duration is None:
+            return songas[start:]
+        return songas[start:start+duration]
+    return segment
+
+def probe_length(fileloc): # Song length in milliseconds, without decoding the audio, or
+    try: # None if the file's headers do not say; a ChunkedDecoder knows once it finishes.
+        if fileloc[-1] == '3':
+            return 1000*float(mediainfo(fileloc)['duration'])
+        with wave.open(fileloc,'rb') as wavefile:
+            return 1000*wavefile.getnframes()/wavefile.getframerate()
+    except (OSError, EOFError, KeyError, ValueError, wave.Error):
+        return None
+
+class PCMExcerpt(): # A decoded excerpt:  the PCM bytes plus the format needed to play them.
+    def __init__(self, data, channels, sample_width, frame_rate):
+        self.data = data
+        self.channels = channels
+        self.sample_width = sample_width
+        self.frame_rate = frame_rate
+
+    @classmethod
+    def from_segment(cls, segment):
+        return cls(segment.raw_data, segment.channels, segment.sample_width, segment.frame_rate)
+
+    def duration_ms(self):
+        return 1000*len(self.data)/(self.channels*self.sample_width*self.frame_rate)
+
+    def with_gain(self, gain): # A copy louder by gain dB, clipped; for 16-bit PCM only.
+        if gain == 0 or self.sample_width != 2:
+            return self
+        samples = np.frombuffer(self.data, dtype='<i2').astype(np.float32)*np.float32(10**(gain/20))
+        data = np.clip(np.rint(samples), -32768, 32767).astype('<i2').tobytes()
+        return PCMExcerpt(data, self.channels, self.sample_width, self.frame_rate)
+
+    def get_waveobject(self):
+        return sa.WaveObject(self.data, self.channels, self.sample_width, self.frame_rate)
+
+    def play(self): # Returns a voice with the methods of a Simpleaudio PlayObject, through
+        return audio_output().play(self) # the shared output (see kathysong_output).
+
+    def play_timed(self): # Also yields when the excerpt became audible on the perf_counter()
+        return audio_output().play_timed(self) # clock, and how long play() took.
+
+def render_excerpt(fileloc, start, duration): # The on-disk cache is consulted first.
+    with span('excerpt.render', cached=True) as timing:
+        cached = AUDIO_CACHE.load(fileloc, start, duration)
+        if cached is not None:
+            return PCMExcerpt(*cached)
+        timing.set(cached=False)
+        excerpt = PCMExcerpt.from_segment(decode_window(fileloc, start, duration))
+        AUDIO_CACHE.store(fileloc, start, duration, excerpt.data, excerpt.channels, excerpt.sample_width, excerpt.frame_rate)
+        return excerpt
+
+class PreRenderer(): # Decodes every excerpt of a game on a pool of worker threads
+    def __init__(self, game, workers=PRERENDER_WORKERS): # when play starts, so that
+        self.game = game # a round only has to wait if its excerpt is not ready yet.
+        self.workers = workers
+        self.futures = [None]*len(game)
+        self.finished = 0
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def start(self): # Excerpts are queued in game order, so the next round is
+        self.pool = ThreadPoolExecutor(max_workers=self.workers) # always the next one decoded.
+        for index in range(len(self.game)):
+            self.prefetch(index)
+
+    def prefetch(self, index):
+        if self.pool is None or index >= len(self.game):
+            return None
+        with self.lock:
+            if self.futures[index] is None:
+                self.futures[index] = self.pool.submit(self.render, index)
+                self.futures[index].add_done_callback(self.count_finished)
+
+    def render(self, index): # On a worker thread.
+        with span('prerender', round=index):
+            return self.game[index].get_excerpt()
+
+    def count_finished(self, future):
+        with self.lock:
+            self.finished += 1
+
+    def progress(self): # Safe to call from Tk; the count is only updated by workers.
+        return self.finished, len(self.game)
+
+    def is_ready(self, index):
+        return self.futures[index] is not None and self.futures[index].done()
+
+    def get(self, index): # Blocks until the excerpt is decoded; None if decoding failed.
+        self.prefetch(index)
+        self.prefetch(index+1)
+        if self.futures[index] is None:
+            return None
+        try:
+            return self.futures[index].result()
+        except Exception:
+            return None
+
+    def cancel(self): # Stops queued work and drops the decoded buffers.
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+        self.futures = [None]*len(self.game)
+
+class ChunkedDecoder(): # Decodes a whole song a chunk at a time on a background thread,
+    def __init__(self, fileloc, chunk_length=CHUNK_LENGTH): # so that the song editor can
+        self.fileloc = fileloc # play and scrub through whatever has been decoded so far.
+        self.chunk_length = chunk_length
+        self.chunks = []
+        self.whole = None # The whole song in one buffer, once decoded; the chunks are then
+        self.channels = self.sample_width = self.frame_rate = None # views into it.
+        self.chunk_frames = 0
+        self.finished = False
+        self.error = None
+        self.stopping = False
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping = True
+
+    def run(self):
+        with span('song.decode', cached=True) as timing:
+            try:
+                if self.load_cached():
+                    return None
+                timing.set(cached=False)
+                if self.fileloc[-1] == '3':
+                    self.decode_stream()
+                else:
+                    try:
+                        self.decode_wav()
+                    except wave.Error: # Not plain PCM; ffmpeg can still read it.
+                        self.decode_stream()
+                if not self.stopping:
+                    whole = b''.join(self.chunks)
+                    self.consolidate(whole)
+                    AUDIO_CACHE.store(self.fileloc, 0, None, whole, self.channels, self.sample_width, self.frame_rate)
+            except Exception as err:
+                self.error = err
+            finally:
+                self.finished = True
+
+    def load_cached(self): # The whole song from the on-disk cache, cut into chunks.
+        cached = AUDIO_CACHE.load(self.fileloc, 0, None)
+        if cached is None:
+            return False
+        data, channels, sample_width, frame_rate = cached
+        self.set_format(channels, sample_width, frame_rate)
+        self.consolidate(data)
+        return True
+
+    def set_format(self, channels, sample_width, frame_rate):
+        self.channels, self.sample_width, self.frame_rate = channels, sample_width, frame_rate
+        self.chunk_frames = int(self.chunk_length*frame_rate/1000)
+
+    def add_chunk(self, data):
+        with self.lock:
+            self.chunks.append(data)
+
+    def consolidate(self, whole): # Swaps the chunks for views into one buffer, so a slice
+        view = memoryview(whole) # of any length can be handed out without copying.
+        chunk_bytes = self.chunk_frames*self.channels*self.sample_width
+        with self.lock:
+            self.chunks = [view[offset:offset+chunk_bytes] for offset in range(0, len(whole), chunk_bytes)]
+            self.whole = whole
+
+    def decode_wav(self):
+        with wave.open(self.fileloc,'rb') as wavefile:
+            if wavefile.getsampwidth() == 3:
+                raise wave.Error("24-bit audio is left to ffmpeg")
+            self.set_format(wavefile.getnchannels(), wavefile.getsampwidth(), wavefile.getframerate())
+            while not self.stopping:
+                data = wavefile.readframes(self.chunk_frames)
+                if len(data) == 0:
+                    break
+                self.add_chunk(data)
+
+    def decode_stream(self): # ffmpeg writes raw 16-bit PCM to a pipe as it decodes.
+        info = mediainfo(self.fileloc)
+        self.set_format(int(info['channels']), 2, int(info['sample_rate']))
+        command = [AudioSegment.converter, '-v', 'error', '-i', self.fileloc, '-vn',
+                   '-f', 's16le', '-acodec', 'pcm_s16le', '-']
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        chunk_bytes = self.chunk_frames*self.channels*self.sample_width
+        try:
+            while not self.stopping:
+                data = process.stdout.read(chunk_bytes)
+                if len(data) == 0:
+                    break
+                self.add_chunk(data)
+        finally:
+            process.kill()
+            process.wait()
+
+    def decoded_frames(self):
+        if self.frame_rate is None:
+            return 0
+        with self.lock:
+            return sum(len(chunk) for chunk in self.chunks)//(self.channels*self.sample_width)
+
+    def decoded_ms(self):
+        if self.frame_rate is None:
+            return 0
+        return 1000*self.decoded_frames()/self.frame_rate
+
+    def slice(self, start, end=None): # PCM bytes for [start, end) ms, joining only the
+        if self.frame_rate is None: # chunks that overlap it; cut short at what is decoded.
+            return b''
+        first = int(start*self.frame_rate/1000)
+        last = None if end is None else int(end*self.frame_rate/1000)
+        return bytes(self.view(first, last))
+
+    def view(self, first, last=None): # PCM for frames [first, last), cut short at what is
+        if self.frame_rate is None: # decoded.  A memoryview rather than a copy once the song
+            return memoryview(b'') # is decoded, or when the frames lie in one chunk.
+        frame_width = self.channels*self.sample_width
+        with self.lock:
+            chunks, whole = list(self.chunks), self.whole
+        decoded = sum(len(chunk) for chunk in chunks)//frame_width
+        last = decoded if last is None else min(last, decoded)
+        if first >= last:
+            return memoryview(b'')
+        if whole is not None:
+            return memoryview(whole)[first*frame_width:last*frame_width]
+        index = first//self.chunk_frames
+        if last <= (index+1)*self.chunk_frames:
+            chunkstart = index*self.chunk_frames
+            return memoryview(chunks[index])[(first-chunkstart)*frame_width:(last-chunkstart)*frame_width]
+        pieces = []
+        for index in range(first//self.chunk_frames, (last-1)//self.chunk_frames+1):
+            chunkstart = index*self.chunk_frames
+            low = max(first-chunkstart, 0)*frame_width
+            high = (min(last, chunkstart+self.chunk_frames)-chunkstart)*frame_width
+            pieces.append(chunks[index][low:high])
+        return memoryview(b''.join(pieces))
+
+    def excerpt(self, start, duration=None): # None until the audio wanted is decoded;
+        if self.frame_rate is None: # without a duration, whatever is decoded from start on.
+            return None
+        first = int(start*self.frame_rate/1000)
+        if duration is None:
+            data = self.view(first)
+        elif self.finished or self.decoded_ms() >= start + duration:
+            data = self.view(first, int((start + duration)*self.frame_rate/1000))
+        else:
+            return None
+        if len(data) == 0:
+            return None
+        return PCMExcerpt(data, self.channels, self.sample_width, self.frame_rate)
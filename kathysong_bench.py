@@ -0,0 +1,298 @@
+
+# Benchmarks for KathySong's hot paths:  excerpt decoding, whole-song loads as the
+# song editor does them, answer matching, the game file round trip and the game
+# editor's moves and removals on a marathon-sized list, and the time and memory
+# a library-sized game of a hundred thousand songs takes to load.  Each run
+# builds a synthetic library of WAV files (and MP3s, if ffmpeg is installed) and
+# writes its results as JSON, so that runs of different versions can be compared:
+#     python kathysong_bench.py --songs 50 --seconds 30 --output new.json --baseline old.json
+import argparse
+import array
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from kathysong_engine import Song, ACCEPTANCES
+from kathysong_songlist import SongList
+from kathysong_gamefile import load_game, save_game, iter_game_file
+from kathysong_audio import ChunkedDecoder
+from kathysong_cache import AUDIO_CACHE
+
+WORDS = ['love','baby','night','heart','dancing','rock','believin','stop','time','girl','dream','fire',
+         'the','a','of','on','in','my','bay','rhapsody','bohemian','sittin','dock','friday','monday']
+MATCH_BUDGET = 0.001 # Seconds a single guess may take to score, even in fuzzy mode.
+FRAME_RATE = 44100
+EXCERPT_LENGTH = 5000 # Milliseconds per excerpt, as a typical game would have.
+REGRESSION = 1.2 # A p50 this many times the baseline's is reported as a regression.
+
+def percentile(samples, fraction): # samples must be sorted.
+    return samples[min(len(samples)-1, int(fraction*len(samples)))]
+
+def summarize(latencies, elapsed=None, units=None): # Latencies in seconds; units counts
+    latencies = sorted(latencies) # whatever throughput is measured in (songs, bytes...).
+    elapsed = sum(latencies) if elapsed is None else elapsed
+    result = {'calls':len(latencies),'mean_us':1e6*sum(latencies)/len(latencies),
+              'p50_us':1e6*percentile(latencies,0.5),'p90_us':1e6*percentile(latencies,0.9),
+              'p99_us':1e6*percentile(latencies,0.99),'max_us':1e6*latencies[-1],
+              'per_second':len(latencies)/elapsed if elapsed > 0 else 0}
+    if units is not None:
+        result['units_per_second'] = units/elapsed if elapsed > 0 else 0
+    return result
+
+def timed(function, items): # Calls function on each item; yields the latencies.
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        function(item)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def peak_memory(function, items): # Peak Python allocation in MB over one more pass.  Kept
+    tracemalloc.start() # apart from the timed passes, which tracemalloc would slow down.
+    try:
+        for item in items:
+            function(item)
+        return tracemalloc.get_traced_memory()[1]/(1024*1024)
+    finally:
+        tracemalloc.stop()
+
+def write_wav(path, seconds, rng): # A stereo 16-bit tone with some noise, so that it is
+    frames = int(seconds*FRAME_RATE) # not trivially compressible.
+    pitch = rng.uniform(110, 880)
+    samples = array.array('h')
+    step = 2*math.pi*pitch/FRAME_RATE
+    for frame in range(frames):
+        value = int(8000*math.sin(step*frame)) + rng.randint(-500, 500)
+        samples.append(value)
+        samples.append(value)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    with wave.open(path,'wb') as wavefile:
+        wavefile.setnchannels(2)
+        wavefile.setsampwidth(2)
+        wavefile.setframerate(FRAME_RATE)
+        wavefile.writeframes(samples.tobytes())
+
+def make_library(directory, count, seconds, mp3=False, seed=0): # Yields the file paths;
+    rng = random.Random(seed) # MP3s are encoded from the WAVs when ffmpeg is installed.
+    paths = []
+    for number in range(count):
+        path = os.path.join(directory, f'song{number:04}.wav')
+        write_wav(path, seconds, rng)
+        paths.append(path)
+    if mp3 and shutil.which('ffmpeg'):
+        for path in list(paths):
+            mp3path = path[:-4]+'.mp3'
+            subprocess.run(['ffmpeg','-v','error','-y','-i',path,'-b:a','192k',mp3path],check=True)
+            paths.append(mp3path)
+    return paths
+
+def add_typo(text, rng): # One swapped, dropped or changed letter.
+    if len(text) < 2:
+        return text
+    place = rng.randrange(len(text)-1)
+    kind = rng.choice(['swap','drop','change'])
+    if kind == 'swap':
+        return text[:place] + text[place+1] + text[place] + text[place+2:]
+    elif kind == 'drop':
+        return text[:place] + text[place+1:]
+    return text[:place] + rng.choice('abcdefghijklmnopqrstuvwxyz') + text[place+1:]
+
+def make_songs(count, rng): # Synthetic songs; the files need not exist to be matched.
+    songs = []
+    for number in range(count):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1,5))).title()
+        if rng.random() < 0.2:
+            title = '(' + rng.choice(WORDS).title() + ') ' + title
+        songs.append(Song([title],rng.choice(WORDS).title(),'','song.mp3',0,500))
+    return songs
+
+def make_guesses(song, rng): # A right answer, a near miss and a wrong answer for a song.
+    title = song.titles[-1]
+    return [title, add_typo(title, rng), ' '.join(rng.choice(WORDS) for _ in range(3))]
+
+def bench_matching(count=500, seed=0): # Latency of Song.compare per guess, in every mode.
+    rng = random.Random(seed)
+    songs = make_songs(count, rng)
+    for song in songs: # As GameEngine.start_song does before each round.
+        song.get_matcher()
+    guesses = [(song, guess) for song in songs for guess in make_guesses(song, rng)]
+    results = {}
+    for strictness in ACCEPTANCES:
+        latencies = []
+        for song, guess in guesses:
+            start = time.perf_counter()
+            song.compare(guess, strictness)
+            latencies.append(time.perf_counter() - start)
+        results[strictness] = summarize(latencies)
+    return results
+
+def library_songs(paths, seconds, rng): # One song per file, its excerpt somewhere inside.
+    songs = []
+    for path in paths:
+        start = rng.uniform(0, max(0, seconds*1000 - EXCERPT_LENGTH))
+        songs.append(Song([os.path.basename(path)],'Bench','',path,round(start,1),EXCERPT_LENGTH))
+    return songs
+
+def bench_excerpts(songs, cache_directory): # Song.get_waveobject, with the on-disk cache off
+    results = {} # and then warmed up; the cache is restored afterwards.
+    directory, limit = AUDIO_CACHE.directory, AUDIO_CACHE.limit
+    try:
+        for kind in sorted(set(os.path.splitext(song.fileloc)[1] for song in songs)):
+            chosen = [song for song in songs if song.fileloc.endswith(kind)]
+            AUDIO_CACHE.limit = 0
+            latencies = timed(Song.get_waveobject, chosen)
+            results['cold'+kind] = summarize(latencies, units=len(chosen)*EXCERPT_LENGTH/1000)
+            results['cold'+kind]['peak_mb'] = peak_memory(Song.get_waveobject, chosen)
+            AUDIO_CACHE.directory, AUDIO_CACHE.limit = cache_directory, limit if limit > 0 else 1024*1024*1024
+            os.makedirs(cache_directory, exist_ok=True)
+            for song in chosen:
+                song.get_excerpt()
+            latencies = timed(Song.get_waveobject, chosen)
+            results['warm'+kind] = summarize(latencies, units=len(chosen)*EXCERPT_LENGTH/1000)
+            AUDIO_CACHE.directory, AUDIO_CACHE.limit = directory, limit
+    finally:
+        AUDIO_CACHE.directory, AUDIO_CACHE.limit = directory, limit
+    return results # units_per_second is seconds of audio decoded per second.
+
+def full_load(path): # As the song editor loads a song, waiting for the last chunk.
+    decoder = ChunkedDecoder(path)
+    decoder.start()
+    decoder.thread.join()
+    if decoder.error is not None:
+        raise decoder.error
+    return decoder
+
+def bench_full_loads(paths, seconds): # Whole songs, with the on-disk cache off.
+    results = {}
+    limit = AUDIO_CACHE.limit
+    AUDIO_CACHE.limit = 0
+    try:
+        for kind in sorted(set(os.path.splitext(path)[1] for path in paths)):
+            chosen = [path for path in paths if path.endswith(kind)]
+            latencies = timed(full_load, chosen)
+            results[kind] = summarize(latencies, units=len(chosen)*seconds)
+            results[kind]['peak_mb'] = peak_memory(full_load, chosen[:3])
+    finally:
+        AUDIO_CACHE.limit = limit
+    return results
+
+def bench_round_trip(songs, directory, repeats=20): # save_game then load_game of one game.
+    path = os.path.join(directory, 'bench game.txt')
+    def round_trip(_):
+        save_game(songs, path)
+        game, missing, problems = load_game(path)
+        assert len(game) == len(songs) and problems == []
+    latencies = timed(round_trip, range(repeats))
+    result = summarize(latencies, units=repeats*len(songs))
+    result['peak_mb'] = peak_memory(round_trip, range(1))
+    return result # units_per_second is songs saved and loaded per second.
+
+def make_catalog(path, count, rng): # A game file laid out as a music library is:  many songs
+    artists = [' '.join(rng.choice(WORDS) for _ in range(2)).title() for _ in range(max(1, count//250))]
+    with open(path,'w') as gamefile: # to a folder, a few folders to an artist.
+        for number in range(count):
+            artist = rng.choice(artists)
+            title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1,5))).title()
+            if rng.random() < 0.2:
+                title = '(' + rng.choice(WORDS).title() + ') ' + title
+            fileloc = f'C:/Users/Kathy/Music/{artist}/Album {rng.randint(1,5)}/{number%20+1:02} {title}.mp3'
+            gamefile.write(f'{fileloc}\n{title}\n{artist}\n\n{rng.randint(0,200)}.0\n500|-14.0\n')
+
+def bench_catalog(directory, count=100000, repeats=3, seed=0): # Reading a library-sized game:
+    path = os.path.join(directory, 'bench catalog.txt') # the time, and the memory the songs
+    make_catalog(path, count, random.Random(seed)) # keep once loaded.
+    latencies = timed(lambda _: list(iter_game_file(path)), range(repeats))
+    result = summarize(latencies, units=repeats*count)
+    tracemalloc.start()
+    try:
+        game = list(iter_game_file(path))
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    result['retained_mb'] = retained/(1024*1024)
+    result['bytes_per_song'] = retained/len(game)
+    return result # units_per_second is songs loaded per second.
+
+def bench_song_list(songs, repeats=20, seed=0): # The game editor's edits of a long list,
+    rng = random.Random(seed) # with a tenth of its songs chosen.  Each edit starts from
+    results = {} # the same list, so removals do not shrink it.
+    for edit in ('raise_rows','lower_rows','to_top','remove','shuffle'):
+        latencies = []
+        for _ in range(repeats):
+            songlist = SongList(list(songs))
+            songlist.selected = set(rng.sample(range(len(songs)), len(songs)//10))
+            start = time.perf_counter()
+            getattr(songlist, edit)()
+            latencies.append(time.perf_counter() - start)
+        results[edit] = summarize(latencies)
+    return results
+
+def run_suite(count=20, seconds=30, mp3=False, seed=0, catalog=100000):
+    rng = random.Random(seed)
+    started = time.time()
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_library(directory, count, seconds, mp3, seed)
+        songs = library_songs(paths, seconds, rng)
+        results = {'excerpts':bench_excerpts(songs, os.path.join(directory,'Cache')),
+                   'full_loads':bench_full_loads(paths, seconds),
+                   'matching':bench_matching(seed=seed),
+                   'round_trip':bench_round_trip(make_songs(max(count, 500), rng), directory),
+                   'song_list':bench_song_list(make_songs(10000, rng), seed=seed),
+                   'catalog':bench_catalog(directory, catalog, seed=seed)}
+    return {'meta':{'time':started,'python':platform.python_version(),'platform':platform.platform(),
+                    'songs':count,'seconds':seconds,'catalog':catalog,'mp3':mp3 and shutil.which('ffmpeg') is not None,'seed':seed},
+            'results':results}
+
+def flatten(results, prefix=''): # {'excerpts/cold.wav': {...}, ...}
+    flat = {}
+    for name, value in results.items():
+        if 'p50_us' in value:
+            flat[prefix+name] = value
+        else:
+            flat.update(flatten(value, prefix+name+'/'))
+    return flat
+
+def report(suite, baseline=None):
+    old = flatten(baseline['results']) if baseline is not None else {}
+    for name, result in flatten(suite['results']).items():
+        line = (f"{name:24} p50 {result['p50_us']:10.1f} us  p99 {result['p99_us']:10.1f} us  "
+                f"{result['per_second']:10.1f}/s")
+        if 'peak_mb' in result:
+            line += f"  peak {result['peak_mb']:7.1f} MB"
+        if 'retained_mb' in result:
+            line += f"  kept {result['retained_mb']:7.1f} MB ({result['bytes_per_song']:.0f} B/song)"
+        if name.startswith('matching/'):
+            line += '  ok' if result['p99_us'] < 1e6*MATCH_BUDGET else '  OVER BUDGET'
+        if name in old and old[name]['p50_us'] > 0:
+            ratio = result['p50_us']/old[name]['p50_us']
+            line += f"  x{ratio:.2f}" + ('  REGRESSION' if ratio > REGRESSION else '')
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark KathySong on a synthetic music library.')
+    parser.add_argument('--songs', type=int, default=20, help='files in the library')
+    parser.add_argument('--seconds', type=float, default=30, help='length of each file')
+    parser.add_argument('--mp3', action='store_true', help='also encode MP3s (needs ffmpeg)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--catalog', type=int, default=100000, help='songs in the library-sized game loaded')
+    parser.add_argument('--output', help='file to write the results to, as JSON')
+    parser.add_argument('--baseline', help='results of an earlier run to compare against')
+    args = parser.parse_args()
+    suite = run_suite(args.songs, args.seconds, args.mp3, args.seed, args.catalog)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline,'r') as baselinefile:
+            baseline = json.load(baselinefile)
+    report(suite, baseline)
+    if args.output:
+        with open(args.output,'w') as outputfile:
+            json.dump(suite, outputfile, indent=1)
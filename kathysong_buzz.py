@@ -0,0 +1,44 @@
+
+# Buzz arbitration for KathySong.  Each buzz is stamped with the time of the key
+# event itself rather than the time its handler happened to run, converted onto
+# the time.perf_counter() clock, and the earliest stamp wins.  Key events that
+# arrive in the same batch are therefore ordered as they were pressed, not by
+# which player's handler is checked first.
+import time
+
+RESYNC = 1.0 # Seconds of disagreement after which the event clock is assumed to have
+             # wrapped around or jumped, and the offset is measured afresh.
+
+class BuzzArbiter():
+    def __init__(self):
+        self.offset = None # perf_counter() minus event time, at its smallest so far:  the
+        self.buzzes = {}   # event that was handled soonest after it happened.
+
+    def event_time(self, event): # When a Tk event happened, in perf_counter() seconds.
+        now = time.perf_counter()
+        stamp = getattr(event, 'time', None) # Milliseconds, on the window system's clock.
+        if not isinstance(stamp, int) or stamp <= 0: # Events generated by the program
+            return now # itself carry no timestamp.
+        offset = now - stamp/1000
+        if self.offset is None or offset < self.offset or offset - self.offset > RESYNC:
+            self.offset = offset
+        return min(now, stamp/1000 + self.offset)
+
+    def buzz(self, player, event=None, stamp=None): # Only a player's first buzz counts.
+        if player not in self.buzzes:
+            if stamp is None:
+                stamp = self.event_time(event)
+            self.buzzes[player] = stamp
+        return self.buzzes[player]
+
+    def first(self): # (player, time) of the earliest buzz, or None if nobody has buzzed.
+        if len(self.buzzes) == 0:
+            return None
+        player = min(self.buzzes, key=lambda player: (self.buzzes[player], player))
+        return player, self.buzzes[player]
+
+    def order(self): # Every buzz so far, earliest first.
+        return sorted(self.buzzes.items(), key=lambda buzz: (buzz[1], buzz[0]))
+
+    def reset(self):
+        self.buzzes = {}
@@ -0,0 +1,136 @@
+
+# An on-disk cache of decoded audio for KathySong.  Excerpts (and whole songs
+# opened in the song editor) are stored as WAV files named after a hash of the
+# song's path, modification time and size plus the excerpt's start and duration,
+# so that a changed song file is never served stale audio.  The least recently
+# used files are evicted once the cache grows past its size limit; the folder is
+# only listed then, with a running total of what was stored in between, and the
+# eviction leaves room for a good many more stores before the next.  Files are
+# written under a temporary name and renamed into place, so two KathySong
+# instances can share the folder; anything missing or half-deleted is a miss.
+import hashlib
+import threading
+import time
+import wave
+import os
+
+CACHE_DIRECTORY = './Cache'
+CACHE_LIMIT_MB = int(os.environ.get('KATHYSONG_CACHE_MB', 1024)) # 0 turns the cache off.
+STALE_TEMP_AGE = 3600 # Seconds after which another instance's unfinished file is junk.
+EVICT_TO = 0.9 # Eviction brings the cache down to this fraction of its limit.
+
+class AudioCache():
+    def __init__(self, directory=CACHE_DIRECTORY, limit_mb=CACHE_LIMIT_MB):
+        self.directory = directory
+        self.limit = limit_mb*1024*1024
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.estimate = None # Bytes in the cache:  the size at the last eviction plus what this
+        self.lock = threading.Lock() # instance has stored since, or None before the first.
+
+    def key(self, fileloc, start, duration): # None if the song file cannot be read.
+        try:
+            stat = os.stat(fileloc)
+        except OSError:
+            return None
+        text = '|'.join([os.path.abspath(fileloc),str(stat.st_mtime_ns),str(stat.st_size),str(start),str(duration)])
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key+'.wav')
+
+    def count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter)+1)
+
+    def load(self, fileloc, start, duration): # Yields (data, channels, sample_width,
+        key = self.key(fileloc, start, duration) # frame_rate), or None on a miss.
+        if self.limit <= 0 or key is None:
+            return None
+        try:
+            with wave.open(self.path(key),'rb') as wavefile:
+                cached = (wavefile.readframes(wavefile.getnframes()),wavefile.getnchannels(),
+                          wavefile.getsampwidth(),wavefile.getframerate())
+            os.utime(self.path(key)) # The modification time doubles as the last use.
+        except (OSError, EOFError, wave.Error):
+            self.count('misses')
+            return None
+        self.count('hits')
+        return cached
+
+    def store(self, fileloc, start, duration, data, channels, sample_width, frame_rate):
+        key = self.key(fileloc, start, duration)
+        if self.limit <= 0 or key is None or len(data) > self.limit//4:
+            return None # Very long songs would push everything else out.
+        temppath = self.path(key)+f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with wave.open(temppath,'wb') as wavefile:
+                wavefile.setnchannels(channels)
+                wavefile.setsampwidth(sample_width)
+                wavefile.setframerate(frame_rate)
+                wavefile.writeframes(data)
+            os.replace(temppath, self.path(key))
+        except OSError: # e.g. another instance is reading the same file on Windows.
+            try:
+                os.remove(temppath)
+            except OSError:
+                pass
+            return None
+        with self.lock:
+            self.stores += 1
+            if self.estimate is not None: # Stores by other instances are counted at the next
+                self.estimate += len(data) # eviction; overwriting a file counts it twice, which
+            due = self.estimate is None or self.estimate > self.limit # only brings that forward.
+        if due:
+            self.evict()
+
+    def entries(self): # (path, size, last use) of every cache file, oldest first.
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue # Evicted by another instance in the meantime.
+            if name.endswith('.tmp'):
+                if time.time() - stat.st_mtime > STALE_TEMP_AGE:
+                    entries.append((path, stat.st_size, 0))
+            elif name.endswith('.wav'):
+                entries.append((path, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def size(self):
+        return sum(entry[1] for entry in self.entries())
+
+    def evict(self): # Removes least recently used files until the cache is EVICT_TO of its
+        entries = self.entries() # limit, or within it if it was no bigger.
+        total = sum(entry[1] for entry in entries)
+        target = self.limit if total <= self.limit else int(self.limit*EVICT_TO)
+        for path, size, lastuse in entries:
+            if total <= target and lastuse != 0:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.count('evictions')
+        with self.lock:
+            self.estimate = total
+
+    def stats(self): # For sizing the cache:  a low hit rate means it is too small.
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits':self.hits,'misses':self.misses,'stores':self.stores,'evictions':self.evictions,
+                    'hit_rate':self.hits/lookups if lookups else 0.0,'size_mb':self.size()/(1024*1024),
+                    'limit_mb':self.limit/(1024*1024)}
+
+AUDIO_CACHE = AudioCache() # Shared by the audio helpers and the song editor.
@@ -0,0 +1,324 @@
+
+# The rules of a KathySong game, kept apart from the Tk windows that drive them,
+# so that a game can just as well be played by a script (see kathysong_headless):
+# the song object, how guesses are matched against its titles, and the engine
+# that runs the rounds.  Times are in seconds on whichever clock the caller uses;
+# the play window uses time.perf_counter(), the headless runner seconds from the
+# start of each excerpt.  Nothing here needs the audio modules until an excerpt
+# is actually wanted, so they are imported then.
+from kathysong_buzz import BuzzArbiter
+from kathysong_trace import span
+import collections
+import sys
+
+ARTICLES = ('a','an','the') # Words loose mode lets a guesser leave out.
+ACCEPTANCES = ['strict','inclusive','loose','fuzzy'] # How strictly guesses are judged.
+CONTESTANT_SLOTS = {'single':[1],'dual':[0,2],'triple':[0,1,2]} # Keyboard positions in use.
+
+def simplify(words): # Removes punctuation and capitalization from a phrase.
+    def alfilter(char): # Used to compare song title to guess in 'strict' mode,
+        if char in "abcdefghijklmnopqrstuvwxyz ":
+            return True # e.g. "Don't Stop Believin'" => "dont stop believin"
+        return False
+    return ''.join(filter(alfilter,words.lower())).strip()
+
+def typo_allowance(length): # Typos forgiven in fuzzy mode, by the length of the title.
+    if length < 4:
+        return 0
+    elif length < 9:
+        return 1
+    elif length < 16:
+        return 2
+    return 3
+
+def within_distance(first, second, limit): # Whether first can be made into second with at
+    if abs(len(first) - len(second)) > limit: # most limit insertions, deletions, changes or
+        return False # swaps of neighbouring letters.  Only the band of the table within
+    if limit == 0: # limit of the diagonal is filled in, and it gives up as soon as a whole
+        return first == second # row costs more than limit.
+    outside = limit + 1
+    before = None
+    row = list(range(len(second)+1))
+    for i in range(1, len(first)+1):
+        current = [outside]*(len(second)+1)
+        current[0] = i
+        low, high = max(1, i-limit), min(len(second), i+limit)
+        rowmin = i
+        for j in range(low, high+1):
+            value = min(row[j]+1, current[j-1]+1, row[j-1]+(first[i-1] != second[j-1]))
+            if i > 1 and j > 1 and first[i-1] == second[j-2] and first[i-2] == second[j-1]:
+                value = min(value, before[j-2]+1)
+            current[j] = value
+            if value < rowmin:
+                rowmin = value
+        if rowmin > limit:
+            return False
+        before, row = row, current
+    return row[len(second)] <= limit
+
+class Automaton(): # An Aho-Corasick automaton:  finds which of a fixed list of phrases
+    def __init__(self, phrases): # occur anywhere in a text in a single pass over it.
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [set()] # The numbers of the phrases that end at each state.
+        for number, phrase in enumerate(phrases):
+            state = 0
+            for char in phrase:
+                if char not in self.goto[state]:
+                    self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                state = self.goto[state][char]
+            self.output[state].add(number)
+        queue = collections.deque(self.goto[0].values())
+        while queue: # Breadth first, so every fallback state is finished before it is used.
+            state = queue.popleft()
+            for char, nextstate in self.goto[state].items():
+                queue.append(nextstate)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nextstate] = self.goto[fallback].get(char, 0)
+                self.output[nextstate] |= self.output[self.fail[nextstate]]
+
+    def find(self, text): # The numbers of every phrase found in the text.
+        found = set(self.output[0])
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.output[state]:
+                found |= self.output[state]
+        return found
+
+    def any(self, text): # Whether any phrase is found, stopping at the first.
+        if self.output[0]:
+            return True
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.output[state]:
+                return True
+        return False
+
+class SongMatcher(): # Every accepted form of a song's titles, worked out once per song so
+    def __init__(self, titles, artist): # that checking a guess is only a few lookups.
+        forms = []
+        for title in titles:
+            if simplify(title) != '' and simplify(title) not in forms:
+                forms.append(simplify(title))
+        self.exact = frozenset(forms) # Strict mode:  the guess is one of the titles.
+        variants = set(forms) # Inclusive mode:  a title appears anywhere in the guess, e.g.
+        for title in forms: # "Hit Me Baby One More Time" for "Baby One More Time", with
+                            # dropped g's allowed either way round.
+            if title[-2:] == "in":
+                variants.add(title.replace("in ","ing ") + "g")
+            else:
+                variants.add(title.replace("in ","ing "))
+            if title[-3:] == "ing":
+                variants.add(title.replace("ing ","in ")[:-1])
+            else:
+                variants.add(title.replace("ing ","in "))
+        variants.discard('')
+        self.inclusive = Automaton(sorted(variants))
+        self.fuzzy_forms = set(variants) # Fuzzy mode:  inclusive, or the whole guess is within
+        for form in variants: # a few typos of a title, with or without a leading article.
+            if form.split(" ")[0] in ARTICLES and " " in form:
+                self.fuzzy_forms.add(form[form.index(" ")+1:])
+        self.fuzzy_forms = [(form, typo_allowance(len(form))) for form in self.fuzzy_forms]
+        stems = {} # Loose mode:  every word of a title or the artist but the articles
+        self.loose_forms = [] # appears in the guess, less (at most) its last letter,
+        if simplify(artist) != '': # which covers both dropped letters and added g's.
+            forms.append(simplify(artist))
+        for form in forms:
+            required = set()
+            for word in form.split(" "):
+                if word not in ARTICLES and len(word) > 1:
+                    required.add(stems.setdefault(word[:-1], len(stems)))
+            if len(required) == 0: # e.g. "The The"; then the whole title is needed.
+                required.add(stems.setdefault(form, len(stems)))
+            self.loose_forms.append(frozenset(required))
+        self.loose = Automaton(list(stems))
+
+    def accepts(self, guess, strictness): # The guess must already be simplified.
+        if strictness == 'strict':
+            return guess in self.exact
+        elif strictness == 'inclusive':
+            return self.inclusive.any(guess)
+        elif strictness == 'loose':
+            found = self.loose.find(guess)
+            for required in self.loose_forms:
+                if required <= found:
+                    return True
+        elif strictness == 'fuzzy':
+            if self.inclusive.any(guess):
+                return True
+            for form, allowance in self.fuzzy_forms:
+                if within_distance(guess, form, allowance):
+                    return True
+        return False
+
+class Song(): # A song object combines a song file location and relevant data.
+    # Games and libraries can run to a hundred thousand songs, so each is kept small:
+    # no __dict__, one shared copy of each folder, artist and hint (which repeat from
+    # song to song), and no SongMatcher until a guess is judged.
+    __slots__ = ('titles','artist','hint','folder','filename','matcher','package','package_index',
+                 'start','duration','loudness')
+    def __init__(self, titles, artist, hint, fileloc, start, duration, package=None, package_index=None, loudness=None):
+        forms = [titles[0]]
+        for title in titles: # Subtitles of a song are considered optional;
+            if "(" in title and ")" in title and title.index("(") < title.index(")"):
+                nosubtitle = simplify(title[:title.index("(")]+title[title.index(")"):])
+                if nosubtitle not in forms:  # e.g. "(Sittin' On) The Dock
+                    forms.append(nosubtitle) # of the Bay" could be entered
+            if simplify(title) not in forms: # as "the dock of the bay"
+                forms.append(simplify(title)) # or "sittin on the dock of
+        self.titles = tuple(forms)          # the bay" in strict mode.
+        self.artist = sys.intern(artist)
+        self.matcher = None # Built by get_matcher.
+        self.hint = sys.intern(hint)
+        self.package = package # A song from a .kathy package plays its embedded excerpt,
+        self.package_index = package_index # so its original file need not exist.
+        self.fileloc = fileloc # Checked by load_game rather than here.
+        self.start = start
+        self.duration = duration
+        self.loudness = loudness # In LUFS; None until the excerpt is first decoded, or if silent.
+
+    @property
+    def fileloc(self): # Kept as the folder, shared with the other songs in it, and the file name.
+        return self.folder + self.filename
+
+    @fileloc.setter
+    def fileloc(self, fileloc):
+        cut = fileloc.rfind('/') + 1
+        self.folder = sys.intern(fileloc[:cut])
+        self.filename = fileloc[cut:]
+
+    def get_matcher(self): # The song's SongMatcher, worked out the first time it is wanted.
+        if self.matcher is None:
+            self.matcher = SongMatcher(self.titles, self.artist)
+        return self.matcher
+
+    def compare(self,guess,strictness): # See SongMatcher for what each strictness accepts.
+        return self.get_matcher().accepts(simplify(guess),strictness)
+
+    def compare_many(self,guesses,strictness): # For scoring recorded sessions in bulk.
+        matcher = self.get_matcher()
+        return [matcher.accepts(simplify(guess),strictness) for guess in guesses]
+
+    def get_writeable(self): # For writing a song object in a file.
+        # Once the loudness is known, it follows the duration.
+        length = str(self.duration) if self.loudness is None else f'{self.duration}|{self.loudness}'
+        return '\n'.join([self.fileloc,'|'.join(self.titles),self.artist,self.hint,str(self.start),length])
+
+    def get_record(self): # For writing a song object in a .kathy package.
+        return {'titles':list(self.titles),'artist':self.artist,'hint':self.hint,'fileloc':self.fileloc,'start':self.start,'duration':self.duration,
+                'loudness':self.loudness}
+
+    def get_raw_excerpt(self): # The excerpt as decoded.  Its loudness is measured in the same
+        from kathysong_audio import PCMExcerpt, render_excerpt # pass if not yet known (see
+        from kathysong_analysis import excerpt_loudness # kathysong_analysis).
+        if self.package is not None:
+            excerpt = PCMExcerpt(*self.package.excerpt(self.package_index))
+        else:
+            excerpt = render_excerpt(self.fileloc, self.start, self.duration)
+        if self.loudness is None:
+            with span('excerpt.loudness'):
+                self.loudness = excerpt_loudness(excerpt)
+        return excerpt
+
+    def get_excerpt(self): # Yields the excerpt as in-memory PCM (see kathysong_audio), brought
+        from kathysong_analysis import level_gain # to the common loudness.  The PreRenderer
+        excerpt = self.get_raw_excerpt() # calls this, so playing costs nothing more.
+        with span('excerpt.level'):
+            return excerpt.with_gain(level_gain(excerpt, self.loudness))
+
+    def get_waveobject(self): # Yields the playable WaveObject (from the Simpleaudio module)
+        return self.get_excerpt().get_waveobject()
+
+
+class GameEngine():
+    def __init__(self, game, acceptance, players):
+        self.game = game
+        self.acceptance = acceptance
+        self.players = list(players)
+        self.scores = {player:0 for player in self.players}
+        self.times = {player:0.0 for player in self.players}
+        self.round = 0
+        self.arbiter = BuzzArbiter()
+        self.starttime = 0.0
+        self.guesser = None
+        self.roundtime = 0.0
+        self.log = [] # One record per round played, for replaying and checking games.
+
+    def add_player(self, player): # For players who join once the game has begun, over the
+        if player not in self.scores: # network (see kathysong_netbuzz).
+            self.players.append(player)
+            self.scores[player] = 0
+            self.times[player] = 0.0
+
+    def is_over(self):
+        return self.round >= len(self.game)
+
+    def song(self): # The song of the current round.
+        return self.game[self.round]
+
+    def start_song(self, starttime): # When the excerpt became audible.  The song's matcher is
+        self.song().get_matcher() # worked out now rather than when the first guess is judged.
+        self.arbiter.reset()
+        self.starttime = starttime
+        self.guesser = None
+        self.roundtime = 0.0
+
+    def buzz(self, player, stamp):
+        if player in self.scores:
+            self.arbiter.buzz(player, stamp=stamp)
+
+    def close_buzzing(self): # Yields whoever buzzed first, or None if nobody did.
+        firstbuzz = self.arbiter.first()
+        if firstbuzz is None:
+            return None
+        self.guesser, buzztime = firstbuzz
+        endtime = min(buzztime, self.starttime + int(self.song().duration)/1000) # A late buzz costs
+        endtime = max(endtime, self.starttime) # the excerpt's length; an early one costs nothing.
+        self.roundtime = endtime - self.starttime
+        return self.guesser
+
+    def answer(self, guess): # Judges the guesser's answer (None for no answer at all), scores
+        correct = guess is not None and self.song().compare(guess, self.acceptance) # it and
+        if correct: # moves on to the next round.
+            self.scores[self.guesser] += 1
+        else:
+            self.scores[self.guesser] -= 1
+        self.times[self.guesser] += self.roundtime
+        self.log.append({'round':self.round,'player':self.guesser,'guess':guess,'correct':correct,'time':self.roundtime})
+        self.round += 1
+        return correct
+
+    def pass_song(self):
+        self.log.append({'round':self.round,'player':None,'guess':None,'correct':False,'time':0.0})
+        self.round += 1
+
+    def final_scores(self): # Songs per second; nobody who never answered scores anything.
+        final = {}
+        for player in self.players:
+            if self.times[player] > 0:
+                final[player] = round(self.scores[player] / self.times[player], 2)
+            else:
+                final[player] = 0
+        return final
+
+    def winners(self): # Everyone sharing the best final score; nobody if all are negative.
+        maxscore = 0
+        winner = []
+        for player, newscore in self.final_scores().items():
+            if newscore > maxscore:
+                maxscore = newscore
+                winner = [player]
+            elif newscore == maxscore:
+                winner.append(player)
+        return winner
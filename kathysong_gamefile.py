@@ -0,0 +1,204 @@
+
+# KathySong's game files.  A game is saved either as a text file, six lines per
+# song (see iter_game_file), or as a .kathy package with the excerpts embedded
+# (see kathysong_package).  A text game being edited is autosaved by a journal
+# beside it (see GameJournal), which loading replays.  Loading needs neither Tk
+# nor the audio modules, so the command-line tools use this as well as the game
+# editor.
+from kathysong_package import GamePackage, is_package, write_package
+from kathysong_engine import Song
+from kathysong_trace import span
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+
+LOAD_WORKERS = 16 # Threads checking song files exist; on a network share these mostly wait.
+JOURNAL_SUFFIX = '.journal' # A game's journal is its path with this added.
+COMPACT_ENTRIES = 1000 # Journal entries, or
+COMPACT_BYTES = 1 << 20 # bytes of them, before they are folded into the game file.
+
+def song_from_record(record, package=None, number=None): # The inverse of Song.get_record.
+    return Song(record['titles'],record['artist'],record['hint'],record['fileloc'],record['start'],record['duration'],package,number,
+                record.get('loudness'))
+
+def load_package(path): # Builds a game from a .kathy package (see kathysong_package).
+    package = GamePackage(path)
+    return [song_from_record(record, package, number) for number, record in enumerate(package.records())]
+
+def iter_game_file(path): # Yields the songs of a text game file one at a time (six lines
+    with open(path,'r') as gamefile: # each), or the line number of an entry that is unreadable.
+        song = []
+        for number, eachline in enumerate(gamefile, 1):
+            song.append(eachline.rstrip('\n'))
+            if len(song) == 6:
+                try:
+                    length = song[5].split("|") # The duration, then the loudness if known.
+                    loudness = float(length[1]) if len(length) > 1 else None
+                    yield Song(song[1].split("|"),song[2],song[3],song[0],float(song[4]),int(length[0]),loudness=loudness)
+                except ValueError:
+                    yield number - 5
+                song = []
+        if song != [] and ''.join(song).strip() != '':
+            yield number - len(song) + 1
+
+def load_game(path): # Loads a game file of either format in one streaming pass, checking that
+    with span('game.load') as timing: # the song files exist on a pool of threads as the songs
+        if is_package(path): # are read.
+            game = load_package(path)
+            timing.set(songs=len(game), package=True)
+            return game, [], []
+        game, problems, checks = [], [], {}
+        with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as pool:
+            for eachsong in iter_game_file(path):
+                if isinstance(eachsong, int):
+                    problems.append(f'Unreadable song entry at line {eachsong}')
+                    continue
+                game.append(eachsong)
+                if eachsong.fileloc not in checks:
+                    checks[eachsong.fileloc] = pool.submit(os.path.isfile, eachsong.fileloc)
+            recovered = replay_journal(path, game) # Edits autosaved after the file was written.
+            for eachsong in game:
+                if eachsong.fileloc not in checks:
+                    checks[eachsong.fileloc] = pool.submit(os.path.isfile, eachsong.fileloc)
+        missing = [eachsong for eachsong in game if not checks[eachsong.fileloc].result()]
+        timing.set(songs=len(game), missing=len(missing), recovered=recovered)
+    return game, missing, problems # The missing songs are still part of the game.
+
+def free_game_path(game_name, extension='.txt'): # A path in the Saved Games folder that
+    checkfile = './Saved Games/'+game_name+extension # no game is using yet.
+    trie = 0
+    while os.path.isfile(checkfile):
+        trie += 1
+        checkfile = './Saved Games/'+game_name+' ('+str(trie)+')'+extension
+    return checkfile
+
+def claim_game_path(game_name, extension='.txt'): # As free_game_path, but the file is created
+    trie = 0 # at once, so that nothing else can take the path in the meantime.
+    while True:
+        checkfile = './Saved Games/'+game_name+(' ('+str(trie)+')' if trie else '')+extension
+        try:
+            os.close(os.open(checkfile, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return checkfile
+        except FileExistsError:
+            trie += 1
+
+def game_text(game): # A game as the text of a game file (see iter_game_file).
+    return ''.join(eachsong.get_writeable()+'\n' for eachsong in game)
+
+def text_digest(text): # Ties a journal to the game file it was begun on.
+    return hashlib.sha1(text.encode('utf-8','surrogatepass')).hexdigest()
+
+def write_atomically(path, text): # Written beside path and renamed over it, so that a crash
+    temporary = path+'.tmp' # leaves either the old file or the new one, never half of one.
+    with open(temporary,'w') as newfile:
+        newfile.write(text)
+        newfile.flush()
+        os.fsync(newfile.fileno())
+    os.replace(temporary, path)
+
+def save_game(game, path): # Writes a game as a text game file (see iter_game_file).
+    write_atomically(path, game_text(game))
+
+def read_journal(path): # The edits journaled since the game file at path was written, or []
+    try: # if there is no journal or it was begun on an older version of the file.
+        with open(path+JOURNAL_SUFFIX,'r',encoding='utf-8') as journal:
+            lines = journal.readlines()
+    except FileNotFoundError:
+        return []
+    entries = []
+    for eachline in lines:
+        try:
+            entries.append(json.loads(eachline))
+        except ValueError: # The last line, cut short by a crash.
+            break
+    if entries == [] or entries[0].get('op') != 'begin':
+        return []
+    with open(path,'r') as gamefile:
+        if text_digest(gamefile.read()) != entries[0]['base']:
+            return [] # The file was written afresh after the journal; it has these edits.
+    return entries[1:]
+
+def replay_journal(path, game): # Makes the journaled edits to a game just loaded from path.
+    entries = read_journal(path) # Yields how many were made.
+    if entries == []:
+        return 0
+    from kathysong_songlist import SongList
+    songlist = SongList(game)
+    for done, entry in enumerate(entries):
+        try:
+            edit = entry['op']
+            if edit == 'extend':
+                songlist.extend([song_from_record(record) for record in entry['songs']])
+            elif edit == 'replace':
+                songlist.replace(entry['row'], song_from_record(entry['song']))
+            elif edit in ('to_top','raise_rows','lower_rows','remove'):
+                songlist.selected = set(entry['rows'])
+                getattr(songlist, edit)()
+            elif edit == 'shuffle':
+                songlist.shuffle(entry['seed'])
+            elif edit == 'restart':
+                songlist.restart({game[row]:start for row, start in zip(entry['rows'], entry['starts'])})
+        except (KeyError, IndexError, TypeError, ValueError):
+            return done # Later edits were made to what this one left.
+    return len(entries)
+
+class GameJournal(): # Autosaves a text game as it is edited.  Each edit is appended to the
+    def __init__(self, path, game, claimed=False): # journal as a line of JSON (see SongList),
+        self.path = path # which costs microseconds however long the game is; once the journal
+        self.game = game # grows long, it is folded into the game file, written afresh with
+        self.claimed = claimed # write_atomically, and begun again.  claimed is whether the file was
+        self.before = None # made for this game (see claim_game_path) rather than opened; if it
+        if not claimed: # was opened, before is what discard puts back.
+            with open(path,'r') as gamefile:
+                oldjournal = None
+                if os.path.isfile(path+JOURNAL_SUFFIX):
+                    with open(path+JOURNAL_SUFFIX,'r',encoding='utf-8') as journal:
+                        oldjournal = journal.read()
+                self.before = (gamefile.read(), oldjournal)
+        self.file = None
+        self.compact()
+
+    def log(self, edit, **fields):
+        line = json.dumps(dict(op=edit, **fields))+'\n'
+        self.file.write(line)
+        self.file.flush()
+        self.entries += 1
+        self.size += len(line)
+        if self.entries >= COMPACT_ENTRIES or self.size >= COMPACT_BYTES:
+            self.compact()
+
+    def compact(self): # Writes the game file afresh and begins an empty journal on it.  A
+        with span('game.compact', songs=len(self.game)): # crash between the two leaves
+            text = game_text(self.game) # the old journal, which no longer matches the file.
+            write_atomically(self.path, text)
+            if self.file is not None:
+                self.file.close()
+            self.file = open(self.path+JOURNAL_SUFFIX,'w',encoding='utf-8')
+            self.file.write(json.dumps({'op':'begin','base':text_digest(text)})+'\n')
+            self.file.flush()
+            self.entries = self.size = 0
+
+    def close(self): # Leaves just the game file, with every edit in it.
+        self.compact()
+        self.file.close()
+        os.remove(self.path+JOURNAL_SUFFIX)
+
+    def discard(self): # Leaves things as they were before the game was edited.
+        self.file.close()
+        if self.claimed:
+            os.remove(self.path)
+            os.remove(self.path+JOURNAL_SUFFIX)
+            return None
+        write_atomically(self.path, self.before[0])
+        if self.before[1] is None:
+            os.remove(self.path+JOURNAL_SUFFIX)
+        else:
+            with open(self.path+JOURNAL_SUFFIX,'w',encoding='utf-8') as journal:
+                journal.write(self.before[1])
+
+def export_package(game, path): # Writes a game, excerpts and all, as a .kathy package.
+    from kathysong_audio import PRERENDER_WORKERS
+    with ThreadPoolExecutor(max_workers=PRERENDER_WORKERS) as pool:
+        excerpts = pool.map(Song.get_raw_excerpt, game) # Stored as decoded; the loudness goes in the
+        write_package(path, ((eachsong.get_record(), excerpt) for eachsong, excerpt in zip(game, excerpts))) # record.
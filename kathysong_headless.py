@@ -0,0 +1,86 @@
+
+# Plays KathySong games without any windows or sound, for checking the scoring
+# rules and trying out new ones.  A script is a JSON list with one entry per
+# round, each of the form
+#     {"buzzes": [[player, seconds], ...], "guess": "...", "pass": false}
+# where players are keyboard positions (0 left, 1 centre, 2 right) and seconds
+# are counted from the start of the excerpt.  Run with:
+#     python kathysong_headless.py game.txt --script rounds.json
+#     python kathysong_headless.py game.txt --simulate 10000 --acceptance fuzzy
+import argparse
+import json
+import random
+import sys
+import time
+from kathysong_gamefile import load_game
+from kathysong_engine import GameEngine, ACCEPTANCES, CONTESTANT_SLOTS
+
+def play_script(game, script, acceptance='strict', players=CONTESTANT_SLOTS['triple']):
+    engine = GameEngine(game, acceptance, players) # Rounds the script leaves out are passed.
+    for entry in script:
+        if engine.is_over():
+            break
+        engine.start_song(0.0)
+        for player, stamp in entry.get('buzzes', []):
+            engine.buzz(player, stamp)
+        guesser = engine.close_buzzing()
+        if guesser is None or entry.get('pass', False):
+            engine.pass_song()
+        else:
+            engine.answer(entry.get('guess'))
+    while not engine.is_over():
+        engine.pass_song()
+    return engine
+
+def random_script(game, players, rng, skill=0.6): # Everyone buzzes somewhere in the excerpt;
+    script = [] # the first to buzz knows the song with probability skill.
+    for song in game:
+        seconds = int(song.duration)/1000
+        buzzes = [[player, rng.uniform(0, seconds)] for player in players if rng.random() < 0.8]
+        if rng.random() < skill:
+            guess = song.titles[0]
+        else:
+            guess = rng.choice(game).titles[0]
+        script.append({'buzzes':buzzes,'guess':guess})
+    return script
+
+def simulate(game, count, acceptance='strict', players=CONTESTANT_SLOTS['triple'], seed=0):
+    rng = random.Random(seed) # Plays count random games; yields a summary of the results.
+    wins = {player:0 for player in players}
+    totals = {player:0.0 for player in players}
+    scripts = [random_script(game, players, rng) for _ in range(count)]
+    start = time.perf_counter()
+    for script in scripts:
+        engine = play_script(game, script, acceptance, players)
+        for player in engine.winners():
+            wins[player] += 1
+        for player, score in engine.final_scores().items():
+            totals[player] += score
+    elapsed = time.perf_counter() - start
+    return {'games':count,'seconds':elapsed,'games_per_second':count/elapsed if elapsed > 0 else 0,
+            'wins':wins,'mean_scores':{player:totals[player]/count for player in players}}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Play KathySong games without windows or sound.')
+    parser.add_argument('game')
+    parser.add_argument('--script', help='JSON file of scripted rounds')
+    parser.add_argument('--simulate', type=int, default=0, help='number of random games to play')
+    parser.add_argument('--acceptance', choices=ACCEPTANCES, default='strict')
+    parser.add_argument('--contestants', choices=list(CONTESTANT_SLOTS), default='triple')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    game, missing, problems = load_game(args.game) # No audio is played, so missing files
+    for problem in problems: # do not matter here.
+        print(problem, file=sys.stderr)
+    if len(game) == 0:
+        sys.exit('The game has no songs.')
+    players = CONTESTANT_SLOTS[args.contestants]
+    if args.script:
+        with open(args.script,'r') as scriptfile:
+            engine = play_script(game, json.load(scriptfile), args.acceptance, players)
+        for entry in engine.log:
+            print(json.dumps(entry))
+        print(json.dumps({'scores':engine.scores,'times':engine.times,
+                          'final':engine.final_scores(),'winners':engine.winners()}))
+    if args.simulate > 0:
+        print(json.dumps(simulate(game, args.simulate, args.acceptance, players, args.seed)))
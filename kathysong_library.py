@@ -0,0 +1,322 @@
+
+# The music library for KathySong:  an index of every MP3 and WAV file in a set of
+# music folders, kept in a SQLite database so that the game editor can search it
+# by title or artist without touching the files.  A scan walks the folders, and
+# only files that are new or whose modification time or size has changed are
+# probed, on a pool of processes.  Probing reads the file headers and tags
+# directly (ID3 for MP3s, RIFF INFO or ID3 for WAVs) rather than starting ffprobe,
+# which keeps a first scan of a large library to minutes rather than hours.
+from concurrent.futures import ProcessPoolExecutor
+import sqlite3
+import struct
+import os
+
+LIBRARY_PATH = './library.db'
+LIBRARY_WORKERS = max(1, os.cpu_count() or 1)
+AUDIO_EXTENSIONS = ('.mp3','.wav')
+INLINE_PROBES = 64 # Fewer changed files than this are probed without starting a pool.
+BATCH_SIZE = 500 # Tracks written to the index per transaction.
+SEARCH_LIMIT = 500
+
+MP3_BITRATES = { # Kilobits per second, by (MPEG-1, layer) or (MPEG-2/2.5, layer).
+    (1,1):[0,32,64,96,128,160,192,224,256,288,320,352,384,416,448],
+    (1,2):[0,32,48,56,64,80,96,112,128,160,192,224,256,320,384],
+    (1,3):[0,32,40,48,56,64,80,96,112,128,160,192,224,256,320],
+    (2,1):[0,32,48,56,64,80,96,112,128,144,160,176,192,224,256],
+    (2,2):[0,8,16,24,32,40,48,56,64,80,96,112,128,144,160],
+    (2,3):[0,8,16,24,32,40,48,56,64,80,96,112,128,144,160]}
+MP3_RATES = {3:[44100,48000,32000],2:[22050,24000,16000],0:[11025,12000,8000]} # By version bits.
+ID3_FRAMES = {'TIT2':'title','TPE1':'artist','TALB':'album','TT2':'title','TP1':'artist','TAL':'album'}
+INFO_FRAMES = {b'INAM':'title',b'IART':'artist',b'IPRD':'album'}
+
+def decode_text(data, encoding): # An ID3 text frame's contents.
+    try:
+        if encoding == 1:
+            text = data.decode('utf-16')
+        elif encoding == 2:
+            text = data.decode('utf-16-be')
+        elif encoding == 3:
+            text = data.decode('utf-8')
+        else:
+            text = data.decode('latin-1')
+    except UnicodeDecodeError:
+        return ''
+    return text.split('\x00')[0].strip()
+
+def syncsafe(data): # ID3 sizes keep the top bit of every byte clear.
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def read_id3(data): # Tags from an ID3v2 block at the start of data; yields (tags, length).
+    if len(data) < 10 or data[:3] != b'ID3':
+        return {}, 0
+    version, size = data[3], syncsafe(data[6:10])
+    end = min(len(data), 10+size)
+    tags, place = {}, 10
+    if version == 2:
+        idlength, headlength = 3, 6
+    else:
+        idlength, headlength = 4, 10
+    while place + headlength <= end:
+        frameid = data[place:place+idlength].decode('latin-1')
+        if version == 2:
+            framesize = int.from_bytes(data[place+3:place+6], 'big')
+        elif version == 4:
+            framesize = syncsafe(data[place+4:place+8])
+        else:
+            framesize = int.from_bytes(data[place+4:place+8], 'big')
+        if framesize <= 0 or frameid.strip('\x00') == '':
+            break
+        body = data[place+headlength:place+headlength+framesize]
+        if frameid in ID3_FRAMES and len(body) > 1:
+            tags.setdefault(ID3_FRAMES[frameid], decode_text(body[1:], body[0]))
+        place += headlength + framesize
+    return tags, 10+size
+
+def read_id3v1(songfile): # The old fixed-size tag at the very end of an MP3.
+    try:
+        songfile.seek(-128, os.SEEK_END)
+        data = songfile.read(128)
+    except OSError:
+        return {}
+    if data[:3] != b'TAG':
+        return {}
+    fields = {'title':data[3:33],'artist':data[33:63],'album':data[63:93]}
+    return {name:value.split(b'\x00')[0].decode('latin-1').strip() for name, value in fields.items()}
+
+def mp3_header(data, place): # (version, layer, bitrate, rate, channels) of a frame, or None.
+    if data[place] != 0xFF or data[place+1] & 0xE0 != 0xE0:
+        return None
+    versionbits, layerbits = (data[place+1] >> 3) & 3, (data[place+1] >> 1) & 3
+    bitrateindex, rateindex = data[place+2] >> 4, (data[place+2] >> 2) & 3
+    if versionbits == 1 or layerbits == 0 or bitrateindex in (0, 15) or rateindex == 3:
+        return None
+    layer = 4 - layerbits
+    bitrate = MP3_BITRATES[(1 if versionbits == 3 else 2, layer)][bitrateindex]
+    channels = 1 if data[place+3] >> 6 == 3 else 2
+    return versionbits, layer, bitrate, MP3_RATES[versionbits][rateindex], channels
+
+def probe_mp3(path, size):
+    with open(path,'rb') as songfile:
+        head = songfile.read(65536)
+        tags, audiostart = read_id3(head)
+        base = 0 # Where head starts in the file.
+        if audiostart + 4 > len(head): # A tag with large cover art.
+            songfile.seek(audiostart)
+            head, base, audiostart = songfile.read(65536), audiostart, 0
+        for name, value in read_id3v1(songfile).items():
+            if not tags.get(name):
+                tags[name] = value
+    for place in range(audiostart, len(head)-4): # The first frame header after the tag.
+        header = mp3_header(head, place)
+        if header is not None:
+            break
+    else:
+        return None
+    versionbits, layer, bitrate, rate, channels = header
+    samples = {1:384, 2:1152, 3:1152 if versionbits == 3 else 576}[layer]
+    if versionbits == 3:
+        xing = place + 4 + (32 if channels == 2 else 17)
+    else:
+        xing = place + 4 + (17 if channels == 2 else 9)
+    frames = None
+    if head[xing:xing+4] in (b'Xing', b'Info') and head[xing+7] & 1: # VBR headers count
+        frames = int.from_bytes(head[xing+8:xing+12], 'big') # the frames in the file.
+    elif head[place+36:place+40] == b'VBRI':
+        frames = int.from_bytes(head[place+50:place+54], 'big')
+    if frames:
+        duration = 1000*frames*samples/rate
+    else: # Constant bitrate:  the length follows from the size.
+        duration = 8*(size - base - place)/bitrate
+    return {'duration':duration,'sample_rate':rate,'channels':channels,'tags':tags}
+
+def probe_wav(path, size):
+    tags, fmt, datalength = {}, None, None
+    with open(path,'rb') as songfile:
+        riff = songfile.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            return None
+        while True:
+            chunkhead = songfile.read(8)
+            if len(chunkhead) < 8:
+                break
+            chunkid, chunksize = chunkhead[:4], struct.unpack('<I', chunkhead[4:])[0]
+            if chunkid == b'fmt ':
+                fmt = songfile.read(chunksize)
+            elif chunkid == b'data': # Only the length is wanted; skip the audio itself.
+                datalength = min(chunksize, size - songfile.tell())
+                songfile.seek(chunksize, os.SEEK_CUR)
+            elif chunkid == b'LIST' and chunksize < 1048576:
+                body = songfile.read(chunksize)
+                if body[:4] == b'INFO':
+                    place = 4
+                    while place + 8 <= len(body):
+                        subid, subsize = body[place:place+4], struct.unpack('<I', body[place+4:place+8])[0]
+                        if subid in INFO_FRAMES:
+                            tags.setdefault(INFO_FRAMES[subid], body[place+8:place+8+subsize].split(b'\x00')[0].decode('latin-1').strip())
+                        place += 8 + subsize + (subsize & 1)
+            elif chunkid in (b'id3 ', b'ID3 ') and chunksize < 1048576:
+                for name, value in read_id3(songfile.read(chunksize))[0].items():
+                    tags.setdefault(name, value)
+            else:
+                songfile.seek(chunksize, os.SEEK_CUR)
+            if chunksize & 1: # Chunks are padded to an even length.
+                songfile.seek(1, os.SEEK_CUR)
+    if fmt is None or datalength is None or len(fmt) < 16:
+        return None
+    channels, rate, byterate = struct.unpack('<HII', fmt[2:12])
+    if byterate == 0:
+        return None
+    return {'duration':1000*datalength/byterate,'sample_rate':rate,'channels':channels,'tags':tags}
+
+def guess_names(path): # Title and artist from a file name like "Artist - Title.mp3".
+    name = os.path.splitext(os.path.basename(path))[0]
+    if ' - ' in name:
+        artist, title = name.split(' - ', 1)
+        return title.strip(), artist.strip()
+    return name, ''
+
+def probe_track(item): # item is (path, mtime_ns, size).  Runs in a worker process, so it
+    path, mtime_ns, size = item # yields a plain tuple ready for the index.
+    try:
+        if path.lower().endswith('.mp3'):
+            info = probe_mp3(path, size)
+        else:
+            info = probe_wav(path, size)
+    except (OSError, ValueError, struct.error, IndexError):
+        info = None
+    title, artist = guess_names(path)
+    if info is None: # Kept in the index so it is not probed again until it changes,
+        return (path, mtime_ns, size, None, None, None, title, artist, '') # but never found.
+    tags = info['tags']
+    return (path, mtime_ns, size, round(info['duration'], 1), info['sample_rate'], info['channels'],
+            tags.get('title') or title, tags.get('artist') or artist, tags.get('album') or '')
+
+def walk(folder): # Yields (path, mtime_ns, size) of every song file below folder.
+    stack = [folder]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                    stat = entry.stat()
+                    yield entry.path.replace('\\','/'), stat.st_mtime_ns, stat.st_size
+            except OSError:
+                continue
+
+class MusicLibrary(): # One connection to the index.  Scans run on their own thread with
+    def __init__(self, path=LIBRARY_PATH): # their own MusicLibrary, which the WAL journal
+        self.path = path # lets the editor keep searching meanwhile.
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS folders (path TEXT PRIMARY KEY)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS tracks (id INTEGER PRIMARY KEY, path TEXT UNIQUE, '
+                                    'mtime_ns INTEGER, size INTEGER, duration REAL, sample_rate INTEGER, '
+                                    'channels INTEGER, title TEXT, artist TEXT, album TEXT)')
+        try: # Full-text search where SQLite has it; a LIKE scan otherwise.
+            with self.connection:
+                self.connection.execute('CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(title, artist, album)')
+                self.connection.execute('CREATE TRIGGER IF NOT EXISTS tracks_insert AFTER INSERT ON tracks BEGIN '
+                                        'INSERT INTO tracks_fts(rowid, title, artist, album) VALUES (new.id, new.title, new.artist, new.album); END')
+                self.connection.execute('CREATE TRIGGER IF NOT EXISTS tracks_delete AFTER DELETE ON tracks BEGIN '
+                                        'DELETE FROM tracks_fts WHERE rowid = old.id; END')
+                self.connection.execute('CREATE TRIGGER IF NOT EXISTS tracks_update AFTER UPDATE ON tracks BEGIN '
+                                        'DELETE FROM tracks_fts WHERE rowid = old.id; '
+                                        'INSERT INTO tracks_fts(rowid, title, artist, album) VALUES (new.id, new.title, new.artist, new.album); END')
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+
+    def close(self):
+        self.connection.close()
+
+    def folders(self):
+        return [row[0] for row in self.connection.execute('SELECT path FROM folders ORDER BY path')]
+
+    def add_folder(self, folder):
+        with self.connection:
+            self.connection.execute('INSERT OR IGNORE INTO folders VALUES (?)', (folder.replace('\\','/').rstrip('/'),))
+
+    def remove_folder(self, folder): # Its tracks go too; if another folder overlaps it,
+        folder = folder.replace('\\','/').rstrip('/') # the next scan puts back what that holds.
+        with self.connection:
+            self.connection.execute('DELETE FROM folders WHERE path = ?', (folder,))
+            self.connection.execute('DELETE FROM tracks WHERE path >= ? AND path < ?', (folder+'/', folder+'0'))
+
+    def paths(self): # Every playable track in the index.
+        return [row[0] for row in self.connection.execute('SELECT path FROM tracks WHERE duration IS NOT NULL ORDER BY path')]
+
+    def count(self):
+        return self.connection.execute('SELECT COUNT(*) FROM tracks WHERE duration IS NOT NULL').fetchone()[0]
+
+    def store(self, records):
+        with self.connection:
+            self.connection.executemany('INSERT INTO tracks (path, mtime_ns, size, duration, sample_rate, channels, title, artist, album) '
+                                        'VALUES (?,?,?,?,?,?,?,?,?) ON CONFLICT(path) DO UPDATE SET mtime_ns=excluded.mtime_ns, '
+                                        'size=excluded.size, duration=excluded.duration, sample_rate=excluded.sample_rate, '
+                                        'channels=excluded.channels, title=excluded.title, artist=excluded.artist, album=excluded.album',
+                                        records)
+
+    def scan(self, progress=None, workers=LIBRARY_WORKERS): # Brings the index up to date with
+        known = {path:(mtime_ns, size) for path, mtime_ns, size # the folders.  progress is
+                 in self.connection.execute('SELECT path, mtime_ns, size FROM tracks')} # called
+        seen, changed = set(), [] # with (probed, to probe) as the scan goes.
+        for folder in self.folders():
+            for path, mtime_ns, size in walk(folder):
+                if path in seen:
+                    continue
+                seen.add(path)
+                if known.get(path) != (mtime_ns, size):
+                    changed.append((path, mtime_ns, size))
+        removed = [(path,) for path in known if path not in seen]
+        with self.connection:
+            self.connection.executemany('DELETE FROM tracks WHERE path = ?', removed)
+        results = {'files':len(seen),'probed':0,'failed':0,'removed':len(removed)}
+        if progress is not None:
+            progress(0, len(changed))
+        if len(changed) < INLINE_PROBES or workers <= 1:
+            probes = map(probe_track, changed)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            probes = pool.map(probe_track, changed, chunksize=max(1, min(256, len(changed)//(4*workers))))
+        try:
+            batch = []
+            for record in probes:
+                batch.append(record)
+                results['probed'] += 1
+                if record[3] is None:
+                    results['failed'] += 1
+                if len(batch) >= BATCH_SIZE:
+                    self.store(batch)
+                    batch = []
+                    if progress is not None:
+                        progress(results['probed'], len(changed))
+            self.store(batch)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        if progress is not None:
+            progress(results['probed'], len(changed))
+        return results
+
+    def search(self, text, limit=SEARCH_LIMIT): # Tracks whose title, artist or album have
+        words = [word for word in text.lower().replace('"',' ').split() if word != ''] # words
+        columns = 'tracks.path, tracks.title, tracks.artist, tracks.album, tracks.duration' # starting
+        if words == []: # with every word searched for, best matches first.
+            return self.connection.execute(f'SELECT {columns} FROM tracks WHERE duration IS NOT NULL '
+                                           'ORDER BY artist, title LIMIT ?', (limit,)).fetchall()
+        if self.fts:
+            query = ' '.join('"'+word+'"*' for word in words)
+            return self.connection.execute(f'SELECT {columns} FROM tracks_fts JOIN tracks ON tracks.id = tracks_fts.rowid '
+                                           'WHERE tracks_fts MATCH ? AND tracks.duration IS NOT NULL ORDER BY rank LIMIT ?',
+                                           (query, limit)).fetchall()
+        clauses = ' AND '.join(["(title || ' ' || artist || ' ' || album) LIKE ?"]*len(words))
+        return self.connection.execute(f'SELECT {columns} FROM tracks WHERE duration IS NOT NULL AND {clauses} '
+                                       'ORDER BY artist, title LIMIT ?', ['%'+word+'%' for word in words]+[limit]).fetchall()
@@ -0,0 +1,451 @@
+
+# Buzzers over the network for KathySong.  Players join from a phone or laptop on
+# the same network, either in a web browser (the server answers plain HTTP with
+# a page holding one big buzzer, which then talks over a WebSocket) or with any
+# program that sends lines of JSON over TCP; both arrive on the same port.
+#
+# Every client's clock is measured against ours as NTP does it:  we send a ping
+# stamped t0, the client notes when it arrived (t1) and when it answered (t2), and
+# we note when the answer came back (t3).  The round trip is (t3-t0) - (t2-t1) and
+# the client's clock is ((t1-t0) + (t2-t3))/2 ahead of ours; of the recent pings,
+# the one with the shortest round trip is trusted.  A buzz carries the client's
+# own time of the touch or key press, which is moved onto time.perf_counter() and
+# handed to the game's BuzzArbiter, so buzzes are ordered by when they were made,
+# not by when they got here.  A stamp is never later than the buzz's arrival, nor
+# earlier than the client's round trip allows, so a client cannot buzz early by
+# lying about its clock.  Once a buzz arrives, the round waits grace() seconds
+# for an earlier one still on its way.
+#
+# The server runs its own asyncio loop on a thread; the Tk window polls events().
+# Try it without any phones, with simulated clients on this machine:
+#     python kathysong_netbuzz.py --simulate 60 --rounds 50
+import asyncio
+import argparse
+import collections
+import threading
+import hashlib
+import base64
+import socket
+import random
+import queue
+import json
+import time
+import sys
+
+BUZZ_PORT = 8765
+FIRST_PLAYER = 3 # Players 0-2 are the keyboard positions; network players follow.
+PING_INTERVAL = 1.0 # Seconds between clock measurements of each client.
+JOIN_PINGS = 8 # Measurements taken in quick succession when a client joins.
+CLOCK_SAMPLES = 16 # Recent measurements kept; the fastest round trip among them is used.
+TOLERANCE = 0.02 # Seconds of slack allowed on a buzz's stamp beyond the client's round trip.
+MAX_GRACE = 0.25 # Seconds at most waited after a buzz for an earlier one.
+MAX_FRAME = 4096 # Bytes at most in a WebSocket frame; every message a client sends is far smaller.
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+class ClockEstimate(): # How far one client's clock is ahead of ours, and its round trip.
+    def __init__(self):
+        self.samples = collections.deque(maxlen=CLOCK_SAMPLES) # (round trip, offset)
+        self.offset = None
+        self.rtt = None
+
+    def add(self, t0, t1, t2, t3): # See the top of this file; t0 and t3 are ours.
+        rtt = max(0.0, (t3 - t0) - (t2 - t1))
+        self.samples.append((rtt, ((t1 - t0) + (t2 - t3))/2))
+        self.rtt, self.offset = min(self.samples)
+
+    def worst_rtt(self):
+        return max(rtt for rtt, offset in self.samples) if self.samples else 0.0
+
+    def to_local(self, stamp, arrival): # A client time as ours, kept within what the round
+        if self.offset is None: # trip allows; arrival is when the message got here.
+            return arrival
+        return min(arrival, max(stamp - self.offset, arrival - self.worst_rtt() - TOLERANCE))
+
+class Client():
+    def __init__(self, player, writer, websocket):
+        self.player = player
+        self.name = f'Player {player - FIRST_PLAYER + 1}'
+        self.writer = writer
+        self.websocket = websocket
+        self.clock = ClockEstimate()
+        self.joined = False
+
+    def send(self, message): # Called on the server's loop.
+        text = json.dumps(message)
+        if self.websocket:
+            self.writer.write(websocket_frame(text))
+        else:
+            self.writer.write(text.encode('utf-8')+b'\n')
+
+def websocket_frame(text): # A single unmasked text frame, as servers send them.
+    payload = text.encode('utf-8')
+    if len(payload) < 126:
+        header = bytes([0x81, len(payload)])
+    elif len(payload) < 65536:
+        header = bytes([0x81, 126]) + len(payload).to_bytes(2, 'big')
+    else:
+        header = bytes([0x81, 127]) + len(payload).to_bytes(8, 'big')
+    return header + payload
+
+async def read_websocket(reader): # The next text message, or None once the client has gone.
+    while True:
+        first, second = await reader.readexactly(2)
+        opcode, length = first & 0x0F, second & 0x7F
+        if length == 126:
+            length = int.from_bytes(await reader.readexactly(2), 'big')
+        elif length == 127:
+            length = int.from_bytes(await reader.readexactly(8), 'big')
+        if length > MAX_FRAME: # Not from our page; reading it could take any amount of memory.
+            raise ValueError(f"WebSocket frame of {length} bytes")
+        mask = await reader.readexactly(4) if second & 0x80 else bytes(4)
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(await reader.readexactly(length)))
+        if opcode == 0x8: # Close.
+            return None
+        if opcode in (0x1, 0x0): # Text, or a continuation, which browsers do not send for
+            return payload.decode('utf-8') # messages this small.
+
+def shut_down(loop, writers): # Closes the connections, lets what the stopped loop was still
+    for writer in writers: # doing finish (or cancels it), and closes the loop.
+        writer.close()
+    tasks = asyncio.all_tasks(loop)
+    if tasks:
+        loop.run_until_complete(asyncio.wait(tasks, timeout=1.0))
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    loop.close()
+
+class BuzzServer():
+    def __init__(self, host='0.0.0.0', port=BUZZ_PORT):
+        self.host = host
+        self.port = port
+        self.clients = {} # By player number; only touched on the server's loop.
+        self.names = {} # Player numbers to names, safe to read from Tk.
+        self.nextplayer = FIRST_PLAYER
+        self.events = queue.Queue() # What happened, for the game to poll.
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.overheads = collections.deque(maxlen=1000) # Seconds from a buzz being read to
+                                                        # its stamp being queued.
+
+    def start(self): # Returns once the server is listening; port 0 picks a free port.
+        started = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(started,), daemon=True)
+        self.thread.start()
+        started.wait()
+        if isinstance(self.server, Exception):
+            raise self.server
+        return self
+
+    def run(self, started):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as err:
+            self.server = err
+            started.set()
+            return None
+        pinger = self.loop.create_task(self.ping_all())
+        started.set()
+        self.loop.run_forever()
+        pinger.cancel()
+        self.server.close()
+        shut_down(self.loop, [client.writer for client in self.clients.values()])
+
+    def stop(self):
+        if self.loop is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+    def address(self): # Where players point their browsers.
+        probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try: # No packet is sent; this only asks which interface would be used.
+            probe.connect(('192.0.2.1', 9))
+            host = probe.getsockname()[0]
+        except OSError:
+            host = '127.0.0.1'
+        finally:
+            probe.close()
+        return f'http://{host}:{self.port}/'
+
+    def poll(self): # Every event since the last poll:  ('join', player, name), ('leave', player),
+        found = [] # ('buzz', player, stamp, arrival) with both on perf_counter(), ('guess', player,
+                   # text).
+        while True:
+            try:
+                found.append(self.events.get_nowait())
+            except queue.Empty:
+                return found
+
+    def grace(self): # Seconds to wait after a buzz, in case an earlier one is still coming.
+        worst = max([client.clock.worst_rtt() for client in list(self.clients.values())], default=0.0)
+        return min(MAX_GRACE, worst + TOLERANCE)
+
+    def send(self, player, message): # Safe to call from any thread.
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.deliver, player, message)
+
+    def broadcast(self, message):
+        self.send(None, message)
+
+    def deliver(self, player, message):
+        for client in list(self.clients.values()):
+            if client.joined and (player is None or client.player == player):
+                client.send(message)
+
+    async def handle(self, reader, writer):
+        try:
+            firstline = await reader.readline()
+            headers = {}
+            while firstline.startswith(b'GET '):
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, _, value = line.decode('latin-1').partition(':')
+                headers[key.strip().lower()] = value.strip()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError): # ValueError:  a line
+            writer.close() # past the reader's limit.
+            return None
+        if firstline.startswith(b'GET '):
+            if headers.get('upgrade', '').lower() != 'websocket':
+                body = CLIENT_PAGE.encode('utf-8')
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n'
+                             + f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + body)
+                await writer.drain()
+                writer.close()
+                return None
+            if 'sec-websocket-key' not in headers:
+                writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                await writer.drain()
+                writer.close()
+                return None
+            accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key']+WEBSOCKET_GUID).encode('latin-1')).digest())
+            writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                         + b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+            client = Client(self.nextplayer, writer, True)
+            pending = None
+        else:
+            client = Client(self.nextplayer, writer, False)
+            pending = firstline # A TCP client's first line is already a message.
+        self.nextplayer += 1
+        self.clients[client.player] = client
+        try:
+            while True:
+                if pending is not None:
+                    text, pending = pending.decode('utf-8'), None
+                elif client.websocket:
+                    text = await read_websocket(reader)
+                else:
+                    line = await reader.readline()
+                    text = line.decode('utf-8') if line else None
+                arrival = time.perf_counter()
+                if text is None:
+                    break
+                if text.strip() != '':
+                    message = json.loads(text)
+                    if isinstance(message, dict):
+                        self.receive(client, message, arrival)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, KeyError, TypeError, AttributeError):
+            pass # A client that sends what our page never would (float(None), say) is dropped.
+        finally:
+            del self.clients[client.player]
+            if client.joined:
+                self.names.pop(client.player, None)
+                self.events.put(('leave', client.player))
+            writer.close()
+
+    def receive(self, client, message, arrival):
+        kind = message.get('type')
+        if kind == 'buzz' and client.joined:
+            self.events.put(('buzz', client.player, client.clock.to_local(float(message['t']), arrival), arrival))
+            self.overheads.append(time.perf_counter() - arrival)
+        elif kind == 'pong':
+            client.clock.add(float(message['t0']), float(message['t1']), float(message['t2']), arrival)
+        elif kind == 'guess' and client.joined:
+            self.events.put(('guess', client.player, str(message.get('text', ''))))
+        elif kind == 'join' and not client.joined:
+            client.name = str(message.get('name') or client.name)[:40]
+            client.joined = True
+            self.names[client.player] = client.name
+            client.send({'type':'welcome','player':client.player,'name':client.name})
+            self.loop.create_task(self.ping(client, JOIN_PINGS))
+            self.events.put(('join', client.player, client.name))
+
+    async def ping(self, client, count):
+        for _ in range(count):
+            if client.player not in self.clients:
+                return None
+            client.send({'type':'ping','t0':time.perf_counter()})
+            await asyncio.sleep(0.05)
+
+    async def ping_all(self):
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            for client in list(self.clients.values()):
+                if client.joined:
+                    client.send({'type':'ping','t0':time.perf_counter()})
+
+CLIENT_PAGE = '''<!DOCTYPE html>
+<html><head><meta name="viewport" content="width=device-width, initial-scale=1">
+<title>KathySong buzzer</title>
+<style>body{font-family:sans-serif;background:yellow;text-align:center;margin:0}
+#buzz{width:90vw;height:60vh;margin-top:5vh;font-size:10vw;border-radius:30vw;background:#aa0000;color:white;border:none}
+#buzz:disabled{background:#888}</style></head>
+<body><p id="status">Connecting...</p>
+<button id="buzz" disabled>BUZZ</button>
+<form id="answer" hidden><input id="guess" autocomplete="off"><button>Answer</button></form>
+<script>
+const status = document.getElementById('status'), buzz = document.getElementById('buzz');
+const answer = document.getElementById('answer'), guess = document.getElementById('guess');
+const name = localStorage.getItem('kathysongName') || prompt('Your name?') || '';
+localStorage.setItem('kathysongName', name);
+const socket = new WebSocket('ws://' + location.host + '/');
+const now = () => performance.now()/1000; // Event timeStamps are on this clock too.
+socket.onopen = () => socket.send(JSON.stringify({type:'join', name:name}));
+socket.onclose = () => { status.textContent = 'Disconnected'; buzz.disabled = true; };
+socket.onmessage = (event) => {
+  const t1 = now(), message = JSON.parse(event.data);
+  if (message.type == 'ping') {
+    socket.send(JSON.stringify({type:'pong', t0:message.t0, t1:t1, t2:now()}));
+  } else if (message.type == 'welcome') {
+    status.textContent = 'Welcome, ' + message.name;
+  } else if (message.type == 'phase') {
+    buzz.disabled = message.phase != 'playing';
+    answer.hidden = true;
+    status.textContent = message.text || '';
+  } else if (message.type == 'answer') {
+    answer.hidden = false;
+    guess.focus();
+  }
+};
+buzz.addEventListener('pointerdown', (event) => {
+  socket.send(JSON.stringify({type:'buzz', t:event.timeStamp/1000}));
+  buzz.disabled = true;
+});
+answer.addEventListener('submit', (event) => {
+  event.preventDefault();
+  socket.send(JSON.stringify({type:'guess', text:guess.value}));
+  guess.value = '';
+  answer.hidden = true;
+});
+</script></body></html>
+'''
+
+class SimulatedClient(): # A player on the network, with its own clock and a delay each way.
+    def __init__(self, name, skew, latency, jitter, rng):
+        self.name = name
+        self.skew = skew # Seconds this client's clock is ahead of the real one.
+        self.latency = latency # Seconds each way, before jitter.
+        self.jitter = jitter
+        self.rng = rng
+        self.player = None
+        self.writer = None
+
+    def clock(self):
+        return time.perf_counter() + self.skew
+
+    def delay(self):
+        return self.latency + self.rng.uniform(0, self.jitter)
+
+    async def connect(self, port):
+        reader, self.writer = await asyncio.open_connection('127.0.0.1', port)
+        self.writer.write(json.dumps({'type':'join','name':self.name}).encode('utf-8')+b'\n')
+        self.listener = asyncio.get_running_loop().create_task(self.listen(reader))
+
+    async def listen(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return None
+            asyncio.get_running_loop().call_later(self.delay(), self.receive, json.loads(line)) # On its way here.
+
+    def receive(self, message):
+        if message['type'] == 'ping':
+            t1 = self.clock()
+            self.send_later({'type':'pong','t0':message['t0'],'t1':t1,'t2':self.clock()})
+        elif message['type'] == 'welcome':
+            self.player = message['player']
+
+    def send_later(self, message): # After the delay on the way back.
+        async def send():
+            await asyncio.sleep(self.delay())
+            self.writer.write(json.dumps(message).encode('utf-8')+b'\n')
+        asyncio.get_running_loop().create_task(send())
+
+    def buzz_at(self, moment): # moment is real time (perf_counter); stamped on our clock.
+        async def buzz():
+            await asyncio.sleep(max(0.0, moment - time.perf_counter()))
+            self.send_later({'type':'buzz','t':self.clock()})
+        asyncio.get_running_loop().create_task(buzz())
+
+def percentile(samples, fraction): # samples must be sorted.
+    return samples[min(len(samples)-1, int(fraction*len(samples)))]
+
+def simulate(players=60, rounds=50, latency=0.02, jitter=0.01, skew=5.0, spread=0.3, seed=0):
+    rng = random.Random(seed) # Yields a report:  how often the real first buzz won, and
+    server = BuzzServer('127.0.0.1', 0).start() # how far the stamps were from the truth.
+    loop = asyncio.new_event_loop()
+    clients = [SimulatedClient(f'Sim {number}', rng.uniform(-skew, skew), rng.uniform(0, latency), jitter, rng)
+               for number in range(players)]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    for client in clients:
+        asyncio.run_coroutine_threadsafe(client.connect(server.port), loop).result()
+    time.sleep(JOIN_PINGS*0.05 + 4*(latency+jitter) + 0.2) # Until every clock has been measured.
+    server.poll()
+    correct, naive, errors = 0, 0, []
+    for _ in range(rounds):
+        begin = time.perf_counter() + 0.05
+        moments = {}
+        for client in clients:
+            moments[client.player] = begin + rng.uniform(0, spread)
+            loop.call_soon_threadsafe(client.buzz_at, moments[client.player])
+        stamps, arrivals = {}, {}
+        deadline = begin + spread + 2*(latency+jitter) + 0.2
+        while len(stamps) < players and time.perf_counter() < deadline:
+            time.sleep(0.005)
+            for event in server.poll():
+                if event[0] == 'buzz':
+                    stamps[event[1]], arrivals[event[1]] = event[2], event[3]
+        if stamps == {}:
+            continue
+        first = min(moments, key=lambda player: moments[player])
+        correct += min(stamps, key=lambda player: stamps[player]) == first
+        naive += min(arrivals, key=lambda player: arrivals[player]) == first # Without compensation.
+        errors.extend(abs(stamps[player] - moments[player]) for player in stamps)
+    overheads, grace = sorted(server.overheads), server.grace()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    shut_down(loop, [client.writer for client in clients])
+    server.stop()
+    errors.sort()
+    return {'players':players,'rounds':rounds,'first_buzz_correct':correct/rounds if rounds else 0,
+            'by_arrival_correct':naive/rounds if rounds else 0,
+            'stamp_error_ms':{'p50':1000*percentile(errors, 0.5),'p99':1000*percentile(errors, 0.99)} if errors else None,
+            'arbitration_us':{'p50':1e6*percentile(overheads, 0.5),'p99':1e6*percentile(overheads, 0.99)} if overheads else None,
+            'grace_ms':1000*grace}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the KathySong buzzer server, or try it with simulated players.')
+    parser.add_argument('--port', type=int, default=BUZZ_PORT)
+    parser.add_argument('--simulate', type=int, metavar='PLAYERS', help='simulated players on this machine')
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02, help='most seconds each way, per player')
+    parser.add_argument('--jitter', type=float, default=0.01, help='extra random seconds each way')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.simulate:
+        print(json.dumps(simulate(args.simulate, args.rounds, args.latency, args.jitter, seed=args.seed), indent=1))
+        sys.exit()
+    server = BuzzServer(port=args.port).start() # On its own, for trying clients out:  every
+    print(f'Buzzers at {server.address()}') # event is printed.
+    try:
+        while True:
+            time.sleep(0.1)
+            for event in server.poll():
+                print(event)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,330 @@
+
+# Audio output for KathySong.  Rather than opening the sound device afresh for
+# every excerpt, one output is opened when it is first needed and kept open; a
+# mixer adds together whatever voices are playing, a block at a time, and hands
+# the blocks to the device.  Starting a sound is then only a matter of adding a
+# voice to the mixer, so it is heard within a block or so of being asked for.
+#
+# The backend is chosen with the KATHYSONG_AUDIO environment variable:
+#     auto          a PortAudio stream if the sounddevice module is installed,
+#                   otherwise Simpleaudio (the default)
+#     sounddevice   a PortAudio stream
+#     simpleaudio   one Simpleaudio play_buffer() call per sound, as before
+#     null          nothing is heard, but sounds take as long as they would
+#     wav:PATH      everything played is written to a WAV file, in real time
+import collections
+import threading
+import time
+import wave
+import numpy as np
+import os
+from kathysong_trace import span
+
+MIX_RATE = 44100
+MIX_CHANNELS = 2
+BLOCK = 256 # Frames mixed at a time:  under 6 ms at 44.1 kHz.
+SIMPLEAUDIO_LATENCY = float(os.environ.get('KATHYSONG_OUTPUT_LATENCY_MS', 0))/1000 # The sound
+    # device's buffering after play_buffer() returns, which differs from machine to machine.
+
+def to_mix_format(data, channels, sample_width, frame_rate): # PCM as (frames, MIX_CHANNELS)
+    if sample_width == 2: # int16.  Already in the mix format, it is not copied.
+        samples = np.frombuffer(data, dtype='<i2')
+    elif sample_width == 1:
+        samples = ((np.frombuffer(data, dtype=np.uint8).astype(np.int16) - 128) << 8)
+    elif sample_width == 4:
+        samples = (np.frombuffer(data, dtype='<i4') >> 16).astype(np.int16)
+    else:
+        raise ValueError(f"Unsupported sample width {sample_width}")
+    samples = samples[:len(samples)//channels*channels].reshape(-1, channels)
+    if channels == 1:
+        samples = np.repeat(samples, MIX_CHANNELS, axis=1)
+    elif channels != MIX_CHANNELS:
+        samples = samples[:,:MIX_CHANNELS]
+    if frame_rate != MIX_RATE and len(samples) > 1: # Linear interpolation; only reached for
+        length = int(len(samples)*MIX_RATE/frame_rate) # unusual files, never in the race.
+        positions = np.arange(length)*frame_rate/MIX_RATE
+        samples = np.stack([np.interp(positions, np.arange(len(samples)), samples[:,channel])
+                            for channel in range(MIX_CHANNELS)], axis=1).astype(np.int16)
+    return samples
+
+class Voice(): # One sound playing through a mixer.  Has the methods of a Simpleaudio
+    def __init__(self, mixer, samples, frame_rate): # PlayObject, plus frames_played().
+        self.mixer = mixer
+        self.samples = samples
+        self.scale = frame_rate/MIX_RATE # frames_played() counts the sound's own frames.
+        self.position = 0 # Frames handed to the mixer so far.
+        self.startframe = None # The mixer's frame count when this voice was first mixed.
+        self.stopped = False
+
+    def take(self, frames): # Called by the mixer with its lock held.
+        piece = self.samples[self.position:self.position+frames]
+        self.position += len(piece)
+        return piece
+
+    def finished(self):
+        return self.stopped or self.position >= len(self.samples)
+
+    def frames_played(self): # Frames the device has played out, by the mixer's count.
+        if self.startframe is None:
+            return 0
+        return int(self.scale*max(0, min(self.mixer.frames_out() - self.startframe, self.position)))
+
+    def is_playing(self):
+        if self.stopped or self.startframe is None:
+            return not self.stopped
+        return self.mixer.frames_out() - self.startframe < len(self.samples)
+
+    def stop(self):
+        self.stopped = True
+
+    def wait_done(self):
+        while self.is_playing():
+            time.sleep(BLOCK/MIX_RATE)
+
+class StreamVoice(Voice): # A voice fed as it plays:  pieces handed to feed() follow one
+    def __init__(self, mixer): # another without a gap, until end() is called.  Until then it
+        Voice.__init__(self, mixer, None, MIX_RATE) # stays in the mix, silent if it runs dry.
+        self.pieces = collections.deque()
+        self.ended = False
+
+    def feed(self, excerpt):
+        samples = to_mix_format(excerpt.data, excerpt.channels, excerpt.sample_width, excerpt.frame_rate)
+        with self.mixer.lock:
+            self.scale = excerpt.frame_rate/MIX_RATE
+            self.pieces.append(samples)
+
+    def end(self): # Nothing more will be fed; the voice finishes once what it has is played.
+        self.ended = True
+
+    def take(self, frames): # Called by the mixer with its lock held.
+        taken = []
+        while frames > 0 and self.pieces:
+            piece = self.pieces[0][:frames]
+            if len(piece) == len(self.pieces[0]):
+                self.pieces.popleft()
+            else:
+                self.pieces[0] = self.pieces[0][frames:]
+            taken.append(piece)
+            frames -= len(piece)
+        if frames > 0 and not self.ended and self.startframe is not None:
+            self.startframe += frames # Ran dry:  the silence is not counted as played.
+        if taken == []:
+            return np.zeros((0, MIX_CHANNELS), dtype=np.int16)
+        piece = taken[0] if len(taken) == 1 else np.concatenate(taken)
+        self.position += len(piece)
+        return piece
+
+    def finished(self):
+        return self.stopped or (self.ended and not self.pieces)
+
+    def is_playing(self):
+        if self.stopped:
+            return False
+        if not (self.ended and not self.pieces) or self.startframe is None:
+            return True
+        return self.mixer.frames_out() - self.startframe < self.position
+
+class MixerOutput(): # The mixing shared by every persistent backend.  Subclasses send
+    def __init__(self): # the blocks that render() makes to wherever they are heard.
+        self.voices = []
+        self.lock = threading.Lock()
+        self.rendered = 0 # Frames mixed since the output was opened.
+        self.rendertime = time.perf_counter() # When the last block was mixed.
+
+    def latency(self): # Seconds between a block being mixed and it being heard.
+        return BLOCK/MIX_RATE
+
+    def play(self, excerpt): # excerpt is a PCMExcerpt or anything with its attributes.
+        voice = Voice(self, to_mix_format(excerpt.data, excerpt.channels, excerpt.sample_width, excerpt.frame_rate),
+                      excerpt.frame_rate)
+        with self.lock:
+            self.voices.append(voice)
+        return voice
+
+    def stream_voice(self): # A StreamVoice, already in the mix.
+        voice = StreamVoice(self)
+        with self.lock:
+            self.voices.append(voice)
+        return voice
+
+    def play_timed(self, excerpt): # (voice, when it will be heard on perf_counter(), how
+        before = time.perf_counter() # long play() took).
+        voice = self.play(excerpt)
+        after = time.perf_counter()
+        return voice, after + BLOCK/MIX_RATE/2 + self.latency(), after - before # On average it
+            # waits half a block to be mixed in.
+
+    def render(self, frames): # The next frames of the mix, as int16 bytes.
+        mix = np.zeros((frames, MIX_CHANNELS), dtype=np.int32)
+        with self.lock:
+            for voice in self.voices:
+                if voice.startframe is None:
+                    voice.startframe = self.rendered + int(self.latency()*MIX_RATE)
+                piece = voice.take(frames)
+                mix[:len(piece)] += piece
+            self.voices = [voice for voice in self.voices if not voice.finished()]
+            self.rendered += frames
+            self.rendertime = time.perf_counter()
+        return np.clip(mix, -32768, 32767).astype('<i2').tobytes()
+
+    def frames_out(self): # Frames played out so far, counting on from the last block.
+        with self.lock:
+            rendered, rendertime = self.rendered, self.rendertime
+        since = int((time.perf_counter() - rendertime)*MIX_RATE)
+        return rendered + min(since, BLOCK)
+
+    def stop_all(self):
+        with self.lock:
+            for voice in self.voices:
+                voice.stop()
+            self.voices = []
+
+    def close(self):
+        self.stop_all()
+
+class StreamOutput(MixerOutput): # A PortAudio stream, fed by its own callback thread.
+    def __init__(self):
+        import sounddevice # Optional:  only needed for this backend.
+        MixerOutput.__init__(self)
+        self.stream = sounddevice.RawOutputStream(samplerate=MIX_RATE, channels=MIX_CHANNELS, dtype='int16',
+                                                  blocksize=BLOCK, latency='low', callback=self.callback)
+        self.stream.start()
+
+    def latency(self):
+        return self.stream.latency if hasattr(self, 'stream') else BLOCK/MIX_RATE
+
+    def callback(self, outdata, frames, timing, status):
+        outdata[:] = self.render(frames)
+
+    def close(self):
+        MixerOutput.close(self)
+        self.stream.close()
+
+class PacedOutput(MixerOutput): # Mixes on its own thread at the pace a sound device would
+    def __init__(self): # take the blocks, and passes them to write().
+        MixerOutput.__init__(self)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        deadline = time.perf_counter()
+        while self.running:
+            self.write(self.render(BLOCK))
+            deadline += BLOCK/MIX_RATE
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.1: # Fell far behind (the machine was suspended, say):  catch up
+                deadline = time.perf_counter() # rather than rushing through the backlog.
+
+    def write(self, block):
+        pass
+
+    def close(self):
+        MixerOutput.close(self)
+        self.running = False
+        self.thread.join()
+
+class NullOutput(PacedOutput): # Nothing is heard, but every sound takes its proper time.
+    pass
+
+class WavFileOutput(PacedOutput): # Everything played, silence between sounds included.
+    def __init__(self, path):
+        self.file = wave.open(path,'wb')
+        self.file.setnchannels(MIX_CHANNELS)
+        self.file.setsampwidth(2)
+        self.file.setframerate(MIX_RATE)
+        self.filelock = threading.Lock()
+        PacedOutput.__init__(self)
+
+    def write(self, block):
+        with self.filelock:
+            if self.file is not None:
+                self.file.writeframes(block)
+
+    def close(self):
+        PacedOutput.close(self)
+        with self.filelock:
+            self.file.close()
+            self.file = None
+
+class SimpleaudioVoice(): # A Simpleaudio PlayObject that also counts the frames played.
+    def __init__(self, playobject, frames, frame_rate, started):
+        self.playobject = playobject
+        self.frames = frames
+        self.frame_rate = frame_rate
+        self.started = started
+
+    def frames_played(self): # Simpleaudio does not say, so it is worked out from the time.
+        if not self.playobject.is_playing():
+            return self.frames
+        return max(0, min(int((time.perf_counter() - self.started)*self.frame_rate), self.frames))
+
+    def is_playing(self):
+        return self.playobject.is_playing()
+
+    def stop(self):
+        self.playobject.stop()
+
+    def wait_done(self):
+        self.playobject.wait_done()
+
+class SimpleaudioOutput(): # Opens the device for every sound; for machines without
+    def __init__(self): # PortAudio.
+        import simpleaudio
+        self.sa = simpleaudio
+
+    def latency(self):
+        return SIMPLEAUDIO_LATENCY
+
+    def play_timed(self, excerpt):
+        before = time.perf_counter()
+        playobject = self.sa.play_buffer(excerpt.data, excerpt.channels, excerpt.sample_width, excerpt.frame_rate)
+        after = time.perf_counter()
+        frames = len(excerpt.data)//(excerpt.channels*excerpt.sample_width)
+        voice = SimpleaudioVoice(playobject, frames, excerpt.frame_rate, after + SIMPLEAUDIO_LATENCY)
+        return voice, after + SIMPLEAUDIO_LATENCY, after - before
+
+    def play(self, excerpt):
+        return self.play_timed(excerpt)[0]
+
+    def stop_all(self):
+        self.sa.stop_all()
+
+    def close(self):
+        self.stop_all()
+
+def open_output(name=None): # See the top of this file for the names.
+    name = name or os.environ.get('KATHYSONG_AUDIO', 'auto')
+    if name == 'null':
+        return NullOutput()
+    elif name.startswith('wav:'):
+        return WavFileOutput(name[4:])
+    elif name == 'sounddevice':
+        return StreamOutput()
+    elif name == 'simpleaudio':
+        return SimpleaudioOutput()
+    try:
+        return StreamOutput()
+    except (ImportError, OSError): # sounddevice raises OSError when PortAudio is missing.
+        return SimpleaudioOutput()
+
+OUTPUT = None
+OUTPUT_LOCK = threading.Lock()
+
+def audio_output(): # The output the whole program shares, opened on first use.
+    global OUTPUT
+    with OUTPUT_LOCK:
+        if OUTPUT is None:
+            with span('output.open') as timing:
+                OUTPUT = open_output()
+                timing.set(backend=type(OUTPUT).__name__)
+        return OUTPUT
+
+def close_output():
+    global OUTPUT
+    with OUTPUT_LOCK:
+        if OUTPUT is not None:
+            OUTPUT.close()
+            OUTPUT = None
@@ -0,0 +1,90 @@
+
+# Self-contained game packages (.kathy files) for KathySong.  A package holds a
+# game's song list together with every excerpt, already cut and decoded, so it
+# can be played without the original music library and without any decoding.
+#
+# Layout:  a fixed header (magic, version, index length), the index as UTF-8
+# JSON, then the excerpts' PCM back to back.  Each index entry has the song's
+# titles, artist, hint, original file location, start and duration, plus the
+# offset and length of its PCM (counted from the end of the index) and the PCM
+# format.  Packages are read through mmap, so loading one excerpt only touches
+# that excerpt's bytes.
+import json
+import mmap
+import shutil
+import struct
+import tempfile
+import os
+
+PACKAGE_MAGIC = b'KATHYSNG'
+PACKAGE_VERSION = 1
+PACKAGE_HEADER = struct.Struct('<8sII') # Magic, version, index length.
+
+class PackageError(Exception):
+    pass
+
+def is_package(path):
+    return path.lower().endswith('.kathy')
+
+def write_package(path, entries): # entries yields (record, excerpt) pairs in game order,
+    index = [] # where record is a dict of song metadata and excerpt a PCMExcerpt.  The
+    offset = 0 # PCM is spooled to a temporary file so the whole game is never in memory.
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryFile(dir=directory) as spool:
+        for record, excerpt in entries:
+            entry = dict(record)
+            entry.update({'offset':offset,'length':len(excerpt.data),'channels':excerpt.channels,
+                          'sample_width':excerpt.sample_width,'frame_rate':excerpt.frame_rate})
+            spool.write(excerpt.data)
+            offset += len(excerpt.data)
+            index.append(entry)
+        indexdata = json.dumps({'songs':index}).encode('utf-8')
+        spool.seek(0)
+        temppath = path+'.tmp'
+        try:
+            with open(temppath,'wb') as packagefile:
+                packagefile.write(PACKAGE_HEADER.pack(PACKAGE_MAGIC,PACKAGE_VERSION,len(indexdata)))
+                packagefile.write(indexdata)
+                shutil.copyfileobj(spool, packagefile)
+            os.replace(temppath, path) # A failed export never leaves half a package behind.
+        except OSError:
+            if os.path.isfile(temppath):
+                os.remove(temppath)
+            raise
+
+class GamePackage(): # An open .kathy file.  Kept open for as long as its songs are in use.
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path,'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(self.map) < PACKAGE_HEADER.size:
+                raise PackageError(f"{path} is not a KathySong package")
+            magic, version, indexlength = PACKAGE_HEADER.unpack_from(self.map, 0)
+            if magic != PACKAGE_MAGIC:
+                raise PackageError(f"{path} is not a KathySong package")
+            if version > PACKAGE_VERSION:
+                raise PackageError(f"{path} was made by a newer version of KathySong")
+            self.index = json.loads(self.map[PACKAGE_HEADER.size:PACKAGE_HEADER.size+indexlength].decode('utf-8'))['songs']
+            self.dataoffset = PACKAGE_HEADER.size + indexlength
+        except (ValueError, KeyError, struct.error) as err:
+            self.file.close()
+            raise PackageError(f"{path} is damaged:  {err}")
+        except Exception:
+            self.file.close()
+            raise
+
+    def __len__(self):
+        return len(self.index)
+
+    def records(self): # The song metadata, in game order.
+        return self.index
+
+    def excerpt(self, number): # Yields (data, channels, sample_width, frame_rate),
+        entry = self.index[number] # copying only this excerpt out of the mapping.
+        start = self.dataoffset + entry['offset']
+        return (self.map[start:start+entry['length']],entry['channels'],entry['sample_width'],entry['frame_rate'])
+
+    def close(self):
+        self.map.close()
+        self.file.close()
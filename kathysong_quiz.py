@@ -0,0 +1,156 @@
+
+# Builds a random KathySong game from the command line.  Songs are picked from
+# folders, playlists (.m3u/.m3u8) or the music library, and each is prepared on a
+# pool of processes:  its tags are read, an excerpt start is chosen (at random
+# within the song, or where analysis suggests), and the excerpt is decoded and
+# checked to be long enough and not silent.  A song that fails is swapped for
+# another.  The decoded excerpts go into the audio cache, so the game starts
+# without decoding anything.  For example:
+#     python kathysong_quiz.py ./Music -n 50
+#     python kathysong_quiz.py --library queen -n 20 --offsets analysis -o "Saved Games/Queen.kathy"
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import argparse
+import random
+import time
+import sys
+import os
+from kathysong_engine import Song
+from kathysong_gamefile import save_game, export_package, free_game_path
+from kathysong_library import MusicLibrary, walk, probe_track, AUDIO_EXTENSIONS
+from kathysong_audio import render_excerpt, probe_length, decode_song
+from kathysong_analysis import suggest_starts, excerpt_loudness
+
+QUIZ_WORKERS = max(1, os.cpu_count() or 1)
+TRIES = 3 # Excerpt starts tried per song before it is swapped for another.
+EDGES = (0.1, 0.8) # Random excerpts start between these fractions of the song.
+SILENCE = 0.01 # Excerpts quieter than this RMS (of full scale) are rejected.
+
+def read_playlist(path): # The song files an .m3u playlist names, relative to the playlist.
+    folder = os.path.dirname(os.path.abspath(path))
+    songs = []
+    with open(path,'r',encoding='utf-8-sig',errors='replace') as playlist:
+        for eachline in playlist:
+            eachline = eachline.strip()
+            if eachline == '' or eachline.startswith('#'):
+                continue
+            songs.append(os.path.join(folder, eachline).replace('\\','/'))
+    return songs
+
+def gather(sources, query=None): # Every song file the sources name, each once.
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(path for path, mtime_ns, size in walk(source))
+        elif source.lower().endswith(('.m3u','.m3u8')):
+            paths.extend(read_playlist(source))
+        elif source.lower().endswith(AUDIO_EXTENSIONS):
+            paths.append(source)
+    if query is not None:
+        library = MusicLibrary()
+        if query == '':
+            paths.extend(library.paths())
+        else:
+            paths.extend(row[0] for row in library.search(query, limit=sys.maxsize))
+        library.close()
+    return list(dict.fromkeys(paths))
+
+def audible(excerpt): # Whether an excerpt is more than silence.
+    if excerpt.sample_width != 2:
+        return True
+    samples = np.frombuffer(excerpt.data, dtype='<i2').astype(np.float32)/32768
+    return len(samples) > 0 and float(np.sqrt(np.mean(np.square(samples)))) >= SILENCE
+
+def prepare_song(job): # Runs in a worker process.  Yields (path, record, problem), where
+    path, length, offsets, hint, seed = job # record is None if the song was not usable.
+    rng = random.Random(seed)
+    try:
+        size = os.path.getsize(path)
+        info = probe_track((path, 0, size))
+        duration = info[3] if info[3] is not None else probe_length(path)
+        if duration is None: # This is a worker process, so the whole song can be decoded.
+            duration = len(decode_song(path))
+    except Exception:
+        return path, None, 'unreadable'
+    if duration < length:
+        return path, None, 'too short'
+    if offsets == 'analysis':
+        try:
+            starts = [suggestion['start'] for suggestion in suggest_starts(path, length)]
+        except Exception:
+            return path, None, 'could not be analysed'
+    else:
+        low = EDGES[0]*duration
+        high = max(low, min(EDGES[1]*duration, duration - length))
+        starts = [rng.uniform(low, high) for _ in range(TRIES)]
+    for start in starts[:TRIES]:
+        start = round(start, 1)
+        try:
+            excerpt = render_excerpt(path, start, length)
+        except Exception:
+            return path, None, 'could not be decoded'
+        if excerpt.duration_ms() >= 0.9*length and audible(excerpt):
+            title, artist, album = info[6], info[7], info[8]
+            return path, {'titles':[title],'artist':artist,'hint':{'artist':artist,'album':album}.get(hint, ''),
+                          'fileloc':path,'start':start,'duration':length,'loudness':excerpt_loudness(excerpt)}, None
+    return path, None, 'silent or cut short'
+
+def build_game(paths, count, length=500, offsets='random', hint='none', seed=None, workers=QUIZ_WORKERS,
+               progress=None): # Yields (songs, problems); problems maps paths to what was wrong.
+    rng = random.Random(seed)
+    order = rng.sample(paths, len(paths))
+    chosen, problems = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        def submit():
+            pick = len(chosen) + len(problems) + len(pending)
+            if pick < len(order):
+                pending[pool.submit(prepare_song, (order[pick], length, offsets, hint, rng.random()))] = pick
+        for _ in range(min(count, len(order))):
+            submit()
+        while pending:
+            done, others = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pick = pending.pop(future)
+                path, record, problem = future.result()
+                if record is None:
+                    problems[path] = problem
+                    submit() # Swap in another song.
+                elif len(chosen) < count:
+                    chosen[pick] = record
+                if progress is not None:
+                    progress(len(chosen), count)
+    return [chosen[pick] for pick in sorted(chosen)], problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build a random KathySong game.')
+    parser.add_argument('sources', nargs='*', help='music folders, .m3u playlists or song files')
+    parser.add_argument('--library', nargs='?', const='', metavar='QUERY',
+                        help='also pick from the music library, or from its songs matching QUERY')
+    parser.add_argument('-n', '--songs', type=int, default=50)
+    parser.add_argument('--length', type=int, default=500, help='excerpt length in milliseconds')
+    parser.add_argument('--offsets', choices=['random','analysis'], default='random')
+    parser.add_argument('--hint', choices=['none','artist','album'], default='none')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--workers', type=int, default=QUIZ_WORKERS)
+    parser.add_argument('-o', '--output', help='game file to write (.txt, or .kathy for a package)')
+    args = parser.parse_args()
+    paths = gather(args.sources, args.library)
+    if paths == []:
+        sys.exit('No songs found.')
+    started = time.perf_counter()
+    records, problems = build_game(paths, args.songs, args.length, args.offsets, args.hint, args.seed, args.workers,
+                                   lambda done, total: print(f'{done}/{total}', end='\r'))
+    print()
+    for path, problem in problems.items():
+        print(f'Skipped {path}:  {problem}', file=sys.stderr)
+    if records == []:
+        sys.exit('No usable songs.')
+    game = [Song(record['titles'],record['artist'],record['hint'],record['fileloc'],record['start'],record['duration'],
+                 loudness=record['loudness']) for record in records]
+    output = args.output or free_game_path('Random quiz')
+    if output.lower().endswith('.kathy'):
+        export_package(game, output)
+    else:
+        save_game(game, output)
+    print(f'{len(game)} songs written to {output} in {time.perf_counter() - started:.1f} s')
@@ -0,0 +1,200 @@
+
+# The game editor's list of songs.  SongList holds the songs and which of them
+# are selected; each edit is made in one pass over the list, however many songs
+# are selected, and yields the first and last rows it changed (or None if it
+# changed nothing).  Given a journal (see kathysong_gamefile.GameJournal), each
+# edit is also logged there, so that it can be made again.  SongListView shows a
+# SongList in a Listbox that only ever holds the rows in sight:  scrolling fills
+# them in from the list, and an edit rewrites just the changed rows that are in
+# sight, so a marathon game of tens of thousands of songs is as quick to edit as
+# one of ten.
+import tkinter as tk
+import tkinter.font as font
+import random
+
+WHEEL_ROWS = 3 # Rows scrolled by one notch of the mouse wheel.
+
+class SongList():
+    def __init__(self, songs=None):
+        self.songs = songs if songs is not None else [] # Changed in place, so that whoever
+        self.selected = set() # passed it in sees every edit.  Rows of the chosen songs.
+        self.journal = None
+
+    def log(self, edit, **fields): # After an edit is made.
+        if self.journal is not None:
+            self.journal.log(edit, **fields)
+
+    def __len__(self):
+        return len(self.songs)
+
+    def text(self, row): # What the row shows.
+        return self.songs[row].titles[0]
+
+    def selection(self): # The chosen rows, in order.
+        return sorted(self.selected)
+
+    def select(self, row, chosen=True):
+        if chosen:
+            self.selected.add(row)
+        else:
+            self.selected.discard(row)
+
+    def extend(self, songs):
+        first = len(self.songs)
+        self.songs.extend(songs)
+        if len(self.songs) == first:
+            return None
+        self.log('extend', songs=[eachsong.get_record() for eachsong in self.songs[first:]])
+        return first, len(self.songs) - 1
+
+    def replace(self, row, song):
+        self.songs[row] = song
+        self.log('replace', row=row, song=song.get_record())
+        return row, row
+
+    def restart(self, starts): # Moves excerpts; starts maps songs to their new starts.
+        rows = [row for row, eachsong in enumerate(self.songs) if eachsong in starts]
+        if rows == []:
+            return None
+        for row in rows:
+            self.songs[row].start = starts[self.songs[row]]
+            self.songs[row].loudness = None # Measured afresh for the new excerpt.
+        self.log('restart', rows=rows, starts=[self.songs[row].start for row in rows])
+        return rows[0], rows[-1]
+
+    def to_top(self): # The chosen songs go first, keeping their order.
+        rows = self.selection()
+        if rows == [] or rows[-1] == len(rows) - 1:
+            return None # Already at the top.
+        last = rows[-1]
+        self.songs[:last+1] = ([self.songs[row] for row in rows] +
+                               [self.songs[row] for row in range(last+1) if row not in self.selected])
+        self.selected = set(range(len(rows)))
+        self.log('to_top', rows=rows)
+        return 0, last
+
+    def raise_rows(self): # Each chosen song moves up a row, except those already packed
+        rows = self.selection() # against the top.
+        free = 0 # The highest row a chosen song could move into.
+        moved = set()
+        for row in rows:
+            if row == free:
+                free += 1
+                moved.add(row)
+            else:
+                self.songs[row-1], self.songs[row] = self.songs[row], self.songs[row-1]
+                moved.add(row-1)
+                free = row
+        if moved == self.selected:
+            return None
+        self.selected = moved
+        self.log('raise_rows', rows=rows)
+        return rows[0] - 1 if rows[0] > 0 else 0, rows[-1]
+
+    def lower_rows(self): # The same, downwards.
+        rows = self.selection()
+        free = len(self.songs) - 1
+        moved = set()
+        for row in reversed(rows):
+            if row == free:
+                free -= 1
+                moved.add(row)
+            else:
+                self.songs[row+1], self.songs[row] = self.songs[row], self.songs[row+1]
+                moved.add(row+1)
+                free = row
+        if moved == self.selected:
+            return None
+        self.selected = moved
+        self.log('lower_rows', rows=rows)
+        return rows[0], min(rows[-1] + 1, len(self.songs) - 1)
+
+    def remove(self): # Removes the chosen songs.  The rows from the first of them to the old
+        rows = self.selection() # end have changed.
+        if rows == []:
+            return None
+        last = len(self.songs) - 1
+        self.songs[rows[0]:] = [self.songs[row] for row in range(rows[0], last+1) if row not in self.selected]
+        self.selected = set()
+        self.log('remove', rows=rows)
+        return rows[0], last
+
+    def shuffle(self, seed=None): # The seed is journaled rather than the new order.
+        if self.songs == []:
+            return None
+        seed = random.getrandbits(32) if seed is None else seed
+        random.Random(seed).shuffle(self.songs)
+        self.selected = set()
+        self.log('shuffle', seed=seed)
+        return 0, len(self.songs) - 1
+
+class SongListView(): # Keeps a Listbox and its Scrollbar showing part of a SongList.
+    def __init__(self, box, scroller, songlist):
+        self.box = box
+        self.scroller = scroller
+        self.songlist = songlist
+        self.top = 0 # The row at the top of the box.
+        self.rows = int(box.cget('height')) # Rows that fit in the box.
+        box.config(yscrollcommand='', exportselection=False) # Choosing text elsewhere would
+        scroller.config(command=self.yview) # otherwise clear the selection.
+        box.bind('<<ListboxSelect>>', self.chosen)
+        box.bind('<Configure>', self.resized)
+        box.bind('<MouseWheel>', lambda event:  self.wheel(-1 if event.delta > 0 else 1))
+        box.bind('<Button-4>', lambda event:  self.wheel(-1))
+        box.bind('<Button-5>', lambda event:  self.wheel(1))
+        self.redraw()
+
+    def redraw(self, first=None, last=None): # Rewrites the rows from first to last (all of them
+        total = len(self.songlist) # by default) that are in sight.
+        top = max(0, min(self.top, total - self.rows))
+        if top != self.top:
+            self.top, first, last = top, None, None
+        shown = min(self.rows, total - top)
+        self.box.delete(shown, tk.END) # Rows past the end of the list or the box.
+        first = top if first is None else max(first, top)
+        first = min(first, top + self.box.size()) # The box has no gaps.
+        last = top + shown - 1 if last is None else min(last, top + shown - 1)
+        if first <= last:
+            self.box.delete(first - top, last - top)
+            self.box.insert(first - top, *[self.songlist.text(row) for row in range(first, last+1)])
+            for row in range(first, last+1):
+                if row in self.songlist.selected:
+                    self.box.selection_set(row - top)
+        if total == 0:
+            self.scroller.set(0, 1)
+        else:
+            self.scroller.set(top/total, (top + shown)/total)
+
+    def scroll_to(self, top):
+        self.top = max(0, min(top, len(self.songlist) - self.rows))
+        self.redraw()
+
+    def see(self, row): # Scrolls as little as will bring the row into sight.
+        if row < self.top:
+            self.scroll_to(row)
+        elif row >= self.top + self.rows:
+            self.scroll_to(row - self.rows + 1)
+
+    def yview(self, *args): # The Scrollbar's command.
+        if args[0] == 'moveto':
+            self.scroll_to(round(float(args[1])*len(self.songlist)))
+        elif args[0] == 'scroll':
+            self.scroll_to(self.top + int(args[1])*(self.rows if args[2] == 'pages' else 1))
+
+    def wheel(self, direction):
+        self.scroll_to(self.top + direction*WHEEL_ROWS)
+        return 'break'
+
+    def chosen(self, event): # The user clicked rows in sight; the list follows.
+        picked = set(self.box.curselection())
+        for index in range(self.box.size()):
+            self.songlist.select(self.top + index, index in picked)
+
+    def resized(self, event):
+        lineheight = font.Font(root=self.box, font=self.box.cget('font')).metrics('linespace')
+        lineheight += 2*int(self.box.cget('selectborderwidth'))
+        border = 2*(int(self.box.cget('borderwidth')) + int(self.box.cget('highlightthickness')))
+        rows = max(1, (event.height - border)//lineheight)
+        if rows != self.rows:
+            self.rows = rows
+            self.redraw()
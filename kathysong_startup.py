@@ -0,0 +1,120 @@
+
+# Measures KathySong's cold start:  runs kathysong_main.py afresh a few times under
+# Python's -X importtime, has it close the main menu as soon as it is drawn, and
+# reports the time to the first window (from before the interpreter is started,
+# and from the first line of kathysong_main) and the modules whose own import
+# took longest, as -X importtime itself would list them.  The audio modules are not needed for the main menu, so any of them
+# found among the imports is flagged.  Results can be kept as JSON and compared:
+#     python kathysong_startup.py --runs 5 --output new.json --baseline old.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kathysong_main.py')
+LAZY_MODULES = ('pydub','simpleaudio','sounddevice','numpy','kathysong_audio','kathysong_output',
+                'kathysong_transport','kathysong_waveform','kathysong_analysis','kathysong_library')
+REGRESSION = 1.2 # A median this many times the baseline's is reported as a regression.
+TOP = 15 # Modules listed by import time.
+
+def median(values):
+    values = sorted(values)
+    middle = len(values)//2
+    return values[middle] if len(values) % 2 else (values[middle-1] + values[middle])/2
+
+def parse_importtime(text): # {module: (self us, cumulative us, whether imported at the top
+    imports = {} # level rather than on behalf of another module)}.
+    for eachline in text.splitlines():
+        if not eachline.startswith('import time:') or 'imported package' in eachline:
+            continue
+        selftime, cumulative, name = eachline[len('import time:'):].split('|', 2)
+        imports[name.strip()] = (int(selftime), int(cumulative), len(name) - len(name.lstrip()) <= 1) # Nested
+    return imports # imports are indented further.
+
+def probe(directory): # One cold start.  Yields (first window in s from the parent's launch,
+    before = time.perf_counter() # in s from kathysong_main's first line, imports, error).
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', MAIN, '--startup-probe'], cwd=directory,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    firstwindow = inprocess = None
+    for eachline in process.stdout:
+        if eachline.startswith('first window'):
+            firstwindow = time.perf_counter() - before
+            inprocess = float(eachline.split()[-1])
+    errors = process.stderr.read()
+    process.wait()
+    imports = parse_importtime(errors)
+    problem = None
+    if firstwindow is None:
+        lines = [eachline for eachline in errors.splitlines() if not eachline.startswith('import time:')]
+        problem = lines[-1] if lines else f'exited with status {process.returncode}'
+    return firstwindow, inprocess, imports, problem
+
+def run_probes(runs=5, directory=None):
+    directory = directory or os.path.dirname(MAIN)
+    firstwindows, inprocesses, totals, modules = [], [], [], {}
+    problem = None
+    for _ in range(runs):
+        firstwindow, inprocess, imports, problem = probe(directory)
+        totals.append(sum(cumulative for selftime, cumulative, toplevel in imports.values() if toplevel)/1000)
+        for module, (selftime, cumulative, toplevel) in imports.items():
+            modules.setdefault(module, []).append((selftime/1000, cumulative/1000))
+        if problem is not None:
+            break # Every run would fail the same way.
+        firstwindows.append(firstwindow)
+        inprocesses.append(inprocess)
+    results = {'imports_ms':median(totals),
+               'modules_ms':{module:{'self':median([selftime for selftime, cumulative in times]),
+                                     'cumulative':median([cumulative for selftime, cumulative in times])}
+                             for module, times in modules.items()},
+               'lazy_loaded':sorted({module.split('.')[0] for module in modules} & set(LAZY_MODULES))}
+    if firstwindows != []:
+        results['first_window_ms'] = 1000*median(firstwindows)
+        results['in_process_ms'] = 1000*median(inprocesses)
+    return {'meta':{'time':time.time(),'python':platform.python_version(),'platform':platform.platform(),
+                    'runs':len(totals),'problem':problem},
+            'results':results}
+
+def report(suite, baseline=None, top=TOP):
+    results = suite['results']
+    old = baseline['results'] if baseline is not None else {}
+    if suite['meta']['problem'] is not None:
+        print(f"The main menu could not be opened:  {suite['meta']['problem']}")
+    for name, label in [('first_window_ms','first window, from launch'),('in_process_ms','first window, in process'),
+                        ('imports_ms','imports')]:
+        if name not in results:
+            continue
+        line = f'{label:28} {results[name]:8.1f} ms'
+        if old.get(name):
+            ratio = results[name]/old[name]
+            line += f"  x{ratio:.2f}" + ('  REGRESSION' if ratio > REGRESSION else '')
+        print(line)
+    print(f"\n  {'module':36} {'self':>8}    {'cumulative':>10}")
+    ranked = sorted(results['modules_ms'].items(), key=lambda item: -item[1]['self'])
+    for module, times in ranked[:top]:
+        line = f"  {module:36} {times['self']:8.1f} ms {times['cumulative']:10.1f} ms"
+        if module in old.get('modules_ms', {}):
+            line += f"  (was {old['modules_ms'][module]['self']:.1f} ms)"
+        print(line)
+    if results['lazy_loaded'] != []:
+        print('\nImported before the main menu, though only needed for playing or editing:')
+        print('  '+', '.join(results['lazy_loaded']))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure how long KathySong takes to open its main menu.')
+    parser.add_argument('--runs', type=int, default=5, help='cold starts to take the median of')
+    parser.add_argument('--top', type=int, default=TOP, help='modules to list')
+    parser.add_argument('--output', help='file to write the results to, as JSON')
+    parser.add_argument('--baseline', help='results of an earlier run to compare against')
+    args = parser.parse_args()
+    suite = run_probes(args.runs)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline,'r') as baselinefile:
+            baseline = json.load(baselinefile)
+    report(suite, baseline, args.top)
+    if args.output:
+        with open(args.output,'w') as outputfile:
+            json.dump(suite, outputfile, indent=1)
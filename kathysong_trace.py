@@ -0,0 +1,202 @@
+
+# Optional timing of KathySong's hot paths.  Set KATHYSONG_TRACE to a file name
+# and every span (decoding an excerpt, starting a round, judging an answer,
+# loading a game or opening a song in the editor) is appended to it as a line of
+# JSON, such as
+#     {"name": "excerpt.render", "ms": 41.2, "at": 12.53, "thread": "...", "round": 3, "cached": false}
+# where "at" is seconds since tracing began.  Spans opened inside another span
+# name it as their parent and take on its round.  When a game ends, a summary
+# line follows with percentiles for each name and the time each round spent in
+# each, and the summary is printed.  Without KATHYSONG_TRACE, span() hands back
+# one shared object that does nothing, so the instrumented code only pays for a
+# function call.  A trace can be summarised afterwards with:
+#     python kathysong_trace.py trace.jsonl --rounds
+import argparse
+import atexit
+import threading
+import json
+import time
+import os
+
+class NullSpan(): # What span() yields when tracing is off.
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        return False
+
+    def set(self, **fields):
+        pass
+
+NULL_SPAN = NullSpan()
+
+class Span():
+    def __init__(self, tracer, name, fields):
+        self.tracer = tracer
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        stack = self.tracer.stack()
+        if stack != []:
+            self.fields['parent'] = stack[-1].name
+            if 'round' not in self.fields and 'round' in stack[-1].fields:
+                self.fields['round'] = stack[-1].fields['round']
+        stack.append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        elapsed = time.perf_counter() - self.started
+        self.tracer.stack().pop()
+        if kind is not None:
+            self.fields['error'] = kind.__name__
+        self.tracer.record(self.name, elapsed, self.started, **self.fields)
+        return False
+
+    def set(self, **fields): # Adds what is only known once the work is under way.
+        self.fields.update(fields)
+
+class Tracer():
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path,'a',encoding='utf-8')
+        self.lock = threading.Lock()
+        self.local = threading.local() # Each thread's open spans.
+        self.origin = time.perf_counter()
+        self.game = [] # The entries since the current game began, for its summary.
+
+    def stack(self):
+        if not hasattr(self.local, 'spans'):
+            self.local.spans = []
+        return self.local.spans
+
+    def record(self, name, seconds, started=None, **fields): # A span timed by the caller.
+        if started is None:
+            started = time.perf_counter() - seconds
+        entry = {'name':name,'ms':round(1000*seconds, 3),'at':round(started - self.origin, 6),
+                 'thread':threading.current_thread().name}
+        entry.update(fields)
+        line = json.dumps(entry)
+        with self.lock:
+            if self.file is not None:
+                self.file.write(line+'\n')
+            self.game.append(entry)
+
+    def begin_game(self, **fields):
+        with self.lock:
+            self.game = []
+        self.record('game.begin', 0.0, **fields)
+
+    def end_game(self): # Writes and yields the summary of the game.
+        with self.lock:
+            entries, self.game = self.game, []
+            summary = summarize(entries)
+            if self.file is not None:
+                self.file.write(json.dumps({'name':'game.summary','at':round(time.perf_counter() - self.origin, 6),
+                                            'summary':summary})+'\n')
+                self.file.flush()
+        return summary
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+def percentile(samples, fraction): # samples must be sorted.
+    return samples[min(len(samples)-1, int(fraction*len(samples)))]
+
+def summarize(entries): # {'spans': {name: percentiles in ms}, 'rounds': {round: {name: ms}}}
+    durations, rounds = {}, {}
+    for entry in entries:
+        if 'ms' not in entry or entry['name'] in ('game.begin','game.summary'):
+            continue
+        durations.setdefault(entry['name'], []).append(entry['ms'])
+        if entry.get('round') is not None:
+            breakdown = rounds.setdefault(str(entry['round']), {})
+            breakdown[entry['name']] = round(breakdown.get(entry['name'], 0) + entry['ms'], 3)
+    spans = {}
+    for name, times in durations.items():
+        times.sort()
+        spans[name] = {'calls':len(times),'p50':percentile(times, 0.5),'p90':percentile(times, 0.9),
+                       'p99':percentile(times, 0.99),'max':times[-1],'total':round(sum(times), 3)}
+    return {'spans':spans,'rounds':dict(sorted(rounds.items(), key=lambda item: int(item[0])))}
+
+def format_summary(summary, rounds=False): # As lines of text.
+    lines = [f"{'span':24} {'calls':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    for name, result in sorted(summary['spans'].items()):
+        lines.append(f"{name:24} {result['calls']:6} {result['p50']:9.2f} {result['p90']:9.2f} "
+                     f"{result['p99']:9.2f} {result['max']:9.2f}")
+    if rounds:
+        for number, breakdown in summary['rounds'].items():
+            lines.append(f'round {number}:  '+', '.join(f'{name} {ms:.1f} ms' for name, ms in breakdown.items()))
+    return lines
+
+TRACER = None
+
+def start_tracing(path):
+    global TRACER
+    stop_tracing()
+    TRACER = Tracer(path)
+
+def stop_tracing():
+    global TRACER
+    if TRACER is not None:
+        TRACER.close()
+        TRACER = None
+
+def tracing():
+    return TRACER is not None
+
+def span(name, **fields): # Use as "with span('name', round=3) as timing:"; timing.set()
+    if TRACER is None: # adds fields found out inside the block.
+        return NULL_SPAN
+    return Span(TRACER, name, fields)
+
+def record(name, seconds, **fields):
+    if TRACER is not None:
+        TRACER.record(name, seconds, **fields)
+
+def begin_game(**fields):
+    if TRACER is not None:
+        TRACER.begin_game(**fields)
+
+def end_game(): # The game's summary, or None when tracing is off.
+    if TRACER is None:
+        return None
+    return TRACER.end_game()
+
+if os.environ.get('KATHYSONG_TRACE'):
+    start_tracing(os.environ['KATHYSONG_TRACE'])
+    atexit.register(stop_tracing)
+
+def read_trace(path): # The spans of a trace file; summary lines are skipped.
+    entries = []
+    with open(path,'r',encoding='utf-8') as tracefile:
+        for eachline in tracefile:
+            try:
+                entry = json.loads(eachline)
+            except ValueError: # A line cut short when the program was killed.
+                continue
+            if entry.get('name') != 'game.summary':
+                entries.append(entry)
+    return entries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Summarise a KathySong trace file.')
+    parser.add_argument('trace', help='a file written with KATHYSONG_TRACE set')
+    parser.add_argument('--rounds', action='store_true', help='also break each round down by span')
+    parser.add_argument('--game', type=int, help='only the Nth game in the file, counting from 1')
+    args = parser.parse_args()
+    entries = read_trace(args.trace)
+    if args.game is not None:
+        games, current = [], None
+        for entry in entries:
+            if entry['name'] == 'game.begin':
+                current = []
+                games.append(current)
+            if current is not None:
+                current.append(entry)
+        entries = games[args.game-1] if 0 < args.game <= len(games) else []
+    print('\n'.join(format_summary(summarize(entries), args.rounds)))
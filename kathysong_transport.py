@@ -0,0 +1,133 @@
+
+# The song editor's transport:  play, pause and seek over the one buffer a
+# ChunkedDecoder holds.  The playhead is kept in frames, not milliseconds of wall
+# clock, and audio is handed to the sound device as memoryview slices of the
+# decoded buffer, a span at a time, so nothing is copied or written to disk on
+# our side.  Through a mixer (see kathysong_output) the spans are fed to one
+# stream voice, each before the one ahead of it runs out, so they play without a
+# gap; Simpleaudio has no mixer, and there each span is started once the last
+# has finished.  While playing, the playhead is the first frame played plus the
+# frames the output reports as played out; a pause therefore leaves the needle
+# on the frame heard.
+from kathysong_audio import PCMExcerpt
+from kathysong_output import audio_output
+
+class Transport():
+    def __init__(self, decoder, span=30000):
+        self.decoder = decoder
+        self.span = span # Milliseconds handed to the sound device at a time.
+        self.position = 0 # The playhead in frames, while stopped.
+        self.active = False
+        self.waiting = False # Playing, but the decoder has not reached the playhead yet.
+        self.playobject = None # The voice playing the current span, or the stream voice.
+        self.streaming = False # Spans are fed to a stream voice.
+        self.spanstart = self.spanend = 0 # While streaming, the first frame played and the
+            # frame after the last fed.
+        self.end = None # The frame to stop at, or None to play on to the end of the song.
+
+    def frame_rate(self):
+        return self.decoder.frame_rate or 44100 # Until the decoder knows the format.
+
+    def ms_to_frame(self, ms):
+        return max(0, int(round(ms*self.frame_rate()/1000)))
+
+    def frame_to_ms(self, frame):
+        return 1000*frame/self.frame_rate()
+
+    def play(self, frame=None, end=None): # From frame (or the playhead) to end (or the end).
+        self.stop()
+        if frame is not None:
+            self.position = frame
+        self.active = True
+        self.end = end
+        output = audio_output()
+        self.streaming = hasattr(output, 'stream_voice')
+        if self.streaming:
+            self.playobject = output.stream_voice()
+            self.spanstart = self.spanend = self.position
+            self.feed()
+        else:
+            self.start_span(self.position)
+
+    def frames(self, data):
+        return len(data)//(self.decoder.channels*self.decoder.sample_width)
+
+    def feed(self): # Hands the stream voice the next span once it has less than half a span
+        if self.playobject.ended: # left to play.
+            return None
+        ahead = self.ms_to_frame(self.span)
+        if self.spanend - self.heard() >= ahead//2:
+            return None
+        last = self.spanend + ahead
+        if self.end is not None:
+            last = min(last, self.end)
+        data = self.decoder.view(self.spanend, last)
+        if len(data) > 0:
+            self.playobject.feed(PCMExcerpt(data, self.decoder.channels, self.decoder.sample_width,
+                                            self.decoder.frame_rate))
+            self.spanend += self.frames(data)
+        elif self.decoder.finished:
+            self.playobject.end() # Played to the end of the song.
+        if self.end is not None and self.spanend >= self.end:
+            self.playobject.end()
+
+    def start_span(self, first):
+        last = first + self.ms_to_frame(self.span)
+        if self.end is not None:
+            last = min(last, self.end)
+        data = self.decoder.view(first, last)
+        if len(data) == 0:
+            if self.decoder.finished or (self.end is not None and first >= self.end):
+                self.position = first # Played to the end.
+                self.active = self.waiting = False
+            else:
+                self.spanstart, self.waiting = first, True
+            return None
+        excerpt = PCMExcerpt(data, self.decoder.channels, self.decoder.sample_width, self.decoder.frame_rate)
+        self.playobject = excerpt.play()
+        self.spanstart = first
+        self.spanend = first + self.frames(data)
+        self.waiting = False
+
+    def heard(self): # The frame at the playhead.
+        if not self.active:
+            return self.position
+        if self.waiting or self.playobject is None:
+            return self.spanstart
+        return min(self.spanstart + self.playobject.frames_played(), self.spanend)
+
+    def poll(self): # Called regularly while playing:  queues the next span.  Yields the
+        if not self.active: # playhead, or None once stopped.
+            return None
+        if self.streaming:
+            self.feed()
+            if not self.playobject.is_playing():
+                self.position = self.spanend # Played to the end.
+                self.playobject = None
+                self.active = False
+        elif self.waiting:
+            self.start_span(self.spanstart)
+        elif not self.playobject.is_playing():
+            self.start_span(self.spanend)
+        if not self.active:
+            return None
+        return self.heard()
+
+    def pause(self): # Leaves the playhead on the frame heard, and yields it.
+        frame = self.heard()
+        self.stop()
+        self.position = frame
+        return frame
+
+    def seek(self, frame):
+        playing = self.active
+        self.stop()
+        self.position = frame
+        if playing:
+            self.play(frame, self.end)
+
+    def stop(self): # Stops without moving the playhead.
+        if self.playobject is not None:
+            self.playobject.stop()
+            self.playobject = None
+        self.active = self.waiting = False
@@ -0,0 +1,1306 @@
+
+# KathySong's windows.  The audio modules (and with them Pydub, Simpleaudio and
+# NumPy) are imported by the methods that first need them rather than up here,
+# so the main menu is drawn without waiting for any of them; see kathysong_main.
+import tkinter as tk  # Tkinter imports
+from tkinter import ttk
+from tkinter import filedialog
+from tkinter import messagebox
+import tkinter.font as font
+from tkinter.scrolledtext import ScrolledText
+from kathysong_engine import Song, GameEngine, ACCEPTANCES, CONTESTANT_SLOTS # Game imports
+from kathysong_gamefile import load_game, claim_game_path, save_game, export_package, GameJournal
+from kathysong_package import PackageError, is_package
+from kathysong_trace import span, record, tracing, begin_game, end_game, format_summary
+from kathysong_songlist import SongList, SongListView
+import datetime # Assorted imports
+import time
+import os
+import random
+import threading
+import sys
+
+BUTTONBACKGROUNDCOLOR = '#dddd00' # General color scheme
+BUTTONTEXTCOLOR = '#335500'
+PLAY_SPAN = 30000 # The song editor plays this many milliseconds at a time.
+INTERLUDE = 3000 # Milliseconds between one round's answer and the next round.
+MIN_VIEW = 100 # Milliseconds shown when the waveform is zoomed in all the way.
+POLL_INTERVAL = 50 # Milliseconds between checks for an excerpt that is still decoding.
+GAMEFILETYPES = (('KathySong games','*.txt *.kathy'),('All files','*.*'))
+SEARCH_DELAY = 150 # Milliseconds of no typing before the library is searched.
+NETWORK_POLL = 20 # Milliseconds between checks for network buzzers' events.
+MAX_REPORTED = 15 # Problems listed by name when a game is loaded; the rest are counted.
+
+# Below are one function and eight tkinter window child classes (the 'song'
+# object is in kathysong_engine).  Of the window classes, the PlayWindow class
+# contains most of the code pertinent to playing the identification game, while
+# the GameEditWindow and SongEditWindow are for setting up the game.
+
+def ask_load_game(path): # Loads a game, reporting every problem in one message and offering
+    try: # to skip missing songs.  Yields the game, or None if it is abandoned.
+        game, missing, problems = load_game(path)
+    except (OSError, UnicodeDecodeError, PackageError) as err:
+        messagebox.showerror('Error',f'Could not load {path}:  {err}')
+        return None
+    report = problems + [f'Could not locate file:  {eachsong.fileloc}' for eachsong in missing]
+    if report == []:
+        return game
+    text = '\n'.join(report[:MAX_REPORTED])
+    if len(report) > MAX_REPORTED:
+        text += f'\n...and {len(report)-MAX_REPORTED} more'
+    if len(missing) == len(game):
+        messagebox.showerror('Error',text)
+        return None
+    if missing == []:
+        messagebox.showwarning('Warning',text+'\n\nThese entries have been left out.')
+        return game
+    if messagebox.askyesno('Missing songs',text+f'\n\nSkip the {len(missing)} missing songs?'):
+        missing = set(map(id, missing))
+        return [eachsong for eachsong in game if id(eachsong) not in missing]
+    return None
+
+class NameGetWindow(tk.Toplevel): # Puts a player's name on the appropriate
+    def __init__(self, labeltochange, master=None, number=0, place=0):
+        tk.Toplevel.__init__(self, master) # nametag in the PlayWindow and
+        self.title("Insert name") # asks the player to practice buzzing in
+        self.resizable(False,False) # with a certain key (depending on position).
+        self.iconbitmap('.\Music\KathySong.ico')
+        self.config(bg='yellow')
+        self.grab_set()
+        self.labeltochange = labeltochange
+        self.readytochange = tk.BooleanVar(value=False)
+
+        tk.Label(self,text=f'Contestant #{number}, what is your name?',bg='yellow',font=PLAY_MENU_FONT).grid(column=0,row=0)
+        namebox_entry = ttk.Entry(self,font=PLAY_MENU_FONT)
+        namebox_entry.grid(column=0, row=1)
+        namebox_entry.insert(0,random.choice(['Johann','Wolfgang','Ludwig','Louis','Elvis','Michael']))
+
+        self.namebox_entry = namebox_entry
+
+        self.bind('<Return>', lambda e:  self.readytochange.set(True))
+        if place == 0:
+            tk.Label(self,text='When you have entered your name, press enter and buzz in with the left shift key.',bg='yellow',font=PLAY_MENU_FONT).grid(column=0,row=2)
+            self.bind('<Shift_L>', lambda e: self.submit(e))
+        elif place == 1:
+            tk.Label(self,text='When you have entered your name, press enter and buzz in with the space bar.',bg='yellow',font=PLAY_MENU_FONT).grid(column=0,row=2)
+            self.bind('<space>', lambda e:  self.submit(e))
+        elif place == 2:
+            tk.Label(self,text='When you have entered your name, press enter and buzz in with the right shift key.',bg='yellow',font=PLAY_MENU_FONT).grid(column=0,row=2)
+            self.bind('<Shift_R>', lambda e:  self.submit(e))
+
+        self.protocol('WM_DELETE_WINDOW',self.on_exit) # This method is added to
+                           # every window class to prevent the game from getting
+    def submit(self, e):   # stuck when someone presses 'x' on a custom dialog or
+        if self.readytochange.get(): # main screen.
+            self.labeltochange.config(text=self.namebox_entry.get())
+            self.destroy()
+
+    def on_exit(self):
+        self.labeltochange.config(text=self.namebox_entry.get())
+        #self.labeltochange.config(text="Can't follow instructions",font=font.Font(family='Segoe Print',size=10))
+        self.destroy()
+
+class AnswerWindow(tk.Toplevel): # Retrieves a player's song title guess and
+    def __init__(self, playername, master, songobject, strictness):
+        tk.Toplevel.__init__(self,master) # evaluates it, modifying the main
+        self.config(bg='yellow') # label on the PlayWindow (master) accordingly.
+        self.songobject = songobject # Master must be a PlayWindow object.
+        self.strictness = strictness
+        self.title = f"{playername} has buzzed in"
+        tk.Label(self,text=f"{playername}, what is your answer?",bg='yellow',font=PLAY_MENU_FONT).pack()
+        ans_ent = ttk.Entry(self,font=PLAY_MENU_FONT)
+        ans_ent.pack()
+        tk.Label(self,text="Press enter to submit",bg='yellow',font=PLAY_MENU_FONT).pack()
+        self.ans_ent = ans_ent
+        self.bind('<Return>', lambda e: self.submit(e, strictness))
+        self.protocol('WM_DELETE_WINDOW',self.on_exit)
+
+    def submit(self, e, strictness): # The game engine judges the guess.
+        with span('answer.submit', round=self.master.engine.round) as timing:
+            correct = self.master.answer_given(self.ans_ent.get())
+            timing.set(correct=correct)
+            correctans, detail = self.songobject.titles[0], self.songobject.artist
+            if correct:
+                self.master.mainlabeltext.set(f"⭕CORRECT⭕\n{correctans}\n{detail}")
+            else:
+                self.master.mainlabeltext.set(f"{correctans}\n{detail}")
+        self.destroy()
+
+    def on_exit(self): # Assume incorrect if 'x' is hit.
+        self.master.answer_given(None)
+        self.master.mainlabeltext.set(f"{self.songobject.titles[0]}\n{self.songobject.artist}")
+        self.destroy()
+
+class PlayWindow(tk.Toplevel): # Plays the game assigned to it by the MainMenuWindow.
+    def __init__(self, master, acceptance, number_of_contestants, game=[], network=False):
+        tk.Toplevel.__init__(self, master)
+        self.title("Play window")
+        self.resizable(False,False)
+        swid, shei = self.winfo_screenwidth()-20, self.winfo_screenheight() - 100
+        self.geometry(f"{swid}x{shei}")
+        self.iconbitmap('.\Music\KathySong.ico')
+        self.config(bg='yellow')
+        self.acceptance = acceptance
+        self.number_of_contestants = {'single':1,'dual':2,'triple':3}[number_of_contestants]
+        self.game = game
+        self.cont_exist = [c in CONTESTANT_SLOTS[number_of_contestants] for c in range(3)]
+        self.engine = GameEngine(game, acceptance, CONTESTANT_SLOTS[number_of_contestants]) # Scores
+        self.phase = 'setup' # See start_round.                  # and judges; this window only shows.
+        self.job = None # The pending after() callback of the current phase.
+        self.ready = set()
+        self.startlatencies = [] # Seconds each round's play() took to start the sound.
+        self.closing = False # Whether a buzz has been made and the round is about to be judged.
+        self.answindow = None
+        self.server = None # Buzzers on players' own phones or laptops (see kathysong_netbuzz).
+        self.netnames = {} # Their names, kept after they leave.
+        self.netgone = set() # Those who have left; their scores stand, marked on the netboard.
+        from kathysong_audio import PreRenderer # The audio modules are first needed here.
+        self.prerenderer = PreRenderer(self.game) # Started by run_game.
+
+        for i in range(3):
+            self.columnconfigure(i, weight=1)
+        self.rowconfigure(0,weight=0)
+        self.rowconfigure(1,weight=2)
+        self.rowconfigure([2,3],weight=1)
+
+        self.mainlabeltext = tk.StringVar()
+        self.mainlabeltext.set('')
+
+        mainlabel = tk.Label(master=self, textvariable=self.mainlabeltext, font=MAIN_PLAY_FONT, bg='blue')
+        mainlabel.grid(row=0,column=0,columnspan=3,rowspan=2)
+        lcon_lbl = tk.Label(master=self, text="", font=PLAYER_NAME_FONT, bg='green')
+        lcon_lbl.grid(row=2,column=0)
+        ccon_lbl = tk.Label(master=self, text="", font=PLAYER_NAME_FONT, bg='green')
+        ccon_lbl.grid(row=2,column=1)
+        rcon_lbl = tk.Label(master=self, text="", font=PLAYER_NAME_FONT, bg='green')
+        rcon_lbl.grid(row=2,column=2)
+        lsco_lbl = tk.Label(master=self, text="", font=PLAYER_SCORE_FONT, bg='yellow')
+        lsco_lbl.grid(row=3,column=0)
+        csco_lbl = tk.Label(master=self, text="", font=PLAYER_SCORE_FONT, bg='yellow')
+        csco_lbl.grid(row=3,column=1)
+        rsco_lbl = tk.Label(master=self, text="", font=PLAYER_SCORE_FONT, bg='yellow')
+        rsco_lbl.grid(row=3,column=2)
+
+        self.labellist = [mainlabel,lcon_lbl,ccon_lbl,rcon_lbl,lsco_lbl,csco_lbl,rsco_lbl]
+
+        tk.Button(self, text="Return to main menu", bg='yellow',command=lambda: self.supreme_destroy()).grid(row=0,column=2,sticky=tk.NE)
+        tk.Button(self, text="Pass this song", bg='yellow',command=lambda: self.passong()).grid(row=1,column=2,sticky=tk.NE)
+        self.prerendertext = tk.StringVar(value='')
+        tk.Label(self, textvariable=self.prerendertext, bg='yellow').grid(row=0,column=0,sticky=tk.NW)
+        if network:
+            from kathysong_netbuzz import BuzzServer
+            try:
+                self.server = BuzzServer().start()
+            except OSError as err:
+                messagebox.showerror('Error',f'Network buzzers could not be started:  {err}')
+        if self.server is not None:
+            self.rowconfigure(4,weight=1)
+            tk.Label(self, text=f'Buzz from a phone at {self.server.address()}', bg='yellow').grid(row=1,column=0,sticky=tk.NW)
+            self.netboard = tk.Listbox(self, font=PLAY_MENU_FONT, height=6) # Network players'
+            self.netboard.grid(row=4,column=0,columnspan=3,sticky=tk.NSEW) # scores, best first.
+
+        self.protocol('WM_DELETE_WINDOW', self.supreme_destroy)
+
+    def supreme_destroy(self): # This method cancels whatever phase of the round is
+        self.phase = 'over' # scheduled and returns the main menu to view.
+        if self.job is not None: # Preferable to the 'x' button.
+            self.after_cancel(self.job)
+            self.job = None
+        from kathysong_output import audio_output
+        audio_output().stop_all()
+        self.prerenderer.cancel()
+        if self.server is not None:
+            self.server.stop()
+        self.master.deiconify()
+        self.destroy()
+
+    def schedule(self, delay, callback): # Every change of phase goes through here, so only
+        if self.job is not None: # one is ever pending.  A delay of None waits until Tk
+            self.after_cancel(self.job) # has handled every event already queued.
+        if delay is None:
+            self.job = self.after_idle(callback)
+        else:
+            self.job = self.after(delay, callback)
+
+    def namefill(self):
+        for number in range(self.number_of_contestants):
+            if self.number_of_contestants == 1:
+                place = 1
+            elif self.number_of_contestants == 2:
+                if number == 0:
+                    place = 0
+                else:
+                    place = 2
+            elif self.number_of_contestants == 3:
+                place = number
+            namewindow = NameGetWindow(self.labellist[place+1], self, number+1, place)
+            namewindow.grab_set()
+            self.wait_window(namewindow)
+            self.grab_set()
+
+    def lbuzz(self, e):
+        self.buzz(0, e)
+
+    def cbuzz(self, e):
+        self.buzz(1, e)
+
+    def rbuzz(self, e):
+        self.buzz(2, e)
+
+    def buzz(self, player, e): # What a buzz does depends on the phase of the round.
+        if not self.cont_exist[player]:
+            return None
+        if self.phase == 'ready':
+            self.labellist[player+1].config(bg='white')
+            self.ready.add(player)
+            if all(c in self.ready for c in range(3) if self.cont_exist[c]):
+                self.phase = 'hint'
+                self.hintstart = time.perf_counter() # Any wait for the excerpt is traced.
+                self.mainlabeltext.set('All players buzzed in!')
+                self.schedule(0, self.show_hint)
+        elif self.phase == 'playing':
+            self.labellist[player+1].config(bg='white')
+            self.engine.buzz(player, self.engine.arbiter.event_time(e))
+            self.close_soon()
+
+    def close_soon(self): # Judged once any other key presses of the same moment have been
+        if self.closing: # handled as well, and any network buzz of that moment has arrived.
+            return None
+        self.closing = True
+        self.schedule(None if self.server is None else int(1000*self.server.grace()), self.end_playing)
+
+    def poll_network(self): # Reschedules itself until the window closes.
+        if not self.winfo_exists():
+            return None
+        for event in self.server.poll():
+            if event[0] == 'join':
+                self.netnames[event[1]] = event[2]
+                self.engine.add_player(event[1])
+                self.scoreupdate()
+            elif event[0] == 'leave':
+                self.netgone.add(event[1])
+                self.scoreupdate()
+            elif event[0] == 'buzz' and self.phase == 'playing':
+                self.engine.buzz(event[1], event[2]) # Stamped when it was made, on our clock.
+                self.close_soon()
+            elif event[0] == 'guess' and self.phase == 'answering' and event[1] == self.engine.guesser:
+                self.answindow.ans_ent.delete(0, tk.END)
+                self.answindow.ans_ent.insert(0, event[2])
+                self.answindow.submit(None, self.acceptance)
+        self.after(NETWORK_POLL, self.poll_network)
+
+    def announce(self, phase, text=''): # Tells the network players what is happening.
+        if self.server is not None:
+            self.server.broadcast({'type':'phase','phase':phase,'text':text})
+
+    def player_name(self, player):
+        if player in self.netnames:
+            return self.netnames[player]
+        return self.labellist[player+1].cget('text')
+
+    def unbuzz(self):
+        for i in range(3):
+            self.labellist[i+1].config(bg='green')
+        self.ready = set()
+
+    def passong(self):
+        if self.phase == 'playing':
+            self.engine.arbiter.reset()
+            self.schedule(None, self.end_playing)
+
+    def scoreupdate(self):
+        for c in range(3):
+            if self.cont_exist[c]:
+                score = self.engine.scores[c]
+                time = self.engine.times[c]
+                self.labellist[c+4].config(text=f"{score} songs\nin {time:.2f} seconds")
+        if self.server is not None:
+            ranked = sorted(self.netnames, key=lambda player: (-self.engine.scores[player], self.engine.times[player]))
+            self.netboard.delete(0, tk.END)
+            for player in ranked:
+                self.netboard.insert(tk.END, f"{self.netnames[player]}:  {self.engine.scores[player]} songs "
+                                             f"in {self.engine.times[player]:.2f} seconds{self.gone_mark(player)}")
+
+    def gone_mark(self, player): # Follows a network player's score once they have left.
+        return ' (left)' if player in self.netgone else ''
+
+    #def timerout(self,round_id):
+    #    time.sleep(7)
+    #    if self.still_waiting and self.round_id == round_id:
+    #        self.buzzed.set(True)
+
+    def show_prerender_progress(self): # Reschedules itself until every excerpt is decoded.
+        done, total = self.prerenderer.progress()
+        if done < total and self.phase != 'over':
+            self.prerendertext.set(f"Preparing excerpts:  {done}/{total}")
+            self.after(250, self.show_prerender_progress)
+        else:
+            self.prerendertext.set('')
+
+    # A round goes through the phases ready, hint, playing, answering and reveal
+    # (or interlude, when the song is passed), each started by a Tk callback, so
+    # the window never blocks.  The pauses are used to queue upcoming excerpts.
+
+    def start_round(self): # Ready:  every contestant buzzes in to start the round.
+        if self.engine.is_over():
+            return self.finish_game()
+        self.phase = 'ready'
+        self.unbuzz()
+        self.mainlabeltext.set('All players buzz in to start round')
+        self.announce('ready', 'Get ready for the next song')
+        self.prerenderer.prefetch(self.engine.round)
+        self.prerenderer.prefetch(self.engine.round+1)
+
+    def show_hint(self): # Hint:  shown once the excerpt is ready, which is polled for
+        self.phase = 'hint' # rather than waited on.
+        if not self.prerenderer.is_ready(self.engine.round):
+            self.mainlabeltext.set('Preparing the next song...')
+            self.schedule(POLL_INTERVAL, self.show_hint)
+            return None
+        record('excerpt.wait', time.perf_counter() - self.hintstart, round=self.engine.round)
+        songobject, excerpt = self.engine.song(), self.prerenderer.get(self.engine.round)
+        if excerpt is None: # Decoding failed in the pre-render stage.
+            messagebox.showerror("Song not playable",f"Could not decode:  {songobject.fileloc}")
+            self.engine.pass_song()
+            return self.interlude()
+        self.mainlabeltext.set(songobject.hint)
+        self.phase = 'playing' # Playing:  until someone buzzes or the song is passed.
+        self.closing = False
+        self.unbuzz()
+        self.announce('playing', songobject.hint)
+        with span('round.play', round=self.engine.round) as timing:
+            audioinstance, starttime, startlatency = excerpt.play_timed() # Times are
+            timing.set(start_ms=round(1000*startlatency, 3)) # perf_counter() seconds,
+        self.engine.start_song(starttime) # as are buzzes.
+        self.startlatencies.append(startlatency)
+        self.prerenderer.prefetch(self.engine.round+1)
+        if tracing(): # Tk would otherwise redraw the hint in its own time.
+            with span('tk.redraw', round=self.engine.round):
+                self.update_idletasks()
+
+    def end_playing(self): # Answering:  whoever pressed first, not whoever is checked
+        if self.phase != 'playing': # first, is asked for the title.
+            return None
+        from kathysong_output import audio_output
+        audio_output().stop_all()
+        guesserid = self.engine.close_buzzing()
+        if guesserid is None: # The song has been passed in this case.
+            self.engine.pass_song()
+            return self.interlude()
+        self.phase = 'answering'
+        guessername = self.player_name(guesserid)
+        self.labellist[0].config(text=guessername)
+        self.answindow = AnswerWindow(guessername,self,self.engine.song(),self.acceptance)
+        self.answindow.grab_set()
+        self.announce('answering', f'{guessername} buzzed in')
+        if self.server is not None: # A network player may answer on their own screen.
+            self.server.send(guesserid, {'type':'answer'})
+
+    def answer_given(self, guess): # Reveal:  called by the AnswerWindow with the guess (None
+        if self.phase != 'answering': # if it was closed), which then shows the answer.
+            return False
+        self.phase = 'reveal'
+        self.announce('reveal', f'{self.engine.song().titles[0]} by {self.engine.song().artist}')
+        correct = self.engine.answer(guess)
+        self.unbuzz()
+        self.scoreupdate()
+        self.next_round()
+        return correct
+
+    def interlude(self): # Interlude:  a passed or unplayable song has no answer to show.
+        self.phase = 'interlude'
+        self.next_round()
+
+    def next_round(self): # The engine has already moved on to the next song.
+        self.prerenderer.prefetch(self.engine.round)
+        self.prerenderer.prefetch(self.engine.round+1)
+        self.schedule(INTERLUDE, self.start_round)
+
+    def finish_game(self):
+        self.phase = 'over'
+        final = self.engine.final_scores()
+        for contestant, newscore in final.items(): # Network players have no label of their
+            if contestant not in self.netnames: # own; they are listed on the netboard.
+                self.labellist[contestant+4].config(text=str(newscore))
+        if self.server is not None:
+            self.netboard.delete(0, tk.END)
+            for player in sorted(self.netnames, key=lambda player: -final.get(player, 0)):
+                self.netboard.insert(tk.END, f"{self.netnames[player]}:  {final.get(player, 0)}{self.gone_mark(player)}")
+        winner = self.engine.winners()
+        if len(winner) == 0:
+            self.mainlabeltext.set('Nobody wins')
+        elif len(winner) == 1:
+            self.mainlabeltext.set(self.player_name(winner[0]) + ' wins!')
+        elif len(winner) == 2:
+            self.mainlabeltext.set(self.player_name(winner[0]) + ' & ' + self.player_name(winner[1]) + ' tie!')
+        elif set(winner) == {player for player in self.engine.players if player not in self.netgone}:
+            self.mainlabeltext.set('Everyone ties!') # Everyone still playing, that is.
+        else:
+            self.mainlabeltext.set(f'{len(winner)} players tie!')
+        self.announce('over', self.mainlabeltext.get())
+        self.prerenderer.cancel()
+        summary = end_game() # Only when tracing (see kathysong_trace).
+        if summary is not None:
+            print('\n'.join(format_summary(summary)))
+
+    def run_game(self): # Returns as soon as the first round is under way.
+        begin_game(songs=len(self.game), acceptance=self.acceptance)
+        self.prerenderer.start() # Excerpts decode in the background while names are entered.
+        self.show_prerender_progress()
+        self.namefill()
+        self.grab_set()
+        self.bind('<Shift_L>', lambda e: self.lbuzz(e))
+        self.bind('<space>', lambda e: self.cbuzz(e))
+        self.bind('<Shift_R>', lambda e: self.rbuzz(e))
+        if self.server is not None:
+            self.poll_network()
+        self.start_round()
+
+class GameSettingsWindow(tk.Toplevel): # Allows the player(s) to choose how strictly
+    def __init__(self):                # the game operates and how many contestants
+        tk.Toplevel.__init__(self)     # play, via radio buttons, and returns them
+        self.title("Game options")     # with the bearfruit method when the 'PLAY'
+        self.resizable(False,False)    # button on the window is selected.
+        self.iconbitmap('.\Music\KathySong.ico')
+        self.config(bg='yellow')
+        CONTESTANTS = ['single','dual','triple']
+        self.ACCEPTANCE = tk.StringVar()
+        self.CONTESTANT = tk.StringVar()
+        tk.Label(self,text='Answer acceptability:',bg='yellow',font=PLAY_MENU_FONT).grid(column=0,row=0,padx=5,pady=5)
+        tk.Label(self,text='Contestant mode:',bg='yellow',font=PLAY_MENU_FONT).grid(column=1,row=0,padx=5,pady=5)
+        for acceptanceoption in ACCEPTANCES:
+            r = tk.Radiobutton(self,text=acceptanceoption,bg='yellow',font=PLAY_MENU_FONT,value=acceptanceoption,variable=self.ACCEPTANCE)
+            r.grid(column=0,row=ACCEPTANCES.index(acceptanceoption)+1)
+        for contestantoption in CONTESTANTS:
+            r = tk.Radiobutton(self,text=contestantoption,bg='yellow',font=PLAY_MENU_FONT,value=contestantoption,variable=self.CONTESTANT)
+            r.grid(column=1,row=CONTESTANTS.index(contestantoption)+1)
+        self.NETWORK = tk.BooleanVar(value=False)
+        tk.Checkbutton(self,text='network buzzers',bg='yellow',font=PLAY_MENU_FONT,variable=self.NETWORK).grid(column=1,row=len(CONTESTANTS)+1)
+        self.submitted = tk.BooleanVar()
+        def submit():
+            self.submitted.set(True)
+        tk.Button(self,text="PLAY!",bg=BUTTONBACKGROUNDCOLOR,fg=BUTTONTEXTCOLOR,font=MAIN_PLAY_FONT,command=submit).grid(column=0,row=len(ACCEPTANCES)+1,columnspan=2)
+        self.protocol('WM_DELETE_WINDOW',self.on_exit)
+
+    def bearfruit(self):
+        self.wait_variable(self.submitted)
+        return self.ACCEPTANCE.get(), self.CONTESTANT.get(), self.NETWORK.get()
+
+    def on_exit(self): # In play, this window is made, bearfruit called, and
+        self.ACCEPTANCE.set(None) # destroyed externally soon after, allowing this.
+        self.submitted.set(True) # None will cause the play not to run, the presumed
+                                    # goal of choosing 'x' and not play.
+class WaveformCanvas(tk.Canvas): # Draws a song's waveform from its peak pyramid (see
+    def __init__(self, master, length, seek, width=600, height=100): # kathysong_waveform),
+        tk.Canvas.__init__(self, master, width=width, height=height, bg='white', highlightthickness=0)
+        self.length = max(length, MIN_VIEW) # with the excerpt marked.  A click seeks there;
+        self.seek = seek # the mouse wheel zooms about the pointer, and pans with Shift.
+        self.pyramid = None
+        self.view = (0, self.length)
+        self.needle = 0
+        self.excerpt = 0
+        self.playhead = None # Where play has reached, while playing.
+        self.bind('<Configure>', lambda e:  self.draw())
+        self.bind('<Button-1>', lambda e:  self.seek(self.x_to_ms(e.x)))
+        self.bind('<MouseWheel>', lambda e:  self.zoom(e.delta > 0, e.x))
+        self.bind('<Shift-MouseWheel>', lambda e:  self.pan(-1 if e.delta > 0 else 1))
+        self.bind('<Button-4>', lambda e:  self.zoom(True, e.x)) # X11 sends the wheel
+        self.bind('<Button-5>', lambda e:  self.zoom(False, e.x)) # as buttons.
+
+    def set_pyramid(self, pyramid):
+        self.pyramid = pyramid
+        self.length = max(pyramid.duration_ms(), MIN_VIEW)
+        self.view = (0, self.length)
+        self.draw()
+
+    def show(self, needle, excerpt):
+        self.needle, self.excerpt = needle, excerpt
+        self.draw()
+
+    def show_playhead(self, playhead): # Moves only the playhead, so it can follow play.
+        self.playhead = playhead
+        self.delete('playhead')
+        if playhead is not None:
+            x = self.ms_to_x(playhead)
+            self.create_line(x, 0, x, self.winfo_height(), fill='blue', tags='playhead')
+
+    def x_to_ms(self, x):
+        start, end = self.view
+        return start + (end - start)*x/max(self.winfo_width(), 1)
+
+    def ms_to_x(self, ms):
+        start, end = self.view
+        return (ms - start)*self.winfo_width()/(end - start)
+
+    def set_view(self, start, span):
+        span = min(max(span, MIN_VIEW), self.length)
+        start = min(max(start, 0), self.length - span)
+        self.view = (start, start + span)
+        self.draw()
+
+    def zoom(self, inward, x):
+        start, end = self.view
+        centre = self.x_to_ms(x)
+        span = (end - start)/2 if inward else (end - start)*2
+        self.set_view(centre - (centre - start)*span/(end - start), span)
+
+    def pan(self, direction):
+        start, end = self.view
+        self.set_view(start + direction*(end - start)/4, end - start)
+
+    def draw(self):
+        self.delete('all')
+        width, height = self.winfo_width(), self.winfo_height()
+        if width <= 1:
+            return None
+        self.create_rectangle(self.ms_to_x(self.needle), 0, self.ms_to_x(self.needle + self.excerpt), height,
+                              fill='#ffff99', outline='')
+        if self.pyramid is None:
+            self.create_text(width/2, height/2, text='Loading waveform...')
+        else:
+            columns = self.pyramid.columns(self.view[0], self.view[1], width)
+            middle = height/2
+            points = []
+            for x in range(width):
+                points.extend((x, middle - columns[x,1]*middle))
+            for x in range(width-1, -1, -1):
+                points.extend((x, middle - columns[x,0]*middle))
+            self.create_polygon(points, fill=BUTTONTEXTCOLOR, outline=BUTTONTEXTCOLOR)
+        self.create_line(self.ms_to_x(self.needle), 0, self.ms_to_x(self.needle), height, fill='red')
+        self.show_playhead(self.playhead)
+
+class SongEditWindow(tk.Toplevel):
+    def __init__(self,master,songfile):
+        tk.Toplevel.__init__(self,master)
+        self.title("Add song")
+        self.resizable(False,False)
+        self.iconbitmap('.\Music\KathySong.ico')
+        if isinstance(songfile,Song):
+            self.songfile = songfile.fileloc
+            self.needletime = songfile.start
+        else:
+            self.songfile = songfile
+            self.needletime = 0.000
+        tk.Label(self,text="Title:  ").grid(column=0, columnspan=4, row=0, padx=5, pady=5)
+        tk.Label(self,text="Artist:  ").grid(column=0, columnspan=4, row=1, padx=5, pady=5)
+        tk.Label(self,text="Hint:  ").grid(column=0, columnspan=4, row=2, padx=5, pady=5)
+        title_ent = ttk.Entry(self)
+        title_ent.grid(column=5, columnspan=4, row=0, padx=5, pady=5)
+        artist_ent = ttk.Entry(self)
+        artist_ent.grid(column=5, columnspan=4, row=1, padx=5, pady=5)
+        hint_ent = ttk.Entry(self)
+        hint_ent.grid(column=5, columnspan=4, row=2, padx=5, pady=5)
+        if isinstance(songfile,Song):
+            title_ent.insert(0,songfile.titles[-1])
+            artist_ent.insert(0,songfile.artist)
+            hint_ent.insert(0,songfile.hint)
+        else:
+            title_ent.insert(0,songfile.split('/')[-1][:-4])
+
+        tk.Label(self,text="Skip by:  ").grid(column=9, row=1, padx=5, pady=5)
+        tk.Label(self,text="Excerpt length:  ").grid(column=9, row=2, padx=5, pady=5)
+        self.SKIP_LENGTHS = {'1/10 sec':100,'1 sec':1000,'5 sec':5000}
+        self.EXCERPT_LENGTHS = {'1/2 sec':500,'1 sec':1000,'2 sec':2000,'3 sec':3000,'6 sec':6000,'15 sec':15000}
+        skip_cbox = ttk.Combobox(self,values = list(self.SKIP_LENGTHS))
+        skip_cbox.set('5 sec')
+        skip_cbox.grid(column=10, row=1, padx=5, pady=5)
+        exc_cbox = ttk.Combobox(self,values = list(self.EXCERPT_LENGTHS))
+        if isinstance(songfile,Song) and songfile.duration != 500:
+            exc_cbox.set(str(int(songfile.duration/1000))+' sec')
+        else:
+            exc_cbox.set('1/2 sec')
+        exc_cbox.grid(column=10, row=2, padx=5, pady=5)
+        exc_cbox.bind('<<ComboboxSelected>>', lambda e:  self.excerpt_changed())
+        time_pbar = ttk.Progressbar(self)
+        time_pbar.grid(column=5,row=3,columnspan=6,padx=5,pady=5,sticky=tk.EW)
+        tk.Label(self,text="Suggested:  ").grid(column=9, row=4, padx=5, pady=5)
+        suggest_cbox = ttk.Combobox(self,state='readonly')
+        suggest_cbox.grid(column=10, row=4, padx=5, pady=5)
+        suggest_cbox.bind('<<ComboboxSelected>>', lambda e:  self.use_suggestion())
+        self.boxes = [title_ent,artist_ent,hint_ent,skip_cbox,exc_cbox,time_pbar,suggest_cbox]
+        self.suggestions = [] # Excerpt starts proposed by kathysong_analysis, best first.
+        self.analysis = None # The thread working them out, while there is one.
+        self.drawing = None # The thread building the waveform, while there is one.
+
+        #try:
+        #    if self.songfile[-1] == '3':
+        #        self.whole_song_as = AudioSegment.from_mp3(self.songfile)
+        #    else:
+        #        self.whole_song_as = AudioSegment.from_wave_file(self.songfile)
+        #    self.song_length = len(self.whole_song_as)
+        #except:
+        #    tk.messagebox.showerror("Error",f"Pydub cannot load file {self.songfile}.\nTry editing the file's metadata and moving it.")
+        #    self.boxes[0].insert(0,"⛔")
+
+        from kathysong_audio import ChunkedDecoder, probe_length # The audio modules are first
+        from kathysong_transport import Transport # needed here.
+        from kathysong_waveform import cached_pyramid
+        self.opened = time.perf_counter() # Traced until the song is decoded.
+        self.song_length = probe_length(self.songfile) # Exact (or known at all) once the decoder
+        self.waveform = WaveformCanvas(self, self.song_length or 0, self.seek) # finishes.
+        self.waveform.grid(column=0, columnspan=11, row=5, padx=5, pady=5, sticky=tk.EW)
+        self.pyramid = cached_pyramid(self.songfile) # Drawn at once if the song was opened
+        if self.pyramid is not None: # before; otherwise built when it is decoded.
+            self.waveform.set_pyramid(self.pyramid)
+        self.waveform.show(self.needletime, self.excerpt_length())
+        self.decoder = ChunkedDecoder(self.songfile) # Decodes in the background, so the
+        self.decoder.start() # window can be used before the whole song is loaded.
+        record('editor.open', time.perf_counter() - self.opened, cached_waveform=self.pyramid is not None)
+        self.transport = Transport(self.decoder, PLAY_SPAN)
+        self.follow_job = None
+        self.loadtext = tk.StringVar(value='Loading...')
+        tk.Label(self,textvariable=self.loadtext).grid(column=9, row=0, padx=5, pady=5)
+        self.show_decode_progress()
+
+        tk.Button(self,text=" ▶️",command=lambda:  self.play_song(),width=2).grid(column=2,row=3,pady=5)
+        tk.Button(self,text='⏸️',command=lambda:  self.pause_song()).grid(column=1,row=3,pady=5)
+        tk.Button(self,text="⏪",command=lambda:  self.back_five()).grid(column=0,row=3,pady=5)
+        tk.Button(self,text="⏩",command=lambda:  self.bump_five()).grid(column=3,row=3,pady=5)
+        tk.Button(self,text="🎧",command=lambda:  self.excerpt_song()).grid(column=4,row=3,pady=5)
+        tk.Button(self,text="Add song",command=lambda:  self.assemble_song()).grid(column=10, row=0, padx=5, pady=5)
+        self.done = tk.BooleanVar(value=False)
+
+    def skip_length(self):
+        return self.SKIP_LENGTHS[self.boxes[3].get()]
+
+    def excerpt_length(self):
+        return self.EXCERPT_LENGTHS[self.boxes[4].get()]
+
+    def show_decode_progress(self): # Reschedules itself until the decoder is done.
+        if self.decoder.error is not None:
+            self.loadtext.set('⛔ Not loaded')
+        elif self.decoder.finished:
+            record('editor.load', time.perf_counter() - self.opened, song_ms=self.decoder.decoded_ms())
+            self.song_length = self.decoder.decoded_ms()
+            self.loadtext.set('')
+            self.find_suggestions()
+            self.find_waveform()
+        elif self.song_length is None:
+            self.loadtext.set(f"Loading {int(self.decoder.decoded_ms()/1000)} s")
+            self.after(200, self.show_decode_progress)
+        else:
+            self.loadtext.set(f"Loading {int(100*self.decoder.decoded_ms()/max(self.song_length,1))}%")
+            self.after(200, self.show_decode_progress)
+
+    def known_length(self): # The song's length, or as much as is decoded while that is unknown.
+        if self.song_length is not None:
+            return self.song_length
+        return max(self.decoder.decoded_ms(), 1)
+
+    def find_waveform(self): # Builds the peak pyramid on a thread, if it was not cached.
+        if self.pyramid is not None:
+            return None
+        self.drawing = threading.Thread(target=self.run_waveform, daemon=True)
+        self.drawing.start()
+        self.show_waveform()
+
+    def run_waveform(self):
+        from kathysong_waveform import PeakPyramid, store_pyramid
+        with span('editor.waveform'):
+            pyramid = PeakPyramid.from_pcm(self.decoder.view(0), self.decoder.channels,
+                                           self.decoder.sample_width, self.decoder.frame_rate)
+            store_pyramid(self.songfile, pyramid)
+        self.pyramid = pyramid
+
+    def show_waveform(self): # Reschedules itself until the pyramid is built.
+        if not self.winfo_exists():
+            return None
+        if self.drawing.is_alive():
+            self.after(100, self.show_waveform)
+        elif self.pyramid is not None:
+            self.waveform.set_pyramid(self.pyramid)
+
+    def show_needle(self):
+        self.boxes[5]['value'] = 100*self.needletime/self.known_length()
+        self.waveform.show(self.needletime, self.excerpt_length())
+
+    def seek(self, ms): # From a click on the waveform.
+        self.stop_song()
+        self.needletime = max(0, min(ms, self.known_length() - self.excerpt_length()))
+        self.show_needle()
+
+    def excerpt_changed(self):
+        self.show_needle()
+        self.find_suggestions()
+
+    def find_suggestions(self): # Analyses the decoded song on a thread, unless it has been
+        if not self.decoder.finished or self.decoder.error is not None: # analysed before.
+            return None
+        if self.analysis is not None and self.analysis.is_alive():
+            self.after(200, self.find_suggestions) # Try again with the new excerpt length.
+            return None
+        self.suggestions = []
+        self.boxes[6].set('Analysing...')
+        self.analysis = threading.Thread(target=self.run_analysis, args=(self.excerpt_length(),), daemon=True)
+        self.analysis.start()
+        self.show_suggestions()
+
+    def run_analysis(self, duration):
+        from kathysong_analysis import suggest_from_pcm, cached_suggestions, store_suggestions
+        with span('editor.analysis', cached=True) as timing:
+            suggestions = cached_suggestions(self.songfile, duration)
+            if suggestions is None:
+                timing.set(cached=False)
+                suggestions = suggest_from_pcm(self.decoder.view(0), self.decoder.channels, self.decoder.sample_width,
+                                               self.decoder.frame_rate, duration)
+                store_suggestions(self.songfile, duration, suggestions)
+        self.suggestions = suggestions
+
+    def show_suggestions(self): # Reschedules itself until the analysis is done.
+        if not self.winfo_exists():
+            return None
+        if self.analysis.is_alive():
+            self.after(100, self.show_suggestions)
+            return None
+        values = [f"{int(suggestion['start']//60000)}:{suggestion['start']%60000/1000:04.1f}" for suggestion in self.suggestions]
+        self.boxes[6].config(values=values)
+        self.boxes[6].set(values[0] if values != [] else '')
+
+    def use_suggestion(self):
+        choice = self.boxes[6].current()
+        if 0 <= choice < len(self.suggestions):
+            self.stop_song()
+            self.needletime = self.suggestions[choice]['start']
+            self.show_needle()
+
+    def stop_song(self): # Stops play without moving the needle.
+        from kathysong_output import audio_output
+        self.transport.stop()
+        audio_output().stop_all()
+        self.follow_playhead()
+
+    def play_song(self): # Plays from the needle, a span at a time (see kathysong_transport).
+        self.stop_song()
+        self.transport.play(self.transport.ms_to_frame(self.needletime))
+        self.follow_playhead()
+
+    def follow_playhead(self): # Reschedules itself while the transport is playing.
+        if self.follow_job is not None:
+            self.after_cancel(self.follow_job)
+            self.follow_job = None
+        frame = self.transport.poll()
+        if frame is None:
+            self.waveform.show_playhead(None)
+            return None
+        self.waveform.show_playhead(self.transport.frame_to_ms(frame))
+        self.follow_job = self.after(POLL_INTERVAL, self.follow_playhead)
+
+    def pause_song(self): # The needle moves to the frame that was playing.
+        if self.transport.active:
+            self.needletime = round(self.transport.frame_to_ms(self.transport.pause()), 3)
+        self.stop_song()
+        self.show_needle()
+
+    def back_five(self):
+        self.stop_song()
+        self.needletime -= self.skip_length()
+        if self.needletime < 0:
+            self.needletime = 0
+        self.show_needle()
+
+    def bump_five(self):
+        self.stop_song()
+        self.needletime += self.skip_length()
+        if self.needletime > self.known_length() - self.excerpt_length():
+            self.needletime = self.known_length() - self.excerpt_length()
+        self.show_needle()
+
+    def excerpt_song(self): # Plays exactly the frames that will be saved as the excerpt.
+        self.stop_song()
+        first = self.transport.ms_to_frame(self.needletime)
+        last = self.transport.ms_to_frame(self.needletime + self.excerpt_length())
+        if self.decoder.decoded_frames() >= last or self.decoder.finished:
+            self.transport.play(first, last)
+            self.follow_playhead()
+        else: # Not decoded that far yet; seek to it instead.
+            from kathysong_audio import PCMExcerpt, decode_window
+            PCMExcerpt.from_segment(decode_window(self.songfile,self.needletime,self.excerpt_length())).play()
+
+    def assemble_song(self):
+        self.stop_song()
+        self.done.set(True)
+
+    def bearfruit(self):
+        if self.boxes[0].get()[0] != "⛔":
+            self.wait_variable(self.done)
+            if self.done.get():
+                from kathysong_analysis import excerpt_loudness
+                excerpt = self.decoder.excerpt(self.needletime, self.excerpt_length()) # Measured now,
+                loudness = excerpt_loudness(excerpt) if excerpt is not None else None # while decoded.
+                return Song([self.boxes[0].get()],self.boxes[1].get(),self.boxes[2].get(),self.songfile,self.needletime,self.excerpt_length(),
+                            loudness=loudness)
+            return "⛔" # When this string is sent in lieu of a song, nothing is
+        else: # appended to the game.  This occurs when a file is not found, or
+            return "⛔" # when the 'x' button is selected.
+
+    def on_exit(self):
+        self.done.set(False)
+
+    def destroy(self):
+        if self.follow_job is not None:
+            self.after_cancel(self.follow_job)
+        self.transport.stop()
+        self.decoder.stop()
+        tk.Toplevel.destroy(self)
+
+#class RemoveSongWindow(tk.Toplevel):
+#    def __init__(self,master):
+#        tk.Toplevel.__init__(self,master)
+#        self.title("Remove song")
+#        self.resizable(True,True)
+#        self.iconbitmap('.\Music\KathySong.ico')
+#        self.titlelist = []
+#        for eachsong in master.game:
+#            self.titlelist.append(eachsong[1])
+#        tk.Label(self,text="Song:").grid(column=0,row=0)
+#        sng_cbox = ttk.Combobox(self,state="readonly",value=self.titlelist)
+#        sng_cbox.grid(column=1,columnspan=2, row=0)
+#
+#        def remove_song():
+#            self.titlelist.remove(sng_cbox.get())
+#            titletext = ''
+#            for eachsong in self.titlelist:
+#                titletext += eachsong + '\n'
+#            ind = sng_cbox.current()
+#            master.game.remove(game[ind])
+#            master.labels[0].config(text="Songs:  "+str(len(self.titlelist)))
+#            master.labels[1].config(text=titletext)
+#            self.destroy()
+#        tk.Button(self,text="Remove selected song",command=lambda: remove_song()).grid(column=0,row=1,padx=5,pady=5)
+#        tk.Button(self,text="Cancel",command=lambda:  self.destroy()).grid(column=2,row=1,padx=5,pady=5)
+
+class LibraryWindow(tk.Toplevel): # Searches the music library (see kathysong_library)
+    def __init__(self,master):     # and adds the chosen songs to the game being edited.
+        tk.Toplevel.__init__(self,master)
+        self.title("Music library")
+        self.iconbitmap('.\Music\KathySong.ico')
+        from kathysong_library import MusicLibrary
+        self.library = MusicLibrary()
+        self.results = []
+        self.job = None
+        self.scanning = None # The scan thread, while there is one.
+        self.scanprogress = (0, 0)
+        self.scanresult = None
+
+        self.columnconfigure(1,weight=1)
+        self.rowconfigure(1,weight=1)
+        tk.Label(self,text="Search:").grid(column=0, row=0, sticky=tk.W, padx=5, pady=5)
+        self.search_box = ttk.Entry(self)
+        self.search_box.grid(column=1, columnspan=2, row=0, sticky=tk.EW, padx=5, pady=5)
+        self.search_box.bind('<KeyRelease>', lambda e:  self.schedule_search())
+        scroller = ttk.Scrollbar(self)
+        scroller.grid(column=2,row=1,sticky=tk.NS)
+        self.result_list = tk.Listbox(self,width=60,height=20,yscrollcommand=scroller.set,selectmode=tk.EXTENDED)
+        self.result_list.grid(column=0,columnspan=2,row=1,padx=5,pady=5,sticky=tk.NSEW)
+        scroller.config(command=self.result_list.yview)
+        self.status = tk.StringVar()
+        tk.Label(self,textvariable=self.status).grid(column=0, columnspan=3, row=2, sticky=tk.W, padx=5)
+        buttons = tk.Frame(self)
+        buttons.grid(column=0, columnspan=3, row=3, pady=5)
+        tk.Button(buttons,text="Add folder",command=lambda:  self.add_folder()).grid(column=0,row=0,padx=5)
+        tk.Button(buttons,text="Rescan",command=lambda:  self.rescan()).grid(column=1,row=0,padx=5)
+        tk.Button(buttons,text="Add selected",command=lambda:  self.add_selected()).grid(column=2,row=0,padx=5)
+        tk.Button(buttons,text="Close",command=lambda:  self.destroy()).grid(column=3,row=0,padx=5)
+        self.search()
+        self.rescan() # Quick when nothing has changed; only new or changed files are probed.
+
+    def schedule_search(self): # Waits for a pause in typing.
+        if self.job is not None:
+            self.after_cancel(self.job)
+        self.job = self.after(SEARCH_DELAY, self.search)
+
+    def search(self):
+        self.job = None
+        self.results = self.library.search(self.search_box.get())
+        self.result_list.delete(0,tk.END)
+        for path, title, artist, album, duration in self.results:
+            minutes, seconds = divmod(int(duration/1000), 60)
+            self.result_list.insert(tk.END,f"{title} — {artist}  ({minutes}:{seconds:02})")
+        if self.scanning is None:
+            self.status.set(f"{len(self.results)} shown of {self.library.count()} songs")
+
+    def add_folder(self):
+        folder = filedialog.askdirectory(initialdir=self.master.active_directory,title='Select music folder')
+        self.grab_set()
+        if folder != '':
+            self.library.add_folder(folder)
+            self.rescan()
+
+    def rescan(self): # The scan has its own connection, on its own thread.
+        if self.scanning is not None:
+            return None
+        if self.library.folders() == []:
+            self.status.set('Add a music folder to build the library.')
+            return None
+        self.scanning = threading.Thread(target=self.run_scan, daemon=True)
+        self.scanning.start()
+        self.show_scan_progress()
+
+    def run_scan(self):
+        from kathysong_library import MusicLibrary
+        library = MusicLibrary(self.library.path)
+        try:
+            self.scanresult = library.scan(self.set_scan_progress)
+        except Exception as err:
+            self.scanresult = err
+        finally:
+            library.close()
+
+    def set_scan_progress(self, probed, total): # Called on the scan thread.
+        self.scanprogress = (probed, total)
+
+    def show_scan_progress(self): # Reschedules itself until the scan is done.
+        if not self.winfo_exists():
+            return None
+        if self.scanning.is_alive():
+            probed, total = self.scanprogress
+            self.status.set(f"Scanning:  {probed} of {total} new or changed files")
+            self.after(POLL_INTERVAL*4, self.show_scan_progress)
+            return None
+        self.scanning = None
+        if isinstance(self.scanresult, Exception):
+            messagebox.showerror('Error',f'The library could not be scanned:  {self.scanresult}')
+        self.search()
+
+    def add_selected(self): # Each song starts where analysis suggests if it has been analysed
+        from kathysong_analysis import cached_suggestions, EXCERPT_LENGTH # (see kathysong_analysis),
+        newsongs = [] # otherwise a third of the way in.
+        for choice in self.result_list.curselection():
+            path, title, artist, album, duration = self.results[choice]
+            suggestions = cached_suggestions(path, EXCERPT_LENGTH)
+            if suggestions:
+                start = suggestions[0]['start']
+            else: # Durations and starts are in milliseconds; the excerpt has to end in the song.
+                start = max(0, min(round((duration or 0)/3), round((duration or 0) - EXCERPT_LENGTH)))
+            newsongs.append(Song([title],artist,'',path,start,EXCERPT_LENGTH))
+        if newsongs != []:
+            self.master.update_list(self.master.songs.extend(newsongs)) # Journaled like any edit.
+            self.master.active_directory = os.path.dirname(newsongs[-1].fileloc)
+            self.status.set(f"Added {len(newsongs)} songs to the game")
+
+    def destroy(self):
+        if self.job is not None:
+            self.after_cancel(self.job)
+        self.library.close()
+        tk.Toplevel.destroy(self)
+
+class GameEditWindow(tk.Toplevel): # Allows for the editing of a game (as a list
+    def __init__(self,master):     # of song objects).
+        tk.Toplevel.__init__(self,master)
+        self.title("KathySong game editor")
+        self.resizable(True,False)
+        self.iconbitmap('.\Music\KathySong.ico')
+        self.game = []
+
+        self.columnconfigure([0,1,3],weight=0)
+        self.columnconfigure(2,weight=1)
+
+        tk.Label(self,text="Game title:").grid(column=0, row=0, columnspan=2, sticky=tk.W)
+        self.title_box = ttk.Entry(self)
+        day = datetime.datetime.now().weekday()
+        if day == 6:
+            self.title_box.insert(0, "Another pleasant valley Sunday") # I had to put a quoted string right in the argument -
+        elif day == 0:                                            # Anything else threw a strange error
+            self.title_box.insert(0, "Just another manic Monday")
+        elif day == 1:
+            self.title_box.insert(0, "Tuesday's gone with the wind")
+        elif day == 2:
+            self.title_box.insert(0, "Listen to Wednesday's song")
+        elif day == 3:
+            self.title_box.insert(0, "I am Thursday's child")
+        elif day == 4:
+            self.title_box.insert(0, "It's Friday, I'm in love")
+        elif day == 5: # The music video for Rebecca Black's "Friday" didn't include a page for Saturday 🤷
+            self.title_box.insert(0, "Saturday night's alright for fighting")
+        self.title_box.grid(column=2, columnspan=2, row=0, padx=5, pady=5, sticky=tk.EW)
+
+        numsongs_label = tk.Label(self,text="Songs:  0")
+        numsongs_label.grid(column=0, row=1, columnspan=2,sticky=tk.W, padx=5, pady=5)
+        self.active_directory = './Music' # Can be '/' for guaranteed folder existence.
+        scroller = ttk.Scrollbar(self)
+        scroller.grid(column=3,row=1,rowspan=9,sticky=tk.NS)
+        song_list = tk.Listbox(self,width=30,yscrollcommand=scroller.set,selectmode=tk.MULTIPLE)
+        song_list.grid(column=2,row=1,rowspan=9,padx=5,pady=5,sticky=tk.NS +tk.EW)
+        scroller.config(command=song_list.yview)
+        self.labels = [numsongs_label,song_list]
+        self.songs = SongList(self.game) # Edits self.game in place.
+        self.view = SongListView(song_list, scroller, self.songs)
+        self.journal = None # Autosaves the game from its first edit on (see autosave).
+        self.gamepath = None # A text game opened into the empty editor is autosaved in place,
+        self.gametitle = None # and this was its title.
+        self.autosaving = True
+
+        tk.Button(self,text="Add song",command=lambda:  self.add_song()).grid(column=0,row=2, columnspan=2,padx=5, pady=5)
+        tk.Button(self,text="🔝",width=2,command=lambda:  self.first_song()).grid(column=0,row=3,padx=5,pady=5)
+        tk.Button(self,text=" ⬆️",width=2,command=lambda:  self.raise_song()).grid(column=1,row=3,padx=5,pady=5)
+        tk.Button(self,text=" ⬇️",width=2,command=lambda:  self.lower_song()).grid(column=0,row=4,padx=5,pady=5)
+        tk.Button(self,text="🔀",width=2,command=lambda:  self.shuffle_songs()).grid(column=1,row=4,padx=5,pady=5)
+        tk.Button(self,text="Edit sample",command=lambda:  self.edit_song()).grid(column=0,row=5,columnspan=2,padx=5,pady=5)
+        tk.Button(self,text="Remove song",command=lambda:  self.remove_song()).grid(column=0,row=6,columnspan=2,padx=5,pady=5)
+        tk.Button(self,text="Load game",command=lambda:  self.loadgame()).grid(column=0,row=7,columnspan=2,padx=5,pady=5)
+        tk.Button(self,text="Save game",command=lambda:  self.save()).grid(column=0,row=8,columnspan=2,padx=5,pady=5)
+        tk.Button(self,text="Main menu",command=lambda:  self.exit()).grid(column=0,row=9,columnspan=2,padx=5,pady=5)
+        tk.Button(self,text="Export package",command=lambda:  self.export()).grid(column=0,row=10,columnspan=2,padx=5,pady=5)
+        tk.Button(self,text="Music library",command=lambda:  self.open_library()).grid(column=0,row=11,columnspan=2,padx=5,pady=5)
+        tk.Button(self,text="Suggest starts",command=lambda:  self.suggest_starts()).grid(column=0,row=12,columnspan=2,padx=5,pady=5)
+        self.analysis = None # Progress of a Suggest starts run, while there is one.
+
+    def update_list(self, changed=None): # Changes the list of songs to reflect self.game,
+        self.labels[0].config(text="Songs:  "+str(len(self.game))) # redrawing the rows an
+        if changed is None: # edit of self.songs says it changed (or all those in sight).
+            self.view.redraw()
+        else:
+            self.view.redraw(*changed)
+            self.autosave()
+
+    def autosave(self): # From the first edit on, the game file is kept up to date by a
+        if self.journal is not None or not self.autosaving: # journal of the edits (see
+            return None # GameJournal), so a crash loses nothing.  A new game gets a file of
+        try: # its own in the Saved Games folder.
+            if self.gamepath is None:
+                self.gametitle = self.title_box.get()
+                self.journal = GameJournal(claim_game_path(self.gametitle), self.game, claimed=True)
+            else:
+                self.journal = GameJournal(self.gamepath, self.game)
+        except OSError as err:
+            self.autosaving = False
+            messagebox.showerror('Error',f'The game cannot be autosaved:  {err}')
+            return None
+        self.songs.journal = self.journal
+
+    def moved(self, changed): # After the chosen songs were moved, keeps them in sight.
+        self.update_list(changed)
+        if self.songs.selected:
+            self.view.see(self.songs.selection()[0])
+
+    def add_song(self):
+        possiblesong = filedialog.askopenfilename(initialdir = self.active_directory,title='Select song', filetypes = (('MP3 Files','*.mp3*'),('WAV Files','*.wav*')))
+        if possiblesong != '':
+            addsongwindow = SongEditWindow(self,possiblesong)
+            newsong = addsongwindow.bearfruit()
+            if newsong != "⛔":
+                self.update_list(self.songs.extend([newsong]))
+                self.view.see(len(self.game) - 1)
+                self.active_directory = '/'.join(self.game[-1].fileloc.split('/')[:-1])
+            addsongwindow.destroy()
+            self.grab_set()
+
+    def open_library(self):
+        librarywindow = LibraryWindow(self)
+        librarywindow.grab_set()
+        self.wait_window(librarywindow)
+        self.grab_set()
+
+    def suggest_starts(self): # Moves the chosen songs' excerpts (all of them if none are
+        if self.analysis is not None: # chosen) to where analysis suggests, analysing the
+            return None # songs on a pool of processes.
+        choice = self.songs.selection() or range(len(self.game))
+        songs = [self.game[eachsong] for eachsong in choice if self.game[eachsong].package is None]
+        if songs == []:
+            return None
+        if tk.messagebox.askquestion("Suggest starts?",f"Move the excerpts of {len(songs)} songs to their suggested starts?") != 'yes':
+            return None
+        self.analysis = {'songs':songs,'done':0,'results':None}
+        items = [(eachsong.fileloc, eachsong.duration) for eachsong in songs]
+        threading.Thread(target=self.run_analysis, args=(items,), daemon=True).start()
+        self.show_analysis_progress()
+
+    def run_analysis(self, items):
+        from kathysong_analysis import suggest_many
+        def progress(done, total):
+            self.analysis['done'] = done
+        try:
+            self.analysis['results'] = suggest_many(items, progress=progress)
+        except Exception as err:
+            self.analysis['results'] = err
+
+    def show_analysis_progress(self): # Reschedules itself until the analysis is done.
+        if not self.winfo_exists():
+            return None
+        results = self.analysis['results']
+        if results is None:
+            self.labels[0].config(text=f"Analysing {self.analysis['done']}/{len(self.analysis['songs'])}")
+            self.after(200, self.show_analysis_progress)
+            return None
+        songs, self.analysis = self.analysis['songs'], None
+        starts = {}
+        if isinstance(results, Exception):
+            messagebox.showerror('Error',f'The songs could not be analysed:  {results}')
+        else:
+            for eachsong in songs:
+                suggestions = results.get((eachsong.fileloc, eachsong.duration))
+                if suggestions:
+                    starts[eachsong] = suggestions[0]['start']
+        self.update_list(self.songs.restart(starts)) # Also restores the count label.
+
+    def first_song(self):
+        self.moved(self.songs.to_top())
+
+    def raise_song(self):
+        self.moved(self.songs.raise_rows())
+
+    def lower_song(self):
+        self.moved(self.songs.lower_rows())
+
+    def shuffle_songs(self):
+        self.update_list(self.songs.shuffle())
+
+    def edit_song(self):
+        choice = self.songs.selection()
+        if len(choice) == 1:
+            addsongwindow = SongEditWindow(self,self.game[choice[0]])
+            newsong = addsongwindow.bearfruit()
+            if newsong != "⛔": # The editor was closed without a song.
+                self.update_list(self.songs.replace(choice[0], newsong))
+            addsongwindow.destroy()
+            self.grab_set()
+        else:
+            tk.messagebox.showerror("Select one song to edit.")
+
+    def remove_song(self): # One question for however many songs are chosen.
+        choice = self.songs.selection()
+        if choice == []:
+            return None
+        if len(choice) == 1:
+            question = f'Remove "{self.game[choice[0]].titles[0]}"?'
+        else:
+            question = f'Remove these {len(choice)} songs?'
+        if tk.messagebox.askquestion("Remove?",question) == 'yes':
+            self.update_list(self.songs.remove())
+
+    def loadgame(self):
+        if self.game != []:
+            ch = tk.messagebox.askquestion("Extend this game?","Extend this game?")
+        else:
+            ch = 'yes'
+        if ch == 'no':
+            return None # Consider cool feature like appending game
+        chosenfile = filedialog.askopenfilename(initialdir='./Saved Games',title='Select gamefile',filetypes=GAMEFILETYPES)
+        if chosenfile == '': # If the user chooses "cancel" in explorer
+            return None
+        loaded = ask_load_game(chosenfile)
+        if loaded is None:
+            self.grab_set()
+            return None
+        if self.game == []:
+            self.title_box.delete(0, tk.END)
+            self.title_box.insert(0, os.path.splitext(chosenfile.split("/")[-1])[0])
+            if self.journal is None and not is_package(chosenfile):
+                self.gamepath = chosenfile
+                self.gametitle = self.title_box.get()
+        self.update_list(self.songs.extend(loaded))
+        self.grab_set()
+        self.master.lower()
+
+    def save(self): # Folds the journal into the game file, which goes by the game's title.
+        self.autosave()
+        title = self.title_box.get()
+        try:
+            if self.journal is None or (title != self.gametitle and not self.journal.claimed):
+                if self.journal is not None: # Retitling a game that was opened saves a copy,
+                    self.journal.discard() # leaving the original as it was.
+                checkfile = claim_game_path(title)
+                save_game(self.game, checkfile)
+            else:
+                self.journal.close()
+                checkfile = self.journal.path
+                if title != self.gametitle: # Games are always saved to the Saved Games folder.
+                    checkfile = claim_game_path(title)
+                    os.replace(self.journal.path, checkfile)
+        except OSError as err:
+            messagebox.showerror('Error',f'Could not save the game:  {err}')
+            return None
+        self.journal = self.songs.journal = None
+        messagebox.showinfo('information','Game saved as '+checkfile.split('/')[-1])
+        self.master.deiconify()
+        self.destroy()
+
+    def export(self): # Packages the game with its excerpts, for play without the music files.
+        if self.game == []:
+            messagebox.showerror('Error','There are no songs to export.')
+            return None
+        chosenfile = filedialog.asksaveasfilename(initialdir='./Saved Games',initialfile=self.title_box.get()+'.kathy',
+                                                  title='Export package',defaultextension='.kathy',filetypes=(('KathySong packages','*.kathy'),))
+        if chosenfile == '':
+            return None
+        try:
+            export_package(self.game, chosenfile)
+        except Exception as err:
+            messagebox.showerror('Error',f'Could not export the game:  {err}')
+            return None
+        messagebox.showinfo('information','Game exported as '+chosenfile.split('/')[-1])
+        self.grab_set()
+
+    def exit(self):
+        if tk.messagebox.askquestion("Exit without saving?","Exit without saving?") == 'yes':
+            if self.journal is not None: # Undoes the autosaving.
+                self.journal.discard()
+            self.master.deiconify()
+            self.destroy()
+
+class MainMenuWindow(tk.Tk): # The main menu has three methods:  one for loading
+    def __init__(self):      # a game, used by the playing method upon hitting
+        tk.Tk.__init__(self) # 'play', and one for opening the game-making window.
+        self.title("KathySong")
+        self.resizable(False,False)
+        swid, shei = self.winfo_screenwidth()-40, self.winfo_screenheight() - 120
+        self.geometry(f"{swid}x{shei}+20+45")
+        self.iconbitmap('.\Music\KathySong.ico')
+        self.configure(bg='yellow')
+
+        MAINMENUFONT = font.Font(family='Segoe Print', size=40)
+
+        self.columnconfigure([0,2],weight=1)
+        self.columnconfigure(1,weight=2)
+        self.rowconfigure([0,1],weight=2)
+        self.rowconfigure(2,weight=1)
+        tk.Button(self, text="Play game", font=MAINMENUFONT, bg=BUTTONBACKGROUNDCOLOR, fg=BUTTONTEXTCOLOR, command=lambda: self.playgame()).grid(column=1, row=0)
+        tk.Button(self, text="Compose game", font=MAINMENUFONT, bg=BUTTONBACKGROUNDCOLOR, fg=BUTTONTEXTCOLOR, command=lambda: self.composegame()).grid(column=1, row=1)
+        tk.Button(self, text="Quit", font=MAINMENUFONT, bg=BUTTONBACKGROUNDCOLOR, fg=BUTTONTEXTCOLOR, command=lambda: self.destroy()).grid(column=2, row=2)
+
+    def loadgame(self):
+        chosenfile = filedialog.askopenfilename(initialdir='./Saved Games',title='Select gamefile',filetypes=GAMEFILETYPES)
+        if chosenfile == '': # If the user chooses "cancel" in explorer
+            return None
+        return ask_load_game(chosenfile)
+
+    def playgame(self):
+        game = self.loadgame()
+        if game: # Yields False when loadgame yields None, which is when the user chose not to load a game in Explorer.
+            self.withdraw()
+            gsw = GameSettingsWindow()
+            ACCEPTANCE, CONTESTANT, NETWORK = gsw.bearfruit()
+            gsw.destroy()
+            if ACCEPTANCE in ACCEPTANCES:
+                playwindow = PlayWindow(self,ACCEPTANCE,CONTESTANT,game,NETWORK)
+                playwindow.run_game() # The rounds then run from Tk callbacks until
+                self.wait_window(playwindow) # the window is closed.
+            self.deiconify()
+            self.grab_set()
+
+    def composegame(self):
+        self.withdraw()
+        self.wait_window(GameEditWindow(self))
+        self.deiconify()
+        self.grab_set()
+
+def run(launched=None, probe=False): # Opens the main menu.  With probe, the menu is closed as
+    global PLAYER_NAME_FONT, PLAYER_SCORE_FONT, MAIN_PLAY_FONT, PLAY_MENU_FONT, EDIT_MENU_FONT # soon as
+    root = MainMenuWindow() # it is drawn, and the seconds since launched (a perf_counter() time)
+    PLAYER_NAME_FONT = font.Font(family="Segoe Print",size=60,weight='bold') # are printed; see
+    PLAYER_SCORE_FONT = font.Font(family="Helvetica",size=36) # kathysong_startup.  Placing fonts
+    MAIN_PLAY_FONT = font.Font(family="Helvetica",size=48) # before the root was declared caused
+    PLAY_MENU_FONT = font.Font(family="Segoe Print",size=24) # error.
+    EDIT_MENU_FONT = font.Font(family="MS Sans Serif",size=24)
+    DEFAULT_FONT = font.nametofont("TkDefaultFont")
+    DEFAULT_FONT.config(size=16)
+    TEXT_FONT = font.nametofont("TkTextFont")
+    TEXT_FONT.config(size=16)
+    if probe:
+        root.update()
+        print(f'first window {time.perf_counter() - launched:.6f}', flush=True)
+        root.destroy()
+        return None
+    root.mainloop()
+    if 'kathysong_output' in sys.modules: # Only if anything was played.
+        sys.modules['kathysong_output'].close_output()
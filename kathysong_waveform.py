@@ -0,0 +1,125 @@
+
+# Waveform overviews for KathySong's song editor.  A song's decoded samples are
+# reduced once, in a single NumPy pass, to the lowest and highest sample in each
+# run of BASE frames; every further level combines FACTOR buckets of the level
+# below.  Drawing any stretch of the song at any zoom then reads only the level
+# whose buckets are just finer than a pixel, so an hour-long song can be shown
+# whole or zoomed to 100 ms without touching the audio again.  Pyramids are saved
+# in the cache folder as .npy files, keyed like the decoded audio, and memory-
+# mapped back.
+import numpy as np
+import os
+from kathysong_cache import AUDIO_CACHE, CACHE_DIRECTORY
+
+PEAKS_VERSION = 1 # Bumped whenever the file layout changes.
+PEAKS_DIRECTORY = os.path.join(CACHE_DIRECTORY, 'Waveform')
+BASE = 32 # Frames per bucket at the finest level:  under a millisecond at 44.1 kHz.
+FACTOR = 4 # Buckets of one level combined into each bucket of the next.
+COARSEST = 2048 # Buckets at which the pyramid stops; enough for a full-width overview.
+HEADER_ROWS = 6 # The version, frame count and frame rate, as int64s, in (min, max) rows.
+
+def as_int16(data, channels, sample_width): # PCM bytes as 16-bit samples, one row per frame.
+    if sample_width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif sample_width == 2:
+        samples = np.frombuffer(data, dtype='<i2')
+    elif sample_width == 4:
+        samples = (np.frombuffer(data, dtype='<i4') >> 16).astype(np.int16)
+    else:
+        raise ValueError(f"Unsupported sample width {sample_width}")
+    frames = len(samples)//channels
+    return samples[:frames*channels].reshape(frames, channels)
+
+def level_lengths(frames): # Buckets in each level of the pyramid of a song this long.
+    lengths = [max(1, -(-frames//BASE))]
+    while lengths[-1] > COARSEST:
+        lengths.append(-(-lengths[-1]//FACTOR))
+    return lengths
+
+def reduce_pairs(lows, highs, factor): # Combines every factor buckets; the last may be short.
+    starts = np.arange(0, len(lows), factor)
+    return np.stack([np.minimum.reduceat(lows, starts), np.maximum.reduceat(highs, starts)], axis=1)
+
+class PeakPyramid():
+    def __init__(self, levels, frames, frame_rate):
+        self.levels = levels # Arrays of (min, max) int16 pairs, finest first.
+        self.frames = frames
+        self.frame_rate = frame_rate
+
+    @classmethod
+    def from_pcm(cls, data, channels, sample_width, frame_rate):
+        flat = as_int16(data, channels, sample_width).reshape(-1) # Every channel's samples
+        if len(flat) == 0: # fall into the same bucket.
+            return cls([np.zeros((1,2), dtype=np.int16)], 0, frame_rate)
+        levels = [reduce_pairs(flat, flat, BASE*channels)]
+        for length in level_lengths(len(flat)//channels)[1:]:
+            levels.append(reduce_pairs(levels[-1][:,0], levels[-1][:,1], FACTOR))
+        return cls(levels, len(flat)//channels, frame_rate)
+
+    def duration_ms(self):
+        return 1000*self.frames/self.frame_rate
+
+    def columns(self, start, end, width): # (min, max) in [-1, 1] for each of width pixels
+        width = max(1, int(width)) # showing [start, end) ms; zero past the end of the song.
+        first = start*self.frame_rate/1000
+        perpixel = max((end - start)*self.frame_rate/1000/width, 1e-9)
+        level, bucket = 0, BASE # The coarsest level still finer than a pixel.
+        while level+1 < len(self.levels) and bucket*FACTOR <= perpixel:
+            level, bucket = level+1, bucket*FACTOR
+        peaks = self.levels[level]
+        bounds = np.maximum((first + np.arange(width+1)*perpixel)//bucket, 0).astype(np.int64)
+        lows = bounds[:-1][bounds[:-1] < len(peaks)] # Pixels on the song, left to right.
+        result = np.zeros((width, 2), dtype=np.float32)
+        if len(lows) == 0:
+            return result
+        last = min(len(peaks), max(bounds[len(lows)], lows[-1]+1))
+        segment = np.asarray(peaks[lows[0]:last]) # reduceat reads a bucket shared by several
+        offsets = lows - lows[0] # pixels (zoomed in past the finest level) directly.
+        result[:len(lows),0] = np.minimum.reduceat(segment[:,0], offsets)/32768
+        result[:len(lows),1] = np.maximum.reduceat(segment[:,1], offsets)/32768
+        return result
+
+    def save(self, path):
+        header = np.array([PEAKS_VERSION, self.frames, self.frame_rate], dtype='<i8').view('<i2').reshape(HEADER_ROWS, 2)
+        temppath = path+f'.{os.getpid()}.tmp.npy'
+        np.save(temppath, np.vstack([header]+[level.astype('<i2') for level in self.levels]))
+        os.replace(temppath, path)
+
+    @classmethod
+    def load(cls, path): # Memory-mapped:  only the buckets drawn are ever read.
+        stored = np.load(path, mmap_mode='r')
+        version, frames, frame_rate = (int(value) for value in np.array(stored[:HEADER_ROWS]).reshape(-1).view('<i8'))
+        if version != PEAKS_VERSION:
+            raise ValueError("Waveform file from another version")
+        levels, place = [], HEADER_ROWS
+        for length in level_lengths(frames):
+            levels.append(stored[place:place+length])
+            place += length
+        if place != len(stored):
+            raise ValueError("Waveform file is damaged")
+        return cls(levels, frames, frame_rate)
+
+def peaks_path(fileloc): # None if the song file cannot be read.
+    key = AUDIO_CACHE.key(fileloc, f'peaks{PEAKS_VERSION}', None)
+    if key is None:
+        return None
+    return os.path.join(PEAKS_DIRECTORY, key+'.npy')
+
+def cached_pyramid(fileloc): # None if the song has no saved pyramid.
+    path = peaks_path(fileloc)
+    if path is None:
+        return None
+    try:
+        return PeakPyramid.load(path)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def store_pyramid(fileloc, pyramid):
+    path = peaks_path(fileloc)
+    if path is None:
+        return None
+    try:
+        os.makedirs(PEAKS_DIRECTORY, exist_ok=True)
+        pyramid.save(path)
+    except OSError:
+        pass
@@ -0,0 +1,41 @@
+
+# probe_length reads only a song's headers; when they do not give its length it
+# says so, rather than decoding the whole song on the Tk thread to find out.
+import os
+import sys
+import tempfile
+import unittest
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kathysong_audio
+from kathysong_audio import probe_length
+
+class ProbeLengthTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.decode_song = kathysong_audio.decode_song
+        kathysong_audio.decode_song = lambda fileloc:  self.fail('the song was decoded')
+
+    def tearDown(self):
+        kathysong_audio.decode_song = self.decode_song
+        self.directory.cleanup()
+
+    def test_a_wav_file_is_measured_from_its_header(self):
+        path = os.path.join(self.directory.name, 'song.wav')
+        with wave.open(path,'wb') as wavefile:
+            wavefile.setnchannels(2)
+            wavefile.setsampwidth(2)
+            wavefile.setframerate(44100)
+            wavefile.writeframes(bytes(4*22050))
+        self.assertEqual(probe_length(path), 500)
+
+    def test_an_unreadable_header_gives_no_length(self):
+        path = os.path.join(self.directory.name, 'song.wav')
+        with open(path,'wb') as songfile:
+            songfile.write(b'not a wave file')
+        self.assertIsNone(probe_length(path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+
+# The audio cache's eviction:  the folder is listed once the running total
+# passes the limit, not on every store, and the cache still keeps to its limit.
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kathysong_cache import AudioCache
+
+class EvictionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.song = os.path.join(self.directory.name, 'song.mp3')
+        with open(self.song, 'wb') as songfile:
+            songfile.write(b'song')
+        self.cache = AudioCache(os.path.join(self.directory.name, 'Cache'), 1)
+        self.scans = 0
+        entries = self.cache.entries
+        def counted():
+            self.scans += 1
+            return entries()
+        self.cache.entries = counted
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_the_folder_is_listed_only_to_evict(self):
+        for start in range(400):
+            self.cache.store(self.song, start, 1000, bytes(5000), 2, 2, 44100)
+        self.assertEqual(self.cache.stores, 400)
+        self.assertLess(self.scans, 20)
+        self.assertGreater(self.cache.evictions, 0)
+        self.assertLessEqual(self.cache.size(), self.cache.limit)
+        self.assertIsNotNone(self.cache.load(self.song, 399, 1000))
+
+if __name__ == '__main__':
+    unittest.main()
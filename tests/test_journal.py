@@ -0,0 +1,63 @@
+
+# The game editor's autosave:  edits are journaled by SongList, the editor stops
+# without closing the journal, as in a crash, and load_game has to replay them.
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kathysong_engine import Song
+from kathysong_gamefile import GameJournal, JOURNAL_SUFFIX, load_game, game_text, write_atomically
+from kathysong_songlist import SongList
+
+def make_song(number):
+    return Song([f'Song {number}'],f'Artist {number % 3}','',f'/music/song{number}.mp3',float(number),500)
+
+def contents(game):
+    return [(eachsong.titles[0], eachsong.fileloc, eachsong.start, eachsong.loudness) for eachsong in game]
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'game.txt')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def edit(self, game): # One of each edit, then a crash:  the journal is left open.
+        songlist = SongList(game)
+        journal = GameJournal(self.path, game, claimed=True)
+        songlist.journal = journal
+        songlist.extend([make_song(number) for number in range(5, 8)])
+        songlist.selected = {2, 6}
+        songlist.raise_rows()
+        songlist.lower_rows()
+        songlist.to_top()
+        songlist.replace(3, make_song(9))
+        songlist.restart({game[4]:12.5})
+        songlist.shuffle()
+        songlist.selected = {1, 5}
+        songlist.remove()
+        journal.file.flush()
+        return journal
+
+    def test_load_game_replays_the_journal(self):
+        game = [make_song(number) for number in range(5)]
+        journal = self.edit(game)
+        loaded, missing, problems = load_game(self.path)
+        journal.file.close()
+        self.assertEqual(problems, [])
+        self.assertEqual(contents(loaded), contents(game))
+
+    def test_a_journal_older_than_the_file_is_not_replayed(self):
+        game = [make_song(number) for number in range(5)]
+        journal = self.edit(game)
+        journal.file.close()
+        write_atomically(self.path, game_text(game)) # A crash once the edits were folded in.
+        self.assertTrue(os.path.isfile(self.path+JOURNAL_SUFFIX))
+        self.assertEqual(contents(load_game(self.path)[0]), contents(game))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+
+# Adding songs from the music library window, without a display.
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kathysong_songlist import SongList
+from kathysong_ui import LibraryWindow
+
+class ResultList():
+    def curselection(self):
+        return (0, 1)
+
+class Status():
+    def set(self, value):
+        self.value = value
+
+class Editor(): # Stands in for the GameEditWindow the library adds to.
+    def __init__(self):
+        self.game = []
+        self.songs = SongList(self.game)
+
+    def update_list(self, changed=None):
+        self.changed = changed
+
+class AddSelectedTest(unittest.TestCase):
+    def test_unanalysed_songs_start_a_third_of_the_way_in(self):
+        window = LibraryWindow.__new__(LibraryWindow)
+        window.master = Editor()
+        window.result_list = ResultList()
+        window.status = Status()
+        window.results = [('/nowhere/long.mp3','Long','Artist','Album',180000.0),
+                          ('/nowhere/short.mp3','Short','Artist','Album',600.0)]
+        window.add_selected()
+        self.assertEqual([eachsong.start for eachsong in window.master.game], [60000, 100])
+        self.assertEqual(window.master.changed, (0, 1))
+
+if __name__ == '__main__':
+    unittest.main()
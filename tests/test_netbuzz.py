@@ -0,0 +1,69 @@
+
+# The buzz server, sent what no KathySong page would send:  it has to turn the
+# client away or drop it, and carry on serving everyone else.
+import os
+import socket
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kathysong_netbuzz import BuzzServer, MAX_FRAME
+
+def connect(server):
+    client = socket.create_connection(('127.0.0.1', server.port), timeout=5)
+    client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return client
+
+def receive_all(client):
+    received = b''
+    while True:
+        data = client.recv(4096)
+        if not data:
+            return received
+        received += data
+
+def wait_for(condition):
+    deadline = time.perf_counter() + 5
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+class BadClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = BuzzServer('127.0.0.1', 0).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_a_handshake_without_a_key_is_refused(self):
+        client = connect(self.server)
+        client.sendall(b'GET / HTTP/1.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n\r\n')
+        self.assertTrue(receive_all(client).startswith(b'HTTP/1.1 400 '))
+        client.close()
+
+    def test_an_oversized_frame_drops_the_client(self):
+        client = connect(self.server)
+        client.sendall(b'GET / HTTP/1.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                       b'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n\r\n')
+        client.sendall(bytes([0x81, 0xFF]) + (MAX_FRAME + 1).to_bytes(8, 'big') + bytes(4))
+        self.assertTrue(receive_all(client).startswith(b'HTTP/1.1 101 '))
+        self.assertTrue(wait_for(lambda:  self.server.clients == {}))
+        client.close()
+
+    def test_a_message_that_is_not_an_object_is_ignored(self):
+        client = connect(self.server)
+        client.sendall(b'[1, 2]\n"buzz"\n{"type":"join","name":"Fine"}\n')
+        self.assertTrue(client.recv(4096).startswith(b'{"type": "welcome"'))
+        client.close()
+
+    def test_a_malformed_message_drops_the_client(self):
+        client = connect(self.server)
+        client.sendall(b'{"type":"pong","t0":null}\n')
+        self.assertEqual(receive_all(client), b'')
+        self.assertTrue(wait_for(lambda:  self.server.clients == {}))
+        client.close()
+
+if __name__ == '__main__':
+    unittest.main()
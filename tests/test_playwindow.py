@@ -0,0 +1,130 @@
+
+# Drives PlayWindow's round phases without a display:  the window is made without
+# Tk's __init__, and the widgets and scheduling it touches are stood in for.
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kathysong_engine import Song, GameEngine
+from kathysong_ui import PlayWindow
+
+class Label():
+    def config(self, **options):
+        pass
+
+    def cget(self, option):
+        return ''
+
+class Text():
+    def set(self, value):
+        self.value = value
+
+class Listbox():
+    def __init__(self):
+        self.rows = []
+
+    def delete(self, first, last=None):
+        self.rows = []
+
+    def insert(self, index, text):
+        self.rows.append(text)
+
+class Server():
+    def __init__(self, events=()):
+        self.events = list(events)
+
+    def broadcast(self, message):
+        pass
+
+    def poll(self):
+        found, self.events = self.events, []
+        return found
+
+    def grace(self):
+        return 0.0
+
+class Excerpt():
+    def play_timed(self):
+        return None, time.perf_counter(), 0.0
+
+class PreRenderer():
+    def __init__(self):
+        self.ready = False
+
+    def is_ready(self, number):
+        return self.ready
+
+    def get(self, number):
+        return Excerpt()
+
+    def cancel(self):
+        pass
+
+    def prefetch(self, number):
+        pass
+
+def make_window():
+    window = PlayWindow.__new__(PlayWindow)
+    game = [Song(['Bohemian Rhapsody'],'Queen','','song.mp3',0,500)]
+    window.engine = GameEngine(game, 'strict', [0, 1, 2])
+    window.cont_exist = [True, True, True]
+    window.labellist = [Label() for _ in range(7)]
+    window.mainlabeltext = Text()
+    window.mainlabeltext.get = lambda:  window.mainlabeltext.value
+    window.prerenderer = PreRenderer()
+    window.server = None
+    window.netnames = {}
+    window.netgone = set()
+    window.startlatencies = []
+    window.scheduled = []
+    window.schedule = lambda delay, callback:  window.scheduled.append(callback)
+    window.ready = set()
+    window.phase = 'ready'
+    return window
+
+class BuzzToHintTest(unittest.TestCase):
+    def test_buzzing_in_starts_the_hint(self):
+        window = make_window()
+        for player in range(3):
+            window.buzz(player, None)
+        self.assertEqual(window.phase, 'hint')
+        self.assertEqual(window.scheduled, [window.show_hint])
+        window.scheduled.pop()() # The excerpt is still decoding, so it is polled for.
+        self.assertEqual(window.phase, 'hint')
+        self.assertEqual(window.scheduled, [window.show_hint])
+        window.prerenderer.ready = True
+        window.scheduled.pop()()
+        self.assertEqual(window.phase, 'playing')
+
+class FinishGameTest(unittest.TestCase):
+    def test_network_players_are_scored_on_the_netboard(self):
+        window = make_window()
+        window.server = Server()
+        window.netboard = Listbox()
+        window.netnames = {3:'Phone'}
+        window.engine.add_player(3)
+        window.engine.scores[3], window.engine.times[3] = 1, 2.0
+        window.finish_game()
+        self.assertEqual(window.netboard.rows, ['Phone:  0.5'])
+        self.assertEqual(window.mainlabeltext.value, 'Phone wins!')
+
+    def test_players_who_left_are_marked_and_left_out_of_a_tie(self):
+        window = make_window()
+        window.server = Server([('join', 3, 'Phone'), ('join', 4, 'Laptop'), ('leave', 4)])
+        window.netboard = Listbox()
+        window.winfo_exists = lambda:  True
+        window.after = lambda delay, callback:  None
+        window.poll_network()
+        self.assertEqual(window.netboard.rows, ['Phone:  0 songs in 0.00 seconds',
+                                                'Laptop:  0 songs in 0.00 seconds (left)'])
+        for player in (0, 1, 2, 3):
+            window.engine.scores[player], window.engine.times[player] = 1, 2.0
+        window.finish_game()
+        self.assertEqual(window.netboard.rows, ['Phone:  0.5', 'Laptop:  0 (left)'])
+        self.assertEqual(window.mainlabeltext.value, 'Everyone ties!')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+
+# The song editor's transport, fed through a mixer that is rendered by hand
+# rather than by a sound device:  the spans have to follow one another without
+# a gap, so that what is mixed is the song itself, frame for frame.
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kathysong_transport
+from kathysong_output import MixerOutput, BLOCK
+from kathysong_transport import Transport
+
+class Decoder(): # Has the parts of a finished ChunkedDecoder that the transport reads.
+    def __init__(self, frames):
+        self.channels, self.sample_width, self.frame_rate = 2, 2, 44100
+        self.data = (np.arange(frames*2) % 20000).astype('<i2').tobytes()
+        self.finished = True
+
+    def view(self, first, last):
+        return memoryview(self.data)[first*4:last*4]
+
+class TransportTest(unittest.TestCase):
+    def setUp(self):
+        self.output = MixerOutput()
+        self.audio_output = kathysong_transport.audio_output
+        kathysong_transport.audio_output = lambda:  self.output
+
+    def tearDown(self):
+        kathysong_transport.audio_output = self.audio_output
+
+    def test_spans_play_without_a_gap(self):
+        decoder = Decoder(20000)
+        transport = Transport(decoder, span=100)
+        transport.play(1000, 15000)
+        blocks = []
+        while transport.poll() is not None and len(blocks) < 1000:
+            blocks.append(self.output.render(BLOCK))
+        mixed = b''.join(blocks)
+        self.assertEqual(mixed[:14000*4], decoder.data[1000*4:15000*4])
+        self.assertEqual(mixed[14000*4:], bytes(len(mixed) - 14000*4))
+        self.assertFalse(transport.active)
+        self.assertEqual(transport.heard(), 15000)
+
+if __name__ == '__main__':
+    unittest.main()